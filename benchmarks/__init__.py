@@ -0,0 +1,5 @@
+"""
+Benchmarks
+
+Offline benchmarks of the downloads, run against a local stand-in for the Github API serving synthetic repositories
+"""
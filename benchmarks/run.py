@@ -0,0 +1,329 @@
+"""
+Benchmark runner module
+
+Run download scenarios against the stand-in server and report, for each of them, the wall time, the number of
+requests, the bytes served and the peak RSS of the downloading process.
+
+Usage: python -m benchmarks.run [-s SCENARIO ...] [--repeat N] [--output results.ndjson]
+
+Each run happens in a fresh process so that its peak RSS is its own, while the server, and its request counters,
+live in the runner process. With --output, one JSON record per scenario is appended to the given file,
+along with the git revision, to track regressions over time.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .server import RepoShape, StandInServer, SyntheticRepo
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# URL the scenarios download from, answered by the stand-in server
+REPO_URL = 'https://github.com/bench/repo'
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """
+    Download of a synthetic repository through a stand-in server
+
+    `operation` is one of 'dl_dir', 'dl_file' (the first file of the repository), 'listing' (the tree listing
+    of the whole repository, without downloading), 'tags' or 'branches',
+    `options` are passed to the download function and `server` to the StandInServer
+    """
+
+    name: str
+    description: str
+    shape: RepoShape
+    operation: str = 'dl_dir'
+    options: dict = field(default_factory=dict)
+    server: dict = field(default_factory=dict)
+
+
+SCENARIOS = [
+    Scenario(
+        'small-files-serial',
+        '300 small files, one at a time',
+        RepoShape(file_count=300),
+        options={'max_workers': 1},
+    ),
+    Scenario(
+        'small-files-parallel',
+        '1000 small files, 8 at a time',
+        RepoShape(file_count=1000),
+        options={'max_workers': 8},
+    ),
+    Scenario(
+        'small-files-latency',
+        '300 small files, 8 at a time, 20 ms of latency per request',
+        RepoShape(file_count=300),
+        options={'max_workers': 8},
+        server={'latency': 0.02},
+    ),
+    Scenario(
+        'small-files-output-archive',
+        '1000 small files, 8 at a time, written to a .tar.gz archive',
+        RepoShape(file_count=1000),
+        options={'max_workers': 8, 'output_archive': 'out.tar.gz'},
+    ),
+    Scenario(
+        'small-files-graphql',
+        '1000 small files batched in GraphQL queries',
+        RepoShape(file_count=1000),
+        options={'max_workers': 8, 'graphql': True},
+    ),
+    Scenario(
+        'small-files-archive',
+        '1000 small files from the tarball',
+        RepoShape(file_count=1000),
+        options={'via_archive': True},
+    ),
+    Scenario(
+        'truncated-tree',
+        '2000 files 5 levels deep, with tree listings truncated past 500 entries',
+        RepoShape(file_count=2000, depth=5),
+        options={'max_workers': 8},
+        server={'tree_limit': 500},
+    ),
+    Scenario(
+        'huge-tree-listing',
+        'Listing of a 50000 files tree, without downloading',
+        RepoShape(file_count=50000, depth=4, fanout=10),
+        operation='listing',
+    ),
+    Scenario(
+        'rate-limited',
+        '500 small files, 8 at a time, 200 requests allowed per second',
+        RepoShape(file_count=500),
+        options={'max_workers': 8},
+        server={'rate_limit': 200},
+    ),
+    Scenario(
+        'large-file',
+        'A 64 MB file by byte ranges, capped at 64 MB/s per response',
+        RepoShape(file_count=0, large_files=1),
+        options={'max_workers': 4},
+        server={'bandwidth': 64 * 1024 * 1024},
+    ),
+    Scenario(
+        'single-file',
+        'A 1 MB file, capped at 8 MB/s',
+        RepoShape(file_count=1, median_size=1024 * 1024, size_sigma=0),
+        operation='dl_file',
+        server={'bandwidth': 8 * 1024 * 1024},
+    ),
+    Scenario(
+        'tags',
+        '3000 tags over 30 pages',
+        RepoShape(file_count=1, tags=3000),
+        operation='tags',
+        options={'max_workers': 4},
+        server={'latency': 0.02},
+    ),
+    Scenario(
+        'branches',
+        '500 branches over 5 pages',
+        RepoShape(file_count=1, branches=500),
+        operation='branches',
+        options={'max_workers': 4},
+        server={'latency': 0.02},
+    ),
+]
+
+
+def _peak_rss() -> int | None:
+    """
+    Return the peak resident set size of the current process in bytes, or None if unavailable
+    """
+    # ru_maxrss survives exec on Linux, so it would include the memory of the runner process
+    try:
+        with Path('/proc/self/status').open(encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _work(spec: dict) -> dict:
+    """
+    Run a scenario download in the current process, and return its wall time and peak RSS
+    """
+    os.environ.setdefault('GITHUB_TOKEN', 'benchmark')
+
+    from githubdl import api  # noqa: PLC0415
+    from githubdl import request_processing as rp  # noqa: PLC0415
+    from githubdl.client import Client  # noqa: PLC0415
+
+    client = Client(server_url=spec['server_url'])
+    options = {**spec['options'], 'client': client}
+
+    with tempfile.TemporaryDirectory() as target_path:
+        if 'output_archive' in options:
+            # The archive is written next to the files it replaces
+            options = {**options, 'output_archive': str(Path(target_path, options['output_archive']))}
+
+        start = time.perf_counter()
+
+        if spec['operation'] == 'dl_dir':
+            api.dl_dir(REPO_URL, '', target_path=target_path, **options)
+        elif spec['operation'] == 'listing':
+            rp.get_tree_listing(REPO_URL, '', None, client)
+        elif spec['operation'] == 'dl_file':
+            api.dl_file(REPO_URL, spec['file_name'], target_filename=str(Path(target_path, 'file')), **options)
+        else:
+            for _ in api.iter_info_list(REPO_URL, spec['operation'], **options):
+                pass
+
+        wall = time.perf_counter() - start
+
+    return {'wall': wall, 'peak_rss': _peak_rss()}
+
+
+def _run_once(scenario: Scenario, repo: SyntheticRepo, server: StandInServer) -> dict:
+    """
+    Run a scenario in a fresh process, and return its measures along with the server counters
+    """
+    spec = {
+        'operation': scenario.operation,
+        'options': scenario.options,
+        'file_name': next(iter(repo.files), None),
+        'server_url': server.url,
+    }
+
+    server.stats.reset()
+
+    process = subprocess.run(  # noqa: S603
+        [sys.executable, '-m', 'benchmarks.run', '--work', json.dumps(spec)],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+
+    if process.returncode != 0:
+        err_message = f'Scenario {scenario.name} failed:\n{process.stderr}'
+        raise RuntimeError(err_message)
+
+    stats = server.stats.snapshot()
+
+    return {**json.loads(process.stdout.splitlines()[-1]), 'requests': stats['requests'], 'stats': stats}
+
+
+def run_scenario(scenario: Scenario, repeat: int = 1) -> dict:
+    """
+    Run a scenario repeat times and return its record: median wall time, highest peak RSS and server counters
+    """
+    repo = SyntheticRepo(scenario.shape)
+
+    with StandInServer(repo, **scenario.server) as server:
+        runs = [_run_once(scenario, repo, server) for _ in range(repeat)]
+
+    peaks = [x['peak_rss'] for x in runs if x['peak_rss'] is not None]
+
+    return {
+        'scenario': scenario.name,
+        'wall': statistics.median(x['wall'] for x in runs),
+        'wall_min': min(x['wall'] for x in runs),
+        'requests': runs[-1]['requests'],
+        'bytes': runs[-1]['stats']['bytes_sent'],
+        'peak_rss': max(peaks) if peaks else None,
+        'endpoints': runs[-1]['stats']['endpoints'],
+        'statuses': runs[-1]['stats']['statuses'],
+        'repeat': repeat,
+    }
+
+
+def git_revision() -> str | None:
+    """
+    Return the current git revision of the repository, if any
+    """
+    try:
+        process = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],  # noqa: S607
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return process.stdout.strip()
+
+
+def _format_size(size: int | None) -> str:
+    """
+    Format a size in megabytes
+    """
+    return '-' if size is None else f'{size / 1024 / 1024:.1f}'
+
+
+def main() -> None:
+    """
+    Run the selected scenarios and print their results
+    """
+    names = [x.name for x in SCENARIOS]
+
+    parser = argparse.ArgumentParser(description='Offline benchmarks of githubdl')
+    parser.add_argument('-s', '--scenario', action='append', choices=names, help='Scenario to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=1, help='Number of runs per scenario (default: 1)')
+    parser.add_argument('--output', type=Path, help='NDJSON file to append the results to')
+    parser.add_argument('--list', action='store_true', help='List the scenarios and exit')
+    parser.add_argument('--work', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.work is not None:
+        print(json.dumps(_work(json.loads(args.work))))
+        return
+
+    if args.list:
+        for scenario in SCENARIOS:
+            print(f'{scenario.name:<24} {scenario.description}')
+        return
+
+    selected = [x for x in SCENARIOS if args.scenario is None or x.name in args.scenario]
+    context = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': sys.platform,
+    }
+
+    print(f'{"scenario":<24} {"wall (s)":>9} {"requests":>9} {"MB":>8} {"peak RSS (MB)":>14}')
+
+    for scenario in selected:
+        record = run_scenario(scenario, args.repeat)
+
+        print(
+            f'{record["scenario"]:<24} {record["wall"]:>9.3f} {record["requests"]:>9} '
+            f'{_format_size(record["bytes"]):>8} {_format_size(record["peak_rss"]):>14}',
+            flush=True,
+        )
+
+        if args.output is not None:
+            with args.output.open('a', encoding='utf-8') as f:
+                f.write(f'{json.dumps({**context, **record})}\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,668 @@
+"""
+Stand-in server module
+
+Local HTTP server answering the Github API requests of githubdl (repository, commits, contents, git/trees, tarball,
+tags, branches, GraphQL and raw content) over a synthetic repository, with injected latency, a bandwidth cap
+and rate limit headers. Point githubdl at it with a `githubdl.Client(server_url=...)`.
+"""
+
+import argparse
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import random
+import re
+import tarfile
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import ParseResult, parse_qs, unquote, urlparse
+
+# Size of the pool of random text the file contents are cut from
+_POOL_SIZE = 1024 * 1024
+
+# Size of the writes of a response body, between which the bandwidth cap is applied
+_WRITE_SIZE = 64 * 1024
+
+# Printable characters, with new lines, the file contents are made of so that they are valid text
+_TEXT_TABLE = bytes(b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 \n'[i % 64] for i in range(256))
+
+_API_PATH = re.compile(r'/api/v3/repos/(?P<repo>[^/]+/[^/]+)(?P<rest>/.*)?$')
+_RAW_PATH = re.compile(r'/raw/(?P<repo>[^/]+/[^/]+)/(?P<reference>[^/]+)/(?P<path>.+)$')
+_RANGE = re.compile(r'bytes=(\d+)-(\d*)$')
+
+
+@dataclass(frozen=True)
+class RepoShape:
+    """
+    Shape of a synthetic repository
+
+    Files are spread over a tree of directories `depth` levels deep with `fanout` sub directories each,
+    and their sizes follow a log-normal distribution around `median_size`.
+    `large_files` files of `large_size` bytes are added at the root.
+    """
+
+    file_count: int = 1000
+    depth: int = 3
+    fanout: int = 4
+    median_size: int = 4096
+    size_sigma: float = 1.0
+    large_files: int = 0
+    large_size: int = 64 * 1024 * 1024
+    tags: int = 0
+    branches: int = 1
+    seed: int = 0
+
+
+def _git_sha(kind: str, content: bytes) -> str:
+    """
+    Return the SHA of a git object
+    """
+    return hashlib.sha1(f'{kind} {len(content)}\0'.encode() + content, usedforsecurity=False).hexdigest()
+
+
+class SyntheticRepo:
+    """
+    Repository generated from a shape, with a single commit that every branch and tag points to
+
+    The generation is deterministic: the same shape always gives the same files and SHAs
+    """
+
+    def __init__(self, shape: RepoShape, name: str = 'bench/repo') -> None:
+        """
+        Generate the files and the trees of the repository
+        """
+        self.shape = shape
+        self.name = name
+
+        rng = random.Random(shape.seed)  # noqa: S311
+        pool = rng.randbytes(_POOL_SIZE).translate(_TEXT_TABLE)
+
+        directories = ['']
+        for level in range(shape.depth):
+            directories += [
+                f'{parent}d{i}/' for parent in directories if parent.count('/') == level for i in range(shape.fanout)
+            ]
+
+        self.files: dict[str, bytes] = {}
+
+        for i in range(shape.file_count):
+            size = min(int(rng.lognormvariate(0, shape.size_sigma) * shape.median_size), _POOL_SIZE)
+            offset = rng.randrange(_POOL_SIZE - size + 1)
+            self.files[f'{rng.choice(directories)}f{i}.txt'] = pool[offset : offset + size]
+
+        for i in range(shape.large_files):
+            self.files[f'large{i}.bin'] = (pool * (shape.large_size // _POOL_SIZE + 1))[: shape.large_size]
+
+        self.blob_shas = {path: _git_sha('blob', content) for path, content in self.files.items()}
+
+        # Entries of every directory, keyed by directory path: name -> (type, sha)
+        self.trees: dict[str, dict[str, tuple[str, str]]] = {'': {}}
+
+        for path in self.files:
+            parent, _, name = path.rpartition('/')
+            self.trees.setdefault(parent, {})[name] = ('blob', self.blob_shas[path])
+
+            while parent:
+                parent, _, name = parent.rpartition('/')
+                self.trees.setdefault(parent, {})[name] = ('tree', '')
+
+        self.tree_shas: dict[str, str] = {}
+        self._hash_tree('')
+        self.tree_paths = {sha: path for path, sha in self.tree_shas.items()}
+
+        self.commit_sha = _git_sha('commit', f'tree {self.tree_shas[""]}\n\nsynthetic\n'.encode())
+
+        self.branches = ['main', *(f'branch-{i}' for i in range(1, shape.branches))]
+        self.tags = [f'v{i}' for i in range(shape.tags)]
+
+        self._tarball: bytes | None = None
+        self._lock = threading.Lock()
+
+    def _hash_tree(self, path: str) -> str:
+        """
+        Compute the SHA of a directory from its entries, sub directories first
+        """
+        entries = self.trees[path]
+
+        for name, (kind, _) in entries.items():
+            if kind == 'tree':
+                entries[name] = ('tree', self._hash_tree(f'{path}/{name}'.removeprefix('/')))
+
+        listing = ''.join(f'{kind} {sha} {name}\n' for name, (kind, sha) in sorted(entries.items()))
+        self.tree_shas[path] = sha = _git_sha('tree', listing.encode())
+
+        return sha
+
+    def resolve(self, reference: str) -> str | None:
+        """
+        Return the commit SHA of a branch, a tag, a commit SHA or HEAD, or None if unknown
+        """
+        if reference in {self.commit_sha, 'HEAD', *self.branches, *self.tags}:
+            return self.commit_sha
+
+        return None
+
+    def tree_entries(self, path: str, recursive: bool) -> list[dict]:
+        """
+        Return the entries of a directory in the Git Trees API format, with all its sub directories if recursive
+        """
+        entries = []
+
+        for name, (kind, sha) in sorted(self.trees[path].items()):
+            full_path = f'{path}/{name}'.removeprefix('/')
+            entry = {'path': name, 'mode': '100644' if kind == 'blob' else '040000', 'type': kind, 'sha': sha}
+
+            if kind == 'blob':
+                entry['size'] = len(self.files[full_path])
+
+            entries.append(entry)
+
+            if kind == 'tree' and recursive:
+                entries += [{**x, 'path': f'{name}/{x["path"]}'} for x in self.tree_entries(full_path, recursive)]
+
+        return entries
+
+    def tarball(self) -> bytes:
+        """
+        Return the gzipped tarball of the repository, built on first use
+        """
+        with self._lock:
+            if self._tarball is None:
+                buffer = io.BytesIO()
+                top = f'{self.name.replace("/", "-")}-{self.commit_sha[:7]}'
+
+                with tarfile.open(fileobj=buffer, mode='w:gz', compresslevel=1) as tar:
+                    for path, content in self.files.items():
+                        info = tarfile.TarInfo(f'{top}/{path}')
+                        info.size = len(content)
+                        tar.addfile(info, io.BytesIO(content))
+
+                self._tarball = buffer.getvalue()
+
+        return self._tarball
+
+
+@dataclass
+class Stats:
+    """
+    Counters of the requests answered by the server
+    """
+
+    requests: int = 0
+    bytes_sent: int = 0
+    endpoints: dict[str, int] = field(default_factory=dict)
+    statuses: dict[int, int] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, endpoint: str, status: int, size: int) -> None:
+        """
+        Count a response
+        """
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += size
+            self.endpoints[endpoint] = self.endpoints.get(endpoint, 0) + 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def snapshot(self) -> dict:
+        """
+        Return the counters as a JSON serializable dict
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'bytes_sent': self.bytes_sent,
+                'endpoints': dict(self.endpoints),
+                'statuses': {str(k): v for k, v in self.statuses.items()},
+            }
+
+    def reset(self) -> None:
+        """
+        Reset the counters
+        """
+        with self._lock:
+            self.requests = self.bytes_sent = 0
+            self.endpoints.clear()
+            self.statuses.clear()
+
+
+class RateLimit:
+    """
+    Quota of `limit` requests per `window` seconds, reported with the X-RateLimit-* headers
+    """
+
+    def __init__(self, limit: int, window: float) -> None:
+        """
+        Start the first window
+        """
+        self.limit = limit
+        self.window = window
+        self._used = 0
+        self._reset_at = time.time() + window
+        self._lock = threading.Lock()
+
+    def consume(self) -> tuple[bool, dict[str, str]]:
+        """
+        Count a request, and return whether it is allowed with the rate limit headers of its response
+        """
+        with self._lock:
+            if (now := time.time()) >= self._reset_at:
+                self._used = 0
+                self._reset_at = now + self.window
+
+            allowed = self._used < self.limit
+            self._used += allowed
+
+            return allowed, {
+                'X-RateLimit-Limit': str(self.limit),
+                'X-RateLimit-Remaining': str(self.limit - self._used),
+                'X-RateLimit-Used': str(self._used),
+                'X-RateLimit-Reset': str(int(self._reset_at + 0.999)),
+                'X-RateLimit-Resource': 'core',
+            }
+
+
+class StandInServer:
+    """
+    Threaded HTTP server answering the Github API requests for a synthetic repository
+
+    - `latency` seconds are waited before answering each request
+    - `bandwidth` caps each response body to as many bytes per second
+    - with `rate_limit`, requests beyond `rate_limit` per `rate_limit_window` seconds get a 403, like Github
+    - recursive tree listings of more than `tree_limit` entries are truncated, like Github does past 100 000 entries
+
+    Use it as a context manager: the server listens on a free local port, given by `url`, until the context exits.
+    """
+
+    def __init__(
+        self,
+        repo: SyntheticRepo,
+        *,
+        latency: float = 0,
+        bandwidth: int | None = None,
+        rate_limit: int | None = None,
+        rate_limit_window: float = 1,
+        tree_limit: int = 100_000,
+        port: int = 0,
+    ) -> None:
+        """
+        Create the server, without starting it
+        """
+        self.repo = repo
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.rate_limit = RateLimit(rate_limit or 1_000_000, rate_limit_window)
+        self.tree_limit = tree_limit
+        self.stats = Stats()
+
+        self._http = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        self._http.daemon_threads = True
+        self._http.stand_in = self
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """
+        Root URL of the server, to pass as the server_url of a githubdl Client
+        """
+        host, port = self._http.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self) -> 'StandInServer':
+        """
+        Start serving in a background thread
+        """
+        self._thread = threading.Thread(target=self._http.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_args: object) -> None:
+        """
+        Stop serving and close the listening socket
+        """
+        self._http.shutdown()
+        self._http.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Request handler of the stand-in server
+    """
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately: without this, Nagle's algorithm delays every response
+    disable_nagle_algorithm = True
+    server_version = 'githubdl-bench'
+
+    @property
+    def stand_in(self) -> StandInServer:
+        """
+        Server the handler answers for
+        """
+        return self.server.stand_in
+
+    def log_message(self, *_args: object) -> None:
+        """
+        Keep the requests out of the benchmark output
+        """
+
+    def do_GET(self) -> None:
+        """
+        Answer a GET request
+        """
+        self._answer(self._route_get)
+
+    def do_POST(self) -> None:
+        """
+        Answer a POST request (GraphQL)
+        """
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._answer(lambda url: self._graphql(url, body))
+
+    def _answer(self, route: Callable[[ParseResult], None]) -> None:
+        """
+        Apply the latency and the rate limit, then send the response of the route
+        """
+        if self.stand_in.latency:
+            time.sleep(self.stand_in.latency)
+
+        url = urlparse(self.path)
+        allowed, self._extra_headers = self.stand_in.rate_limit.consume()
+
+        if not allowed:
+            self._send_json('rate_limit', 403, {'message': 'API rate limit exceeded'})
+            return
+
+        route(url)
+
+    def _route_get(self, url: ParseResult) -> None:
+        """
+        Dispatch a GET request to its endpoint
+        """
+        repo = self.stand_in.repo
+        query = parse_qs(url.query)
+
+        if (res := _RAW_PATH.match(url.path)) is not None:
+            self._raw(res.group('repo'), res.group('reference'), unquote(res.group('path')))
+            return
+
+        if (res := _API_PATH.match(url.path)) is None or res.group('repo') != repo.name:
+            self._send_json('unknown', 404, {'message': 'Not Found'})
+            return
+
+        endpoint, _, argument = (res.group('rest') or '').removeprefix('/').partition('/')
+        argument = unquote(argument)
+
+        if endpoint == 'git' and argument.startswith('trees/'):
+            self._tree(argument.removeprefix('trees/'), recursive='recursive' in query)
+        elif not endpoint:
+            self._send_json('repository', 200, {'full_name': repo.name, 'default_branch': 'main'})
+        elif endpoint == 'commits':
+            self._commit(argument)
+        elif endpoint == 'contents':
+            self._contents(argument, query.get('ref', ['main'])[0])
+        elif endpoint == 'tarball':
+            self._tarball(argument or 'main')
+        elif endpoint in {'tags', 'branches'}:
+            self._list(endpoint, url.path, query)
+        else:
+            self._send_json('unknown', 404, {'message': 'Not Found'})
+
+    def _commit(self, reference: str) -> None:
+        """
+        Answer a commit request, which githubdl makes to resolve a reference to its SHA
+        """
+        if (sha := self.stand_in.repo.resolve(reference)) is None:
+            self._send_json('commits', 422, {'message': f'No commit found for SHA: {reference}'})
+        else:
+            self._send('commits', 200, sha.encode(), 'application/vnd.github.sha')
+
+    def _tree(self, tree_ish: str, recursive: bool) -> None:
+        """
+        Answer a Git Trees API request for a tree SHA, a reference or a `reference:path`
+        """
+        repo = self.stand_in.repo
+        reference, _, base_path = tree_ish.partition(':')
+
+        if (path := repo.tree_paths.get(tree_ish)) is None and repo.resolve(reference) is not None:
+            path = base_path.strip('/')
+
+        if path not in repo.trees:
+            self._send_json('git/trees', 404, {'message': 'Not Found'})
+            return
+
+        entries = repo.tree_entries(path, recursive)
+        truncated = len(entries) > self.stand_in.tree_limit
+
+        self._send_json(
+            'git/trees',
+            200,
+            {'sha': repo.tree_shas[path], 'tree': entries[: self.stand_in.tree_limit], 'truncated': truncated},
+            etag=repo.tree_shas[path],
+        )
+
+    def _contents(self, path: str, reference: str) -> None:
+        """
+        Answer a Contents API request: the raw content of a file, or the listing of a directory
+        """
+        repo = self.stand_in.repo
+        path = path.strip('/')
+
+        if repo.resolve(reference) is None:
+            self._send_json('contents', 404, {'message': f'No commit found for the ref {reference}'})
+        elif path in repo.files:
+            self._send('contents', 200, repo.files[path], 'application/vnd.github.raw', etag=repo.blob_shas[path])
+        elif path in repo.trees:
+            listing = [
+                {
+                    'name': name,
+                    'path': f'{path}/{name}'.removeprefix('/'),
+                    'type': 'file' if kind == 'blob' else 'dir',
+                    'sha': sha,
+                }
+                for name, (kind, sha) in sorted(repo.trees[path].items())
+            ]
+            self._send_json('contents', 200, listing, etag=repo.tree_shas[path])
+        else:
+            self._send_json('contents', 404, {'message': 'Not Found'})
+
+    def _tarball(self, reference: str) -> None:
+        """
+        Answer a tarball request with the gzipped archive of the repository
+        """
+        if self.stand_in.repo.resolve(reference) is None:
+            self._send_json('tarball', 404, {'message': 'Not Found'})
+        else:
+            self._send('tarball', 200, self.stand_in.repo.tarball(), 'application/x-gzip')
+
+    def _list(self, endpoint: str, path: str, query: dict[str, list[str]]) -> None:
+        """
+        Answer a paginated tags or branches request, with its Link header
+        """
+        repo = self.stand_in.repo
+        per_page = int(query.get('per_page', ['30'])[0])
+        page = int(query.get('page', ['1'])[0])
+        names = repo.tags if endpoint == 'tags' else repo.branches
+        last_page = max(1, -(-len(names) // per_page))
+
+        items = [
+            {'name': name, 'commit': {'sha': repo.commit_sha}}
+            for name in names[(page - 1) * per_page : page * per_page]
+        ]
+
+        headers = {}
+        if page < last_page:
+            headers['Link'] = (
+                f'<{self.stand_in.url}{path}?per_page={per_page}&page={page + 1}>; rel="next", '
+                f'<{self.stand_in.url}{path}?per_page={per_page}&page={last_page}>; rel="last"'
+            )
+
+        self._send_json(endpoint, 200, items, headers=headers)
+
+    def _raw(self, repo_name: str, reference: str, path: str) -> None:
+        """
+        Answer a raw content request, with support for a single byte range
+        """
+        repo = self.stand_in.repo
+
+        if repo_name != repo.name or repo.resolve(reference) is None or path not in repo.files:
+            self._send('raw', 404, b'404: Not Found', 'text/plain')
+            return
+
+        content = repo.files[path]
+
+        if (res := _RANGE.match(self.headers.get('Range', ''))) is None:
+            self._send('raw', 200, content, 'application/octet-stream')
+            return
+
+        start = int(res.group(1))
+        end = min(int(res.group(2) or len(content) - 1), len(content) - 1)
+
+        if start > end:
+            self._send('raw', 416, b'', 'application/octet-stream')
+            return
+
+        self._send(
+            'raw',
+            206,
+            memoryview(content)[start : end + 1],
+            'application/octet-stream',
+            headers={'Content-Range': f'bytes {start}-{end}/{len(content)}'},
+        )
+
+    def _graphql(self, url: ParseResult, body: bytes) -> None:
+        """
+        Answer a GraphQL query made of blob lookups by `reference:path` expression
+        """
+        repo = self.stand_in.repo
+
+        if url.path != '/api/graphql':
+            self._send_json('unknown', 404, {'message': 'Not Found'})
+            return
+
+        variables = json.loads(body).get('variables', {})
+        data = {}
+
+        for name, expression in variables.items():
+            if not re.fullmatch(r'e\d+', name):
+                continue
+
+            reference, _, path = expression.partition(':')
+            content = repo.files.get(path) if repo.resolve(reference) else None
+
+            data[f'f{name[1:]}'] = (
+                None
+                if content is None
+                else {'text': content.decode(), 'byteSize': len(content), 'isBinary': False, 'isTruncated': False}
+            )
+
+        self._send_json('graphql', 200, {'data': {'repository': data}})
+
+    def _send_json(
+        self,
+        endpoint: str,
+        status: int,
+        content: object,
+        *,
+        etag: str | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        """
+        Send a JSON response, gzipped if the client accepts it
+        """
+        body = json.dumps(content).encode()
+        headers = dict(headers or {})
+
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=1)
+            headers['Content-Encoding'] = 'gzip'
+
+        self._send(endpoint, status, body, 'application/json; charset=utf-8', etag=etag, headers=headers)
+
+    def _send(
+        self,
+        endpoint: str,
+        status: int,
+        body: bytes | memoryview,
+        content_type: str,
+        *,
+        etag: str | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        """
+        Send a response, answering a conditional request with a 304, at the capped bandwidth
+        """
+        if etag is not None:
+            etag = f'"{etag}"'
+
+            if self.headers.get('If-None-Match') == etag:
+                status, body = 304, b''
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+
+        if etag is not None:
+            self.send_header('ETag', etag)
+
+        for name, value in {**self._extra_headers, **(headers or {})}.items():
+            self.send_header(name, value)
+
+        self.end_headers()
+
+        self.stand_in.stats.add(endpoint, status, len(body))
+
+        bandwidth = self.stand_in.bandwidth
+        start = time.perf_counter()
+        view = memoryview(body)
+
+        for offset in range(0, len(body), _WRITE_SIZE):
+            self.wfile.write(view[offset : offset + _WRITE_SIZE])
+
+            if bandwidth and (delay := (offset + _WRITE_SIZE) / bandwidth - (time.perf_counter() - start)) > 0:
+                time.sleep(delay)
+
+
+def main() -> None:
+    """
+    Serve a synthetic repository until interrupted, e.g. to try githubdl by hand against it
+    """
+    parser = argparse.ArgumentParser(description='Github API stand-in serving a synthetic repository')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--files', type=int, default=1000, help='Number of files')
+    parser.add_argument('--depth', type=int, default=3, help='Depth of the directory tree')
+    parser.add_argument('--median-size', type=int, default=4096, help='Median file size in bytes')
+    parser.add_argument('--large-files', type=int, default=0, help='Number of 64 MB files')
+    parser.add_argument('--tags', type=int, default=0, help='Number of tags')
+    parser.add_argument('--latency', type=float, default=0, help='Latency per request in seconds')
+    parser.add_argument('--bandwidth', type=int, default=None, help='Bandwidth per response in bytes per second')
+    parser.add_argument('--rate-limit', type=int, default=None, help='Requests allowed per second')
+    args = parser.parse_args()
+
+    repo = SyntheticRepo(
+        RepoShape(
+            file_count=args.files,
+            depth=args.depth,
+            median_size=args.median_size,
+            large_files=args.large_files,
+            tags=args.tags,
+        )
+    )
+
+    with StandInServer(
+        repo, latency=args.latency, bandwidth=args.bandwidth, rate_limit=args.rate_limit, port=args.port
+    ) as server:
+        print(f'Serving https://github.com/{repo.name} at {server.url}')
+        print(f'Use it with: githubdl.Client(server_url={server.url!r})')
+
+        with contextlib.suppress(KeyboardInterrupt):
+            threading.Event().wait()
+
+
+if __name__ == '__main__':
+    main()
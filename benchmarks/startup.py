@@ -0,0 +1,74 @@
+"""
+Startup benchmark module
+
+Measure the import time of the package and the startup time of the command line, next to a bare interpreter.
+
+Usage: python -m benchmarks.startup [--repeat N] [--output results.ndjson]
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from .run import git_revision
+
+# Commands measured, each run in a fresh interpreter
+COMMANDS = {
+    'bare-interpreter': [sys.executable, '-c', 'pass'],
+    'import-githubdl': [sys.executable, '-c', 'import githubdl'],
+    'import-url-processing': [sys.executable, '-c', 'from githubdl import url_processing'],
+    'cli-help': [sys.executable, '-m', 'githubdl.cli', '--help'],
+    'import-api': [sys.executable, '-c', 'from githubdl import api'],
+}
+
+
+def measure(command: list[str], repeat: int) -> list[float]:
+    """
+    Return the wall times of repeat runs of a command
+    """
+    times = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, check=True)  # noqa: S603
+        times.append(time.perf_counter() - start)
+
+    return times
+
+
+def main() -> None:
+    """
+    Measure the commands and print their median wall time
+    """
+    parser = argparse.ArgumentParser(description='Startup benchmarks of githubdl')
+    parser.add_argument('--repeat', type=int, default=20, help='Number of runs per command (default: 20)')
+    parser.add_argument('--output', type=Path, help='NDJSON file to append the results to')
+    args = parser.parse_args()
+
+    context = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': sys.platform,
+    }
+
+    print(f'{"command":<24} {"median (ms)":>12} {"min (ms)":>9}')
+
+    for name, command in COMMANDS.items():
+        times = measure(command, args.repeat)
+        record = {'scenario': name, 'wall': statistics.median(times), 'wall_min': min(times), 'repeat': args.repeat}
+
+        print(f'{name:<24} {record["wall"] * 1000:>12.1f} {record["wall_min"] * 1000:>9.1f}', flush=True)
+
+        if args.output is not None:
+            with args.output.open('a', encoding='utf-8') as f:
+                f.write(f'{json.dumps({**context, **record})}\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,23 +4,45 @@ API module
 Exposed methods for the githubdl library
 """
 
+import os
 import re
+import shutil
+import time
+from base64 import b64decode
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
+from io import BytesIO
 from json import loads as json_loads
 from logging import getLogger
 from pathlib import Path
+from queue import SimpleQueue
+from threading import Lock
 
 from . import file_processing as fp
 from . import request_processing as rp
-
+from . import url_processing as up
+from .archive import ArchiveWriter, member_name
+from .blob_store import BlobStore
+from .client import Client, get_default_client
+from .journal import JOURNAL_NAME, Journal
+from .metrics import FileEvent
+from .path_filter import PathFilter
+from .range_file import RANGE_THRESHOLD, RANGE_WORKERS, RangeFile
+from .writer import BUFFERED_MAX_SIZE, IO_WORKERS, Writer
 
 _logger = getLogger('githubdl')
 
+_GITMODULES_SECTION = re.compile(r'^\s*\[')
+_GITMODULES_PATH = re.compile(r'^\s*path\s*=\s*(.*?)\s*$')
+_GITMODULES_URL = re.compile(r'^\s*url\s*=\s*(.*?)\s*$')
+
 
-def dl_info(repo_url: str, info_type: str) -> str:
+def dl_info(repo_url: str, info_type: str, client: Client | None = None) -> str:
     """
     Download github repository information
     """
-    return json_loads(rp.download_git_repo_info(repo_url, info_type).decode('utf-8'))
+    return Repository(repo_url, client).info(info_type)
 
 
 def dl_file(
@@ -28,16 +50,274 @@ def dl_file(
     file_name: str,
     target_filename: str | None = None,
     reference: str | None = None,
+    *,
+    client: Client | None = None,
+    blob_store: BlobStore | None = None,
 ) -> None:
     """
     Download a specific file
+
+    See Repository.download_file
     """
-    dest = Path(file_name).name if target_filename is None else target_filename
+    Repository(repo_url, client, blob_store).download_file(file_name, target_filename, reference)
 
-    fp.write_file(
-        Path(dest),
-        rp.download_git_file_content(repo_url, file_name, reference),
-    )
+
+class DownloadError(RuntimeError):
+    """
+    Raised when one or more files of a directory could not be downloaded
+
+    The `errors` attribute maps each failed repository path to its exception
+    """
+
+    def __init__(self, errors: dict[str, Exception]) -> None:
+        """
+        Build the error message from the failed paths
+        """
+        self.errors = errors
+        super().__init__(f'Unable to download {len(errors)} path(s): {", ".join(sorted(errors))}')
+
+
+class _FetchedCommits:
+    """
+    Registry of the repo@sha downloaded during a dl_dir run, so that each one is only fetched once
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty registry
+        """
+        self._lock = Lock()
+        self._commits: dict[tuple, tuple[Path, Future]] = {}
+
+    def claim(self, key: tuple, target_path: Path) -> tuple[Path, Future, bool]:
+        """
+        Register a download of key into target_path, unless it is already registered
+
+        Return the target path of the first download of key, a future completed once it is done,
+        and whether the caller owns that download (and must complete the future)
+        """
+        with self._lock:
+            if (fetched := self._commits.get(key)) is not None:
+                return (*fetched, False)
+
+            self._commits[key] = (target_path, Future())
+            return (*self._commits[key], True)
+
+
+@dataclass(frozen=True)
+class _DirDownload:
+    """
+    Settings shared by all the files of a dl_dir call, and by the submodules it downloads
+    """
+
+    repo_url: str
+    reference: str
+    target_path: str
+    client: Client
+    blob_store: BlobStore | None
+    writer: Writer
+    max_workers: int = 1
+    submodules: bool = False
+    via_archive: bool = False
+    sync: bool = False
+    delete: bool = False
+    graphql: bool = False
+    resume: bool = False
+    path_filter: PathFilter | None = None
+    fetched: _FetchedCommits = field(default_factory=_FetchedCommits)
+    urls: up.RepoUrls = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        """
+        Parse the repository URL once for all the files
+        """
+        object.__setattr__(self, 'urls', self.client.repo_urls(self.repo_url))
+
+
+class Repository:
+    """
+    Github repository, downloaded through a client
+
+    The repository URL is parsed, and the API base URLs built, once when the object is created:
+    each request then only appends its path to them. The resolved references and the responses
+    are cached by the client, so that they are shared by every repository using it.
+    """
+
+    def __init__(self, repo_url: str, client: Client | None = None, blob_store: BlobStore | None = None) -> None:
+        """
+        Parse the repository URL, and use `client` (or the default client) for all the requests
+        """
+        self.url = repo_url
+        self.client = client or get_default_client()
+        self.urls = self.client.repo_urls(repo_url)
+        self.blob_store = blob_store
+
+    def __repr__(self) -> str:
+        """
+        Return the representation of the repository
+        """
+        return f'Repository({self.url!r})'
+
+    @property
+    def name(self) -> str:
+        """
+        Name of the repository, as owner/name
+        """
+        return self.urls.repo_name
+
+    def resolve(self, reference: str | None = None) -> str:
+        """
+        Return the commit SHA of a reference, or of the default branch
+        """
+        return rp.resolve_reference(self.url, reference, self.client)
+
+    def info(self, info_type: str) -> dict | list:
+        """
+        Download repository information, e.g. 'commits' or 'releases'
+        """
+        return json_loads(rp.download_git_repo_info(self.url, info_type, self.client).decode('utf-8'))
+
+    def download_file(
+        self,
+        file_name: str,
+        target_filename: str | None = None,
+        reference: str | None = None,
+    ) -> None:
+        """
+        Download a specific file
+
+        With the blob store, the blob SHA of the file is looked up first: a file already in the store is not
+        downloaded, and a downloaded file is added to it
+        """
+        dest = Path(Path(file_name).name if target_filename is None else target_filename)
+        start = time.perf_counter()
+
+        # A single file is already a consistent read, only the caches need a commit SHA to be keyed by
+        if self.blob_store is not None or self.client.cache is not None:
+            reference = self.resolve(reference)
+
+        sha = data = None
+
+        if self.blob_store is not None:
+            info = rp.get_git_file_info(self.urls, file_name, reference, self.client)
+
+            if isinstance(info, dict) and info.get('type') == 'file':
+                sha = info['sha']
+
+                if self.blob_store.materialize(sha, dest):
+                    _record_file(self.client, dest, 'store', start)
+                    return
+
+                # Files up to 1 MB come with the metadata, larger ones are downloaded
+                if info.get('encoding') == 'base64':
+                    data = b64decode(info['content'])
+
+        if data is None:
+            with rp.stream_git_file_content(self.urls, file_name, reference, self.client) as stream:
+                fp.write_stream(dest, stream)
+        else:
+            fp.write_stream(dest, BytesIO(data))
+
+        _record_file(self.client, dest, 'rest', start)
+
+        if sha is not None:
+            # Only store content matching the metadata, so that the store can be trusted
+            if (actual_sha := fp.git_blob_sha(dest)) == sha:
+                self.blob_store.add(sha, dest)
+            else:
+                _logger.warning('Blob SHA mismatch for %s: expected %s, got %s', file_name, sha, actual_sha)
+
+    def download_dir(
+        self,
+        base_path: str,
+        target_path: str | None = None,
+        reference: str | None = None,
+        submodules: bool = False,
+        *,
+        max_workers: int = 1,
+        via_archive: bool = False,
+        sync: bool = False,
+        delete: bool = False,
+        graphql: bool = False,
+        resume: bool = False,
+        include: Iterable[str] | None = None,
+        exclude: Iterable[str] | None = None,
+        fsync: str = 'none',
+        io_workers: int = IO_WORKERS,
+        output_archive: str | Path | None = None,
+    ) -> None:
+        """
+        Download a specific directory
+
+        The options match the command line options of the same name, see the README
+        """
+        if target_path is None:
+            target_path = '.'
+
+        if via_archive:
+            # The tarball is extracted as is: no listing to compare, journal or blob SHAs
+            options = {'sync': sync, 'delete': delete, 'resume': resume, 'blob_store': self.blob_store is not None}
+
+            if conflicting := [k for k, v in options.items() if v]:
+                err_message = f'via_archive cannot be combined with: {", ".join(conflicting)}'
+                raise ValueError(err_message)
+
+        if output_archive is None:
+            writer = Writer(io_workers, fsync=fsync)
+        else:
+            options = {
+                'submodules': submodules,
+                'via_archive': via_archive,
+                'sync': sync,
+                'delete': delete,
+                'resume': resume,
+            }
+
+            if conflicting := [k for k, v in options.items() if v]:
+                err_message = f'output_archive cannot be combined with: {", ".join(conflicting)}'
+                raise ValueError(err_message)
+
+            # Reject a target path outside of the archive before downloading anything
+            member_name(Path(target_path))
+            writer = ArchiveWriter(Path(output_archive), io_workers, fsync=fsync)
+
+        self.client.resize_pool(max_workers)
+
+        with writer:
+            download = _DirDownload(
+                repo_url=self.url,
+                reference=self.resolve(reference),
+                target_path=target_path,
+                client=self.client,
+                blob_store=self.blob_store,
+                writer=writer,
+                max_workers=max_workers,
+                submodules=submodules,
+                via_archive=via_archive,
+                sync=sync,
+                delete=delete,
+                graphql=graphql,
+                resume=resume,
+                path_filter=PathFilter.from_patterns(include, exclude) if include or exclude else None,
+            )
+
+            _dl_dir(download, base_path.replace('\\', '/').strip('/'))
+
+    def tags(self, names: Iterable[str] | None = None, max_workers: int = 4) -> Iterator[dict]:
+        """
+        Iterate over the tags of the repository, as they are downloaded
+
+        With `names`, only these tags are yielded, and the pagination stops once they have all been found
+        """
+        return iter_info_list(self.url, 'tags', self.client, names, max_workers)
+
+    def branches(self, names: Iterable[str] | None = None, max_workers: int = 4) -> Iterator[dict]:
+        """
+        Iterate over the branches of the repository, as they are downloaded
+
+        With `names`, only these branches are yielded, and the pagination stops once they have all been found
+        """
+        return iter_info_list(self.url, 'branches', self.client, names, max_workers)
 
 
 def dl_dir(
@@ -46,81 +326,745 @@ def dl_dir(
     target_path: str | None = None,
     reference: str | None = None,
     submodules: bool = False,
+    *,
+    max_workers: int = 1,
+    via_archive: bool = False,
+    client: Client | None = None,
+    blob_store: BlobStore | None = None,
+    sync: bool = False,
+    delete: bool = False,
+    graphql: bool = False,
+    resume: bool = False,
+    include: Iterable[str] | None = None,
+    exclude: Iterable[str] | None = None,
+    fsync: str = 'none',
+    io_workers: int = IO_WORKERS,
+    output_archive: str | Path | None = None,
 ) -> None:
     """
     Download a specific directory
+
+    See Repository.download_dir
     """
-    files = rp.get_list_of_files_in_path(repo_url, base_path, reference)
+    Repository(repo_url, client, blob_store).download_dir(
+        base_path,
+        target_path,
+        reference,
+        submodules=submodules,
+        max_workers=max_workers,
+        via_archive=via_archive,
+        sync=sync,
+        delete=delete,
+        graphql=graphql,
+        resume=resume,
+        include=include,
+        exclude=exclude,
+        fsync=fsync,
+        io_workers=io_workers,
+        output_archive=output_archive,
+    )
 
-    for file_item, file_type in files.items():
-        if file_type == 'dir':
-            dl_dir(
-                repo_url=repo_url,
-                base_path=str(Path(base_path) / file_item),
-                target_path=target_path,
+
+def _dl_dir(download: _DirDownload, base_path: str) -> None:
+    """
+    Download a directory at the resolved reference, then its submodules
+    """
+    if download.via_archive:
+        _dl_dir_archive(download, base_path)
+        return
+
+    files, gitlinks = _list_dir(download, base_path)
+
+    journal_name = Path(download.target_path, JOURNAL_NAME)
+
+    if download.delete:
+        _delete_extra_files(download, base_path, files, gitlinks, journal_name)
+
+    download.writer.make_dirs([Path(download.target_path)])
+    # Nothing to resume from when the files go to an archive
+    journal = Journal(journal_name, resume=download.resume) if download.writer.on_disk else None
+    errors: dict[str, Exception] = {}
+    succeeded = False
+
+    try:
+        to_download = _files_to_download(download, files, journal)
+        download.writer.make_dirs({Path(download.target_path, x).parent for x in to_download})
+
+        errors = _dl_dir_files(download, to_download, journal)
+
+        if not errors and download.submodules:
+            gitmodules = [Path(download.target_path, x) for x in files if Path(x).name.lower() == '.gitmodules']
+            errors = _dl_submodules(download, gitmodules, gitlinks)
+
+        succeeded = not errors
+    finally:
+        if journal is not None:
+            journal.close(success=succeeded)
+
+    for download_filename, ex in sorted(errors.items()):
+        _logger.error('Unable to download %s: %s', download_filename, ex)
+
+    if errors:
+        raise DownloadError(errors)
+
+
+def _delete_extra_files(
+    download: _DirDownload,
+    base_path: str,
+    files: dict[str, rp.TreeEntry],
+    gitlinks: dict[str, rp.TreeEntry],
+    journal_name: Path,
+) -> None:
+    """
+    Delete the local files under the downloaded directory that are not part of the listing
+    """
+    root = Path(download.target_path, base_path)
+    path_filter = download.path_filter
+
+    fp.delete_extra_files(
+        root,
+        {Path(download.target_path, x) for x in files} | {journal_name},
+        # Submodule checkouts are synced by their own download
+        keep_dirs={Path(download.target_path, x) for x in gitlinks} if download.submodules else set(),
+        # Files filtered out are not part of the download
+        only=None if path_filter is None else lambda x: path_filter.match(x.relative_to(root).as_posix()),
+    )
+
+
+def _files_to_download(
+    download: _DirDownload,
+    files: dict[str, rp.TreeEntry],
+    journal: Journal | None,
+) -> dict[str, rp.TreeEntry]:
+    """
+    Return the files of the listing left to download, and record them as planned in the journal, if any
+
+    The files already written by an interrupted run are skipped, and with `sync` the local files up to date as well
+    """
+    to_download = files
+
+    if journal is not None:
+        to_download = {
+            k: v for k, v in files.items() if not journal.is_done(k, v.sha, Path(download.target_path, k), v.size)
+        }
+
+    if len(to_download) < len(files):
+        _logger.info('%d file(s) already downloaded by the interrupted run', len(files) - len(to_download))
+
+    if download.sync:
+        to_download = _changed_files(download, to_download)
+
+    if journal is not None:
+        journal.planned({k: v.sha for k, v in to_download.items()})
+
+    return to_download
+
+
+def _list_dir(download: _DirDownload, base_path: str) -> tuple[dict[str, rp.TreeEntry], dict[str, rp.TreeEntry]]:
+    """
+    List the files of a directory, and the gitlinks of its submodules, keyed by repository path
+
+    Only the files selected by the path filter, if any, are listed
+    """
+    path_filter = download.path_filter
+    prune = None if path_filter is None else path_filter.prune
+
+    files = {}
+    gitlinks = {}
+
+    for entry in rp.get_tree_listing(download.repo_url, base_path, download.reference, download.client, prune):
+        full_path = f'{base_path}/{entry.path}'.removeprefix('/')
+
+        if entry.type == 'blob':
+            if path_filter is None or path_filter.match(entry.path) or _is_kept_gitmodules(download, entry.path):
+                files[full_path] = entry
+        elif entry.type == 'commit' and (path_filter is None or not path_filter.prune(entry.path)):
+            gitlinks[full_path] = entry
+
+    return files, gitlinks
+
+
+def _is_kept_gitmodules(download: _DirDownload, path: str) -> bool:
+    """
+    Return True for the .gitmodules files, which are always needed to download the submodules
+    """
+    return download.submodules and Path(path).name.lower() == '.gitmodules'
+
+
+def _changed_files(download: _DirDownload, files: dict[str, rp.TreeEntry]) -> dict[str, rp.TreeEntry]:
+    """
+    Return the files that are missing under the target path or whose content differs from the listing
+
+    Local files are hashed concurrently
+    """
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        unchanged = list(
+            executor.map(
+                _is_up_to_date,
+                (Path(download.target_path, x) for x in files),
+                (entry.sha for entry in files.values()),
+            )
+        )
+
+    changed = {k: v for (k, v), same in zip(files.items(), unchanged, strict=True) if not same}
+
+    _logger.info('%d file(s) to download, %d file(s) up to date', len(changed), len(files) - len(changed))
+
+    return changed
+
+
+def _is_up_to_date(full_file_name: Path, sha: str) -> bool:
+    """
+    Return True if a local file exists and has the given blob SHA
+    """
+    try:
+        return fp.git_blob_sha(full_file_name) == sha
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        return False
+
+
+def _dl_dir_files(
+    download: _DirDownload,
+    files: dict[str, rp.TreeEntry],
+    journal: Journal | None = None,
+) -> dict[str, Exception]:
+    """
+    Download the files of a directory listing through a thread pool
+
+    The small files are handed over to the writer once downloaded, so that the download threads go on
+    with the next files while they are written.
+    With `graphql`, the small files are downloaded in batches first, and the files
+    a batch could not provide are then downloaded one by one.
+    Each written file is recorded in the journal, if any.
+    Return the errors per path
+    """
+    batches = _small_file_batches(files) if download.graphql else []
+    batched = {x for batch in batches for x in batch}
+    executor = ThreadPoolExecutor(max_workers=download.max_workers)
+    jobs = _FileJobs(download, files, journal, executor)
+
+    try:
+        jobs.submit_files({k: v for k, v in files.items() if k not in batched}, batches)
+        errors = jobs.wait()
+    except BaseException:
+        # Stop at once, e.g. on Ctrl-C, instead of running every queued download: --resume picks them up
+        executor.shutdown(wait=False, cancel_futures=True)
+        download.writer.cancel()
+        raise
+
+    executor.shutdown()
+
+    return errors
+
+
+class _FileJobs:
+    """
+    Downloads, batches and writes of a directory listing in progress, reported in a single queue as they complete
+    """
+
+    def __init__(
+        self,
+        download: _DirDownload,
+        files: dict[str, rp.TreeEntry],
+        journal: Journal | None,
+        executor: ThreadPoolExecutor,
+    ) -> None:
+        """
+        Initialize an empty set of jobs, run by executor
+        """
+        self._download = download
+        self._files = files
+        self._journal = journal
+        self._executor = executor
+        self._jobs: dict[Future, str | dict[str, rp.TreeEntry]] = {}
+        self._completed: SimpleQueue[Future] = SimpleQueue()
+
+    def submit_files(self, files: dict[str, rp.TreeEntry], batches: list[dict[str, rp.TreeEntry]]) -> None:
+        """
+        Submit the download of files one by one, and of batches with a single query each
+        """
+        for download_filename, entry in files.items():
+            self._track(
+                self._executor.submit(_dl_dir_file, self._download, download_filename, entry), download_filename
             )
+
+        for batch in batches:
+            self._add(self._executor.submit(_dl_dir_batch, self._download, batch), batch)
+
+    def wait(self) -> dict[str, Exception]:
+        """
+        Wait for the jobs, and for the ones they lead to, e.g. the writes of the downloaded files
+
+        Return the errors per path
+        """
+        errors: dict[str, Exception] = {}
+
+        while self._jobs:
+            future = self._completed.get()
+            job = self._jobs.pop(future)
+
+            if isinstance(job, dict):
+                remaining, written = _batch_result(future, job)
+
+                for download_filename, write in written.items():
+                    self._track(write, download_filename)
+
+                self.submit_files(remaining, [])
+                continue
+
+            try:
+                result = future.result()
+            except Exception as ex:  # ruff: ignore[blind-except] - a failed file is reported with the others at the end
+                errors[job] = ex
+            else:
+                # A download returns the future of its write, if the file is left to the writer
+                self._track(result, job)
+
+        return errors
+
+    def _track(self, future: Future | None, download_filename: str) -> None:
+        """
+        Wait for the future of a file, or record the file as done in the journal if there is none
+        """
+        if future is not None:
+            self._add(future, download_filename)
+        elif self._journal is not None:
+            self._journal.done(download_filename, self._files[download_filename].sha)
+
+    def _add(self, future: Future, job: str | dict[str, rp.TreeEntry]) -> None:
+        """
+        Add a job, reported in the queue once complete
+        """
+        self._jobs[future] = job
+        future.add_done_callback(self._completed.put)
+
+
+def _batch_result(
+    future: Future,
+    batch: dict[str, rp.TreeEntry],
+) -> tuple[dict[str, rp.TreeEntry], dict[str, Future | None]]:
+    """
+    Return the result of a completed batch download, or the whole batch left to download if it failed
+    """
+    try:
+        return future.result()
+    except Exception as ex:  # ruff: ignore[blind-except] - its files are downloaded one by one instead
+        _logger.warning('Batch download failed, downloading its files one by one: %s', ex)
+        return batch, {}
+
+
+def _small_file_batches(files: dict[str, rp.TreeEntry]) -> list[dict[str, rp.TreeEntry]]:
+    """
+    Group the files small enough for the GraphQL API into batches fitting in a single query
+    """
+    batches: list[dict[str, rp.TreeEntry]] = []
+    batch: dict[str, rp.TreeEntry] = {}
+    batch_size = 0
+
+    for download_filename, entry in files.items():
+        if entry.size is None or entry.size > rp.GRAPHQL_MAX_BLOB_SIZE:
+            continue
+
+        if len(batch) >= rp.GRAPHQL_BATCH_SIZE or batch_size + entry.size > rp.GRAPHQL_BATCH_BYTES:
+            batches.append(batch)
+            batch = {}
+            batch_size = 0
+
+        batch[download_filename] = entry
+        batch_size += entry.size
+
+    if batch:
+        batches.append(batch)
+
+    return batches
+
+
+def _dl_dir_batch(
+    download: _DirDownload,
+    batch: dict[str, rp.TreeEntry],
+) -> tuple[dict[str, rp.TreeEntry], dict[str, Future | None]]:
+    """
+    Download a batch of small files with a single GraphQL query and hand them over to the writer
+
+    Return the files that could not be downloaded this way, and the future of the write of the other files
+    (None for the files already written)
+    """
+    pending = {}
+    written: dict[str, Future | None] = {}
+    start = time.perf_counter()
+
+    for download_filename, entry in batch.items():
+        full_file_name = Path(download.target_path, download_filename)
+        download.writer.make_dirs([full_file_name.parent])
+
+        if download.blob_store is None or not download.writer.materialize(
+            download.blob_store, entry.sha, full_file_name, entry.mode
+        ):
+            pending[download_filename] = entry
         else:
-            download_filename = str(Path(base_path, file_item)).removeprefix('/')
-            file_content = rp.download_git_file_content(repo_url, download_filename, reference)
+            _record_file(download.client, full_file_name, 'store', start, entry.size)
+            written[download_filename] = None
 
-            if target_path is None:
-                target_path = '.'
+    if not pending:
+        return {}, written
 
-            full_file_name = Path(target_path, download_filename)
+    texts = rp.get_blob_texts(download.repo_url, list(pending), download.reference, download.client)
+    remaining = {}
 
-            fp.create_directory(full_file_name.parent)
+    for download_filename, entry in pending.items():
+        text = texts[download_filename]
+        data = None if text is None else text.encode()
 
-            fp.write_file(full_file_name, file_content)
+        # The text is decoded by Github: only keep it if it encodes back to the exact blob
+        if data is None or fp.git_blob_sha_bytes(data) != entry.sha:
+            remaining[download_filename] = entry
+            continue
 
-            if submodules and file_item.lower().endswith('.gitmodules'):
-                process_gitmodule(
-                    target_path,
-                    str(full_file_name),
+        written[download_filename] = download.writer.submit(
+            _write_file, download, download_filename, entry, data, source='graphql', start=start
+        )
+
+    return remaining, written
+
+
+def _dl_dir_archive(download: _DirDownload, base_path: str) -> None:
+    """
+    Download a directory by extracting it from the streamed repository tarball
+    """
+    path_filter = download.path_filter
+    start = time.perf_counter()
+
+    with rp.open_git_archive(download.repo_url, download.reference, download.client) as stream:
+        extracted = fp.extract_tar_stream(
+            stream,
+            base_path,
+            Path(download.target_path),
+            None if path_filter is None else lambda x: path_filter.match(x) or _is_kept_gitmodules(download, x),
+        )
+
+    for full_file_name in extracted:
+        _record_file(download.client, full_file_name, 'archive', start)
+        download.writer.written(full_file_name)
+
+    if not download.submodules:
+        return
+
+    if not (gitmodules := [x for x in extracted if x.name.lower() == '.gitmodules']):
+        return
+
+    # The tarball does not hold the submodule commits, only the tree listing does
+    _, gitlinks = _list_dir(download, base_path)
+
+    if errors := _dl_submodules(download, gitmodules, gitlinks):
+        for path, ex in sorted(errors.items()):
+            _logger.error('Unable to download %s: %s', path, ex)
+
+        raise DownloadError(errors)
+
+
+def _dl_dir_file(download: _DirDownload, download_filename: str, entry: rp.TreeEntry) -> Future | None:
+    """
+    Download a single file of a directory and write it under the target path
+
+    Small files are read in memory and handed over to the writer: return the future of their write,
+    or None once the file is written
+    """
+    full_file_name = Path(download.target_path, download_filename)
+    start = time.perf_counter()
+
+    download.writer.make_dirs([full_file_name.parent])
+
+    if download.blob_store is not None and download.writer.materialize(
+        download.blob_store, entry.sha, full_file_name, entry.mode
+    ):
+        _record_file(download.client, full_file_name, 'store', start, entry.size)
+        return None
+
+    if entry.size is not None and entry.size >= RANGE_THRESHOLD:
+        with download.writer.local_file(full_file_name, entry.mode) as local_name:
+            _dl_large_file(download, download_filename, entry, local_name)
+
+            if download.blob_store is not None:
+                # Already checked against the listing
+                download.blob_store.add(entry.sha, local_name)
+
+        _record_file(download.client, full_file_name, 'ranges', start, entry.size)
+        return None
+
+    with rp.stream_git_file_content(download.urls, download_filename, download.reference, download.client) as stream:
+        if entry.size is not None and entry.size <= BUFFERED_MAX_SIZE:
+            data = stream.read()
+        else:
+            size = download.writer.write_stream(full_file_name, stream, entry.mode)
+            data = None
+
+    if data is not None:
+        return download.writer.submit(_write_file, download, download_filename, entry, data, source='rest', start=start)
+
+    _record_file(download.client, full_file_name, 'rest', start, size)
+
+    # The content is only kept on disk: an archive member cannot be added to the store
+    if download.blob_store is not None and download.writer.on_disk:
+        # Only store content matching the listing, so that the store can be trusted
+        if (sha := fp.git_blob_sha(full_file_name)) == entry.sha:
+            download.blob_store.add(sha, full_file_name)
+        else:
+            _logger.warning('Blob SHA mismatch for %s: expected %s, got %s', download_filename, entry.sha, sha)
+
+    return None
+
+
+def _write_file(
+    download: _DirDownload,
+    download_filename: str,
+    entry: rp.TreeEntry,
+    data: bytes,
+    *,
+    source: str,
+    start: float,
+) -> None:
+    """
+    Write the downloaded content of a file under the target path, from an I/O thread of the writer
+    """
+    full_file_name = Path(download.target_path, download_filename)
+
+    download.writer.write_bytes(full_file_name, data, entry.mode)
+    _record_file(download.client, full_file_name, source, start, len(data))
+
+    if download.blob_store is not None and download.writer.on_disk:
+        # Only store content matching the listing, so that the store can be trusted
+        if (sha := fp.git_blob_sha_bytes(data)) == entry.sha:
+            download.blob_store.add(sha, full_file_name)
+        else:
+            _logger.warning('Blob SHA mismatch for %s: expected %s, got %s', download_filename, entry.sha, sha)
+
+
+def _record_file(client: Client | None, file_name: Path, source: str, start: float, size: int | None = None) -> None:
+    """
+    Record a written file in the metrics of the client, if any
+
+    The size is read from the file if not given
+    """
+    if (metrics := (client or get_default_client()).metrics) is not None:
+        if size is None:
+            size = file_name.stat().st_size
+
+        metrics.record(FileEvent(str(file_name), size, time.perf_counter() - start, source))
+
+
+def _dl_large_file(download: _DirDownload, download_filename: str, entry: rp.TreeEntry, file_name: Path) -> None:
+    """
+    Download a large file by byte ranges, concurrently, through the raw content endpoint, to file_name
+
+    The Contents API is limited to 100 MB and a single connection per file. Ranges already downloaded
+    by an interrupted previous run are not downloaded again.
+    """
+    max_workers = max(download.max_workers, RANGE_WORKERS)
+    download.client.resize_pool(max_workers)
+
+    with RangeFile(file_name, entry.sha, entry.size) as range_file:
+        if pending := range_file.pending():
+            if len(pending) < len(range_file.chunks):
+                _logger.info(
+                    'Resuming download of %s: %d/%d ranges left',
+                    download_filename,
+                    len(pending),
+                    len(range_file.chunks),
                 )
 
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for future in as_completed(
+                    executor.submit(_dl_file_range, download, download_filename, range_file, index) for index in pending
+                ):
+                    future.result()
+
+        range_file.commit()
 
-def process_gitmodule(target_path: str, full_filename: str) -> None:
+
+def _dl_file_range(download: _DirDownload, download_filename: str, range_file: RangeFile, index: int) -> None:
     """
-    Process git sub modules
+    Download a byte range of a large file into its range file
     """
-    with Path(full_filename).open(encoding='utf-8') as f:
-        content = [x.strip() for x in f]
+    start, end = range_file.chunks[index]
+
+    with rp.stream_git_file_range(
+        download.urls, download_filename, download.reference, start, end, client=download.client
+    ) as stream:
+        range_file.write_chunk(index, stream)
 
-    path = None
-    url = None
 
-    path_pred = re.compile(r'^\s*path\s*=\s*(.*)$')
-    url_pred = re.compile(r'^\s*url\s*=\s*(.*)$')
+def parse_gitmodules(content: str) -> dict[str, str]:
+    """
+    Parse the content of a .gitmodules file
 
-    for line in content:
-        if not path:
-            path = path_pred.search(line)
+    Return the URL of each submodule, keyed by its path
+    """
+    submodules = {}
+    path = url = None
 
-        if not url:
-            url = url_pred.search(line)
+    for line in content.splitlines():
+        if _GITMODULES_SECTION.match(line):
+            path = url = None
+        elif match := _GITMODULES_PATH.match(line):
+            path = match.group(1)
+        elif match := _GITMODULES_URL.match(line):
+            url = match.group(1)
 
         if path and url:
-            tmp_path = Path(target_path) / path.group(1)
-            tmp_url = url.group(1)
+            submodules[path] = url
             path = url = None
-            fp.create_directory(tmp_path)
-            dl_dir(
-                repo_url=tmp_url,
-                base_path='/',
-                target_path=str(tmp_path),
-                submodules=True,
+
+    return submodules
+
+
+def _dl_submodules(
+    download: _DirDownload,
+    gitmodules: list[Path],
+    gitlinks: dict[str, rp.TreeEntry],
+) -> dict[str, Exception]:
+    """
+    Download the submodules declared by downloaded .gitmodules files, through a thread pool
+
+    Each submodule is downloaded at the commit of its gitlink in the parent tree.
+    Return the errors per submodule path
+    """
+    jobs = {}
+
+    for full_file_name in sorted(gitmodules):
+        for path, url in parse_gitmodules(full_file_name.read_text(encoding='utf-8')).items():
+            if (gitlink := gitlinks.get(path)) is None:
+                _logger.warning('Skipping submodule %s: no gitlink in the downloaded tree', path)
+                continue
+
+            jobs[path] = (up.resolve_submodule_url(download.repo_url, url), gitlink)
+
+    errors: dict[str, Exception] = {}
+
+    with ThreadPoolExecutor(max_workers=download.max_workers) as executor:
+        futures = {
+            executor.submit(_dl_submodule, download, path, url, gitlink): path for path, (url, gitlink) in jobs.items()
+        }
+
+        for future in as_completed(futures):
+            if (ex := future.exception()) is not None:
+                errors[futures[future]] = ex
+
+    return errors
+
+
+def _dl_submodule(download: _DirDownload, path: str, repo_url: str, gitlink: rp.TreeEntry) -> None:
+    """
+    Download a submodule at a commit, or copy it if this repo@sha was already fetched during the run
+    """
+    target_path = Path(download.target_path, path)
+    sha = gitlink.sha
+
+    # The patterns apply to the submodule files as if they were part of the parent directory
+    path_filter = None if download.path_filter is None else download.path_filter.under(gitlink.path)
+
+    _, domain_name, repo_name = up.get_url_components(repo_url)
+    repo = repo_url if repo_name is None else f'{domain_name}/{repo_name}'.lower()
+
+    source_path, fetched, owned = download.fetched.claim((repo, sha, path_filter), target_path)
+
+    if not owned:
+        if target_path.is_relative_to(source_path):
+            _logger.warning(
+                'Skipping submodule %s: %s@%s is already being downloaded to %s', path, repo, sha, source_path
             )
+            return
 
+        fetched.result()
+        _logger.info('Copying submodule %s@%s from: %s', repo, sha, source_path)
+        shutil.copytree(source_path, target_path, symlinks=True, dirs_exist_ok=True)
+        return
 
-def dl_tags(repo_url: str) -> str:
+    _logger.info('Downloading submodule %s: %s@%s', path, repo_url, sha)
+
+    try:
+        submodule = replace(
+            download, repo_url=repo_url, reference=sha, target_path=str(target_path), path_filter=path_filter
+        )
+        download.writer.make_dirs([target_path])
+        _dl_dir(submodule, '')
+    except BaseException as ex:
+        fetched.set_exception(ex)
+        raise
+
+    fetched.set_result(target_path)
+
+
+def iter_info_list(
+    repo_url: str,
+    info_type: str,
+    client: Client | None = None,
+    names: Iterable[str] | None = None,
+    max_workers: int = 4,
+) -> Iterator[dict]:
+    """
+    Iterate over all the items of a paginated github repository information list
+
+    Pages are fetched concurrently and items are yielded as soon as their page arrives.
+    With `names`, only the items with one of these names are yielded, and the pagination stops
+    as soon as all of them have been found
+    """
+    wanted = None if names is None else set(names)
+
+    for page in rp.iter_git_repo_info_pages(repo_url, info_type, client, max_workers):
+        for item in page:
+            if wanted is None:
+                yield item
+            elif item.get('name') in wanted:
+                wanted.discard(item['name'])
+                yield item
+
+        if wanted is not None and not wanted:
+            return
+
+
+def iter_tags(
+    repo_url: str,
+    client: Client | None = None,
+    names: Iterable[str] | None = None,
+    max_workers: int = 4,
+) -> Iterator[dict]:
+    """
+    Iterate over the tags of the repo, as they are downloaded
+    """
+    return Repository(repo_url, client).tags(names, max_workers)
+
+
+def iter_branches(
+    repo_url: str,
+    client: Client | None = None,
+    names: Iterable[str] | None = None,
+    max_workers: int = 4,
+) -> Iterator[dict]:
+    """
+    Iterate over the branches of the repo, as they are downloaded
+    """
+    return Repository(repo_url, client).branches(names, max_workers)
+
+
+def dl_tags(
+    repo_url: str,
+    client: Client | None = None,
+    names: Iterable[str] | None = None,
+    max_workers: int = 4,
+) -> list[dict]:
     """
     Download the list of tags for the repo
     """
-    return dl_info(repo_url, 'tags')
+    return list(iter_tags(repo_url, client, names, max_workers))
 
 
-def dl_branches(repo_url: str) -> str:
+def dl_branches(
+    repo_url: str,
+    client: Client | None = None,
+    names: Iterable[str] | None = None,
+    max_workers: int = 4,
+) -> list[dict]:
     """
     Download the list of branches for the repo
     """
-    return dl_info(repo_url, 'branches')
+    return list(iter_branches(repo_url, client, names, max_workers))
@@ -0,0 +1,281 @@
+"""
+Archive module
+
+Output stage writing the files of a directory download into a single tar or zip archive, instead of the filesystem
+"""
+
+import gzip
+import io
+import os
+import posixpath
+import shutil
+import stat
+import tarfile
+import tempfile
+import time
+import zipfile
+from collections.abc import Generator, Iterable
+from contextlib import contextmanager
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import TYPE_CHECKING, BinaryIO
+
+from . import file_processing as fp
+from .writer import IO_WORKERS, QUEUE_SIZE, Writer, _fsync
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+if TYPE_CHECKING:
+    from .blob_store import BlobStore
+
+_logger = getLogger('githubdl')
+
+# Archive format of each supported file name suffix
+ARCHIVE_FORMATS = {
+    '.tar.gz': 'tar.gz',
+    '.tgz': 'tar.gz',
+    '.tar.zst': 'tar.zst',
+    '.tzst': 'tar.zst',
+    '.zip': 'zip',
+}
+
+# Compression levels: the defaults of gzip and zstd, trading ratio for speed
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Streamed content is buffered in memory up to this size before being appended, in a temporary file beyond
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Permissions of the members, from the git mode of the listing
+_GIT_MODES = {'100755': 0o755, '120000': 0o777}
+_SYMLINK_MODE = '120000'
+
+
+def archive_format(file_name: Path) -> str:
+    """
+    Return the archive format matching the suffix of file_name
+    """
+    name = file_name.name.lower()
+
+    for suffix, archive_type in ARCHIVE_FORMATS.items():
+        if name.endswith(suffix):
+            return archive_type
+
+    err_message = f'Unsupported archive: {file_name} (expected one of: {", ".join(ARCHIVE_FORMATS)})'
+    raise ValueError(err_message)
+
+
+def member_name(file_name: Path) -> str:
+    """
+    Return the name of the archive member of file_name, normalized relative to the archive root
+
+    Raise a ValueError if file_name is outside of the archive root
+    """
+    name = posixpath.normpath((file_name.relative_to(file_name.anchor) if file_name.anchor else file_name).as_posix())
+
+    if name == '..' or name.startswith('../'):
+        err_message = f'Path outside of the archive: {file_name}'
+        raise ValueError(err_message)
+
+    return name
+
+
+class ArchiveWriter(Writer):
+    """
+    Writer of the files of a download into a tar.gz, tar.zst or zip archive
+
+    The files are appended to the archive as members named after their path, with the permissions of their git mode;
+    symlinks are stored as such. Nothing but the archive is written to the target directory: large streamed files
+    are only spooled to a temporary file, as an archive member cannot be appended before its size is known.
+
+    The downloads and the I/O threads run concurrently, only the append of a member to the archive is serialized.
+    The archive is written to a temporary file, renamed into place once the download succeeds and removed if it fails.
+    With an fsync policy other than 'none', the archive is synced to disk before being renamed.
+    """
+
+    on_disk = False
+
+    def __init__(
+        self,
+        file_name: Path,
+        io_workers: int = IO_WORKERS,
+        queue_size: int = QUEUE_SIZE,
+        fsync: str = 'none',
+    ) -> None:
+        """
+        Open a temporary archive next to file_name, and start the I/O threads
+        """
+        self.format = archive_format(file_name)
+
+        if self.format == 'tar.zst' and zstandard is None:
+            err_message = 'zstandard is required to write .tar.zst archives: pip install githubdl[zstd]'
+            raise RuntimeError(err_message)
+
+        super().__init__(io_workers, queue_size, fsync)
+
+        self.file_name = file_name
+        self.mtime = time.time()
+        self._append_lock = Lock()
+
+        file_name.parent.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp_path = fp.make_temp_file(file_name)
+        self._file = os.fdopen(fd, 'wb')
+        self._compressor = None
+
+        _logger.info('Writing the files to the archive: %s', file_name)
+
+        if self.format == 'zip':
+            self._archive = zipfile.ZipFile(self._file, 'w', compression=zipfile.ZIP_DEFLATED)
+            return
+
+        if self.format == 'tar.gz':
+            self._compressor = gzip.GzipFile(str(file_name), 'wb', compresslevel=GZIP_LEVEL, fileobj=self._file)
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1).stream_writer(
+                self._file, closefd=False
+            )
+
+        # ruff: ignore[open-file-with-context-handler] - closed, along with the compressor, by close()
+        self._archive = tarfile.open(fileobj=self._compressor, mode='w|')
+
+    def make_dirs(self, dir_names: Iterable[Path]) -> None:
+        """
+        Nothing to create: the directories are implied by the member names
+        """
+
+    def write_bytes(self, file_name: Path, data: bytes, mode: str | None = None) -> None:
+        """
+        Append in-memory content to the archive
+        """
+        self._append(file_name, io.BytesIO(data), len(data), mode)
+
+    def write_stream(self, file_name: Path, stream: BinaryIO, mode: str | None = None) -> int:
+        """
+        Spool streamed content, then append it to the archive
+
+        Return the number of bytes written
+        """
+        with tempfile.SpooledTemporaryFile(SPOOL_MAX_SIZE, dir=self.file_name.parent) as spool:
+            shutil.copyfileobj(stream, spool)
+            size = spool.tell()
+            spool.seek(0)
+            self._append(file_name, spool, size, mode)
+
+        return size
+
+    def written(self, file_name: Path) -> None:
+        """
+        Nothing to sync: the archive is synced as a whole when closed
+        """
+
+    def materialize(self, blob_store: 'BlobStore', sha: str, file_name: Path, mode: str | None = None) -> bool:
+        """
+        Append a blob of the store to the archive
+
+        Return False if the blob is not in the store
+        """
+        try:
+            f = blob_store.path(sha).open('rb')
+        except FileNotFoundError:
+            return False
+
+        with f:
+            self._append(file_name, f, os.fstat(f.fileno()).st_size, mode)
+
+        return True
+
+    @contextmanager
+    def local_file(self, file_name: Path, mode: str | None = None) -> Generator[Path, None, None]:
+        """
+        Yield a temporary path to write file_name to, then append it to the archive
+        """
+        with tempfile.TemporaryDirectory(dir=self.file_name.parent, prefix=f'.{self.file_name.name}.') as tmp_dir:
+            local_name = Path(tmp_dir, file_name.name)
+            yield local_name
+
+            with local_name.open('rb') as f:
+                self._append(file_name, f, os.fstat(f.fileno()).st_size, mode)
+
+    def close(self, success: bool = True) -> None:
+        """
+        Wait for the queued writes, then finish the archive and move it into place, or remove it on failure
+        """
+        super().close()
+
+        try:
+            self._archive.close()
+
+            if self._compressor is not None:
+                self._compressor.close()
+
+            if success and self.fsync != 'none':
+                self._file.flush()
+                os.fsync(self._file.fileno())
+        except BaseException:
+            success = False
+            raise
+        finally:
+            self._file.close()
+
+            if success:
+                self._tmp_path.replace(self.file_name)
+            else:
+                self._tmp_path.unlink(missing_ok=True)
+
+        # The rename into place is only durable once the directory is synced as well
+        if success and self.fsync != 'none' and os.name != 'nt':
+            _fsync(self.file_name.parent)
+
+    def __exit__(self, exc_type: type[BaseException] | None, *_args: object) -> None:
+        """
+        Close the writer when leaving the context, discarding the archive if an exception was raised
+        """
+        self.close(success=exc_type is None)
+
+    def _append(self, file_name: Path, f: BinaryIO, size: int, mode: str | None) -> None:
+        """
+        Append the content of f, size bytes, as the member of file_name
+        """
+        name = member_name(file_name)
+        permissions = _GIT_MODES.get(mode, 0o644)
+
+        with self._append_lock:
+            if self.format == 'zip':
+                self._append_zip(name, f, size, mode, permissions)
+            else:
+                self._append_tar(name, f, size, mode, permissions)
+
+    def _append_tar(self, name: str, f: BinaryIO, size: int, mode: str | None, permissions: int) -> None:
+        """
+        Append a member to the tar archive
+        """
+        info = tarfile.TarInfo(name)
+        info.mode = permissions
+        info.mtime = int(self.mtime)
+
+        # Like the Contents API, the content of a symlink is its target
+        if mode == _SYMLINK_MODE:
+            info.type = tarfile.SYMTYPE
+            info.linkname = f.read(size).decode()
+            self._archive.addfile(info)
+            return
+
+        info.size = size
+        self._archive.addfile(info, f)
+
+    def _append_zip(self, name: str, f: BinaryIO, size: int, mode: str | None, permissions: int) -> None:
+        """
+        Append a member to the zip archive
+        """
+        info = zipfile.ZipInfo(name, time.localtime(self.mtime)[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        # Unix attributes, so that the permissions and symlinks are restored on extraction
+        info.create_system = 3
+        info.external_attr = ((stat.S_IFLNK if mode == _SYMLINK_MODE else stat.S_IFREG) | permissions) << 16
+
+        with self._archive.open(info, 'w', force_zip64=size >= zipfile.ZIP64_LIMIT) as member:
+            shutil.copyfileobj(f, member)
@@ -0,0 +1,151 @@
+"""
+Blob store module
+
+Local content-addressed store of the downloaded files, keyed by their git blob SHA
+"""
+
+import os
+import shutil
+import stat
+import time
+from contextlib import suppress
+from logging import getLogger
+from pathlib import Path
+
+from . import file_processing as fp
+
+_logger = getLogger('githubdl')
+
+
+class BlobStore:
+    """
+    Content-addressed store of git blobs
+
+    Each blob is copied once into the store under its SHA-1, then hardlinked (or copied when hardlinks
+    are not possible, e.g. across file systems) into every target path that needs it.
+    Stored blobs are read-only: since the materialized files share their inode,
+    modifying one in place would otherwise corrupt the store.
+    """
+
+    def __init__(self, root: str | Path) -> None:
+        """
+        Create the store directory if needed
+        """
+        self.root = Path(root)
+        self.objects = self.root / 'objects'
+        self.objects.mkdir(parents=True, exist_ok=True)
+
+    def path(self, sha: str) -> Path:
+        """
+        Return the path of a blob in the store
+        """
+        return self.objects / sha[:2] / sha[2:]
+
+    def has(self, sha: str) -> bool:
+        """
+        Return True if the blob is in the store
+        """
+        return self.path(sha).is_file()
+
+    def add(self, sha: str, file_name: Path) -> None:
+        """
+        Add a file to the store under the given blob SHA
+
+        The file is copied rather than hardlinked: it belongs to the caller, and must neither become read-only
+        nor be able to corrupt the store when modified in place
+        """
+        blob_path = self.path(sha)
+
+        if blob_path.exists():
+            return
+
+        _logger.debug('Adding blob %s to the store from: %s', sha, file_name)
+
+        blob_path.parent.mkdir(exist_ok=True)
+        fd, tmp_path = fp.make_temp_file(blob_path)
+        os.close(fd)
+
+        try:
+            shutil.copyfile(file_name, tmp_path)
+            tmp_path.chmod(stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            tmp_path.replace(blob_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def materialize(self, sha: str, file_name: Path) -> bool:
+        """
+        Create file_name from the stored blob, as a hardlink when possible or as a copy otherwise
+
+        Return False if the blob is not in the store
+        """
+        blob_path = self.path(sha)
+
+        fd, tmp_path = fp.make_temp_file(file_name)
+        os.close(fd)
+
+        try:
+            tmp_path.unlink()
+
+            try:
+                tmp_path.hardlink_to(blob_path)
+            except FileNotFoundError:
+                return False
+            except OSError:
+                shutil.copyfile(blob_path, tmp_path)
+
+            tmp_path.replace(file_name)
+        except FileNotFoundError:
+            return False
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        _logger.info('Writing to file: %s (from blob store)', file_name)
+
+        with suppress(OSError):
+            # Mark the blob as recently used for the garbage collection
+            os.utime(blob_path)
+
+        return True
+
+    def gc(self, max_age: float | None = None, max_size: int | None = None) -> tuple[int, int]:
+        """
+        Remove the blobs unused for more than max_age seconds, then the least recently used ones
+
+        Blobs are removed until the store fits in max_size bytes.
+        Return the number of removed blobs and the number of bytes freed
+        """
+        blobs = []
+
+        for path in self.objects.glob('*/*'):
+            try:
+                blob_stat = path.stat()
+            except FileNotFoundError:
+                continue
+
+            blobs.append((blob_stat.st_mtime, blob_stat.st_size, path))
+
+        blobs.sort()
+
+        total = sum(size for _, size, _ in blobs)
+        oldest = time.time() - max_age if max_age is not None else None
+
+        removed = freed = 0
+
+        for mtime, size, path in blobs:
+            too_old = oldest is not None and mtime < oldest
+            too_big = max_size is not None and total > max_size
+
+            if not (too_old or too_big):
+                # Blobs are sorted by last use: the next ones are neither older nor needed to fit in max_size
+                break
+
+            _logger.debug('Removing blob: %s', path)
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+            freed += size
+
+        _logger.info('Removed %d blob(s), %d bytes freed', removed, freed)
+
+        return removed, freed
@@ -0,0 +1,242 @@
+"""
+HTTP cache module
+
+Persistent on-disk cache of the Github API responses, revalidated with conditional requests
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+from contextlib import suppress
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import BinaryIO
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from urllib3.response import HTTPResponse
+
+from . import file_processing as fp
+
+_logger = getLogger('githubdl')
+
+# Default maximum size of the cache
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+# Headers that describe the transfer rather than the body, and are not kept in the cache
+_TRANSFER_HEADERS = frozenset(('content-encoding', 'content-length', 'transfer-encoding', 'connection'))
+
+# Temporary files older than this are considered left over by a dead process
+_STALE_TMP_AGE = 3600
+
+
+class _Entry(io.BufferedReader):
+    """
+    Opened cache entry, closed as soon as it is read to the end so that a consumed response does not hold it open
+    """
+
+    def read(self, size: int | None = -1) -> bytes:
+        """
+        Read up to size bytes, closing the entry at its end
+        """
+        data = super().read(size)
+
+        if size is None or size < 0 or (size and not data):
+            self.close()
+
+        return data
+
+
+class HttpCache:
+    """
+    Size bounded on-disk cache of HTTP responses, keyed by request URL
+
+    Each entry is a single file holding a JSON header line (URL and response headers) followed by the body.
+    Entries are written to a temporary file then atomically renamed, and the least recently used ones are
+    evicted once the cache grows over max_size, so several processes can share the same directory.
+    """
+
+    def __init__(self, cache_dir: str | Path, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        """
+        Create the cache directory if needed
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = Lock()
+        # Size estimate, computed by the first eviction scan then kept up to date by this process
+        self._size: int | None = None
+
+    def _entry_path(self, http_url: str, variant: str | None = None) -> Path:
+        """
+        Return the path of the cache entry of an URL
+
+        The variant identifies what else the response depends on, e.g. the credentials and the Accept header:
+        each variant of an URL has its own entry
+        """
+        key = hashlib.sha256((http_url if variant is None else f'{http_url}\n{variant}').encode('utf-8')).hexdigest()
+        return self.cache_dir / key[:2] / key
+
+    def validators(self, http_url: str, variant: str | None = None) -> dict[str, str]:
+        """
+        Return the conditional request headers that revalidate the cached response of an URL
+        """
+        if (entry := self.open(http_url, variant)) is None:
+            return {}
+
+        with entry:
+            headers = json.loads(entry.readline())['headers']
+
+        validators = {}
+        if etag := headers.get('ETag'):
+            validators['If-None-Match'] = etag
+        if last_modified := headers.get('Last-Modified'):
+            validators['If-Modified-Since'] = last_modified
+
+        return validators
+
+    def open(self, http_url: str, variant: str | None = None) -> BinaryIO | None:
+        """
+        Open the cache entry of an URL, if any, and mark it as recently used
+        """
+        entry_path = self._entry_path(http_url, variant)
+
+        try:
+            entry = _Entry(io.FileIO(entry_path))
+        except FileNotFoundError:
+            return None
+
+        with suppress(OSError):
+            # Fails if evicted by another process in the meantime, the open file is still readable
+            os.utime(entry_path)
+
+        return entry
+
+    def response(self, http_url: str, variant: str | None = None) -> requests.Response | None:
+        """
+        Build a response from the cache entry of an URL, with the body streamed from disk
+        """
+        if (entry := self.open(http_url, variant)) is None:
+            return None
+
+        _logger.debug('Cache hit for url: %s', http_url)
+
+        return self._response(entry)
+
+    @staticmethod
+    def _response(entry: BinaryIO) -> requests.Response:
+        """
+        Build a response from an opened cache entry
+        """
+        meta = json.loads(entry.readline())
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = meta['url']
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response.raw = HTTPResponse(
+            body=entry,
+            headers=meta['headers'],
+            status=200,
+            preload_content=False,
+            decode_content=False,
+        )
+
+        return response
+
+    def store(self, http_url: str, response: requests.Response, variant: str | None = None) -> requests.Response:
+        """
+        Store a response in the cache and return an equivalent response read back from the cache
+
+        The body is copied from the network to disk chunk by chunk, so it is never fully loaded in memory
+        """
+        entry_path = self._entry_path(http_url, variant)
+        entry_path.parent.mkdir(exist_ok=True)
+
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _TRANSFER_HEADERS}
+        response.raw.decode_content = True
+
+        fd, tmp_path = fp.make_temp_file(entry_path)
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(json.dumps({'url': http_url, 'headers': headers}).encode('utf-8') + b'\n')
+                shutil.copyfileobj(response.raw, f)
+                size = f.tell()
+
+            # Open the entry before renaming it so that a concurrent eviction cannot remove it under our feet
+            entry = _Entry(io.FileIO(tmp_path))
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        finally:
+            response.close()
+
+        try:
+            tmp_path.replace(entry_path)
+        except OSError:
+            # The entry is still served, the left over temporary file will be removed by a later eviction
+            _logger.debug('Unable to store cache entry for url: %s', http_url, exc_info=True)
+        else:
+            self._account(size)
+
+        return self._response(entry)
+
+    def _account(self, size: int) -> None:
+        """
+        Account for a new entry, and evict the least recently used entries if the cache is too big
+        """
+        with self._lock:
+            if self._size is not None:
+                self._size += size
+
+            if self._size is None or self._size > self.max_size:
+                self._size = self.evict()
+
+    def evict(self, max_size: int | None = None) -> int:
+        """
+        Remove the least recently used entries until the cache fits in max_size
+
+        Temporary files left over by dead processes are removed too.
+        Return the size of the cache after the eviction
+        """
+        max_size = self.max_size if max_size is None else max_size
+
+        entries = []
+        now = time.time()
+
+        for path in self.cache_dir.glob('*/*'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+
+            if path.name.endswith('.tmp'):
+                if now - stat.st_mtime > _STALE_TMP_AGE:
+                    path.unlink(missing_ok=True)
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+
+        if total <= max_size:
+            return total
+
+        # Leave some headroom so that the next stores do not trigger an eviction right away
+        target = max_size * 9 // 10
+
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+
+            _logger.debug('Evicting cache entry: %s', path)
+            path.unlink(missing_ok=True)
+            total -= size
+
+        return total
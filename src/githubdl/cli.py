@@ -0,0 +1,452 @@
+"""
+Command line module
+
+Entry point of the githubdl console script. Only the standard library is imported at module level:
+the HTTP stack, the download code and the logging formatter are loaded once the arguments are parsed,
+so that --help and usage errors return as fast as the interpreter starts.
+"""
+
+import argparse
+import logging
+from os import environ
+from pathlib import Path
+from sys import exit as sys_exit
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .blob_store import BlobStore
+    from .client import Client
+
+_logger = logging.getLogger('githubdl')
+
+
+def set_github_token(github_token: str) -> bool:
+    """
+    Set the github token at env level
+
+    If not github token was passed as parameter and
+    GITHUB_TOKEN is not set in the environment an exception will be raised
+    """
+    if not environ.get('GITHUB_TOKEN', ''):
+        if not github_token:
+            _logger.critical(
+                "No Github token found, either as a parameter or in the environment variable 'GITHUB_TOKEN'"
+            )
+            return False
+
+        environ['GITHUB_TOKEN'] = github_token
+
+    return True
+
+
+def set_log_level(args: dict[str, str]) -> int:
+    """
+    Set the log level based on the log_level arg
+    """
+    log_level = logging.INFO
+
+    if (level := args.get('log_level')) is not None:
+        match level:
+            case 'DEBUG':
+                log_level = logging.DEBUG
+            case 'INFO':
+                log_level = logging.INFO
+            case 'WARN':
+                log_level = logging.WARNING
+            case 'ERROR':
+                log_level = logging.ERROR
+            case 'CRITICAL':
+                log_level = logging.CRITICAL
+
+    if args['tags'] or args['branches']:
+        log_level = logging.WARNING
+
+    return log_level
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser of the command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description=(
+            'Github Path Downloader. '
+            'Download files and directories from Github easily. '
+            'Works with Github and Github Enterprise.'
+        )
+    )
+    group = parser.add_mutually_exclusive_group(required=True)
+
+    group.add_argument(
+        '-f',
+        '--file',
+        help='The name of the file to download.',
+        required=False,
+    )
+    group.add_argument(
+        '-d',
+        '--dir',
+        help='The name of the directory to download.',
+        required=False,
+    )
+    group.add_argument(
+        '-a',
+        '--tags',
+        help='A switch specifying that a list of tags is to be downloaded.',
+        required=False,
+        # store_true automatically sets the default value to False
+        action='store_true',
+    )
+    group.add_argument(
+        '-b',
+        '--branches',
+        help='A switch specifying that a list of branches is to be downloaded.',
+        required=False,
+        # store_true automatically sets the default value to False
+        action='store_true',
+    )
+    group.add_argument(
+        '--manifest',
+        help='A JSON or TOML (.toml) file listing download jobs (url, dir or file, reference, target, ...) '
+        'to run in a single process, sharing connections, rate limit and caches.',
+        required=False,
+    )
+    group.add_argument(
+        '--gc',
+        help='A switch specifying that the blob store given by --blob-store is to be garbage collected.',
+        required=False,
+        # store_true automatically sets the default value to False
+        action='store_true',
+    )
+
+    parser.add_argument(
+        '-u',
+        '--url',
+        help='The url of the repository to download. Required unless --gc or --manifest is used.',
+        required=False,
+    )
+    parser.add_argument(
+        '-t',
+        '--target',
+        help='The name of the file or directory to save the data to. Defaults to file or directory name.',
+        required=False,
+    )
+    parser.add_argument(
+        '-g',
+        '--git_token',
+        help='The value of the Github/Github Enterprise Token.'
+        'Can also be specified in the environment variable GITHUB_TOKEN.',
+        required=False,
+    )
+    parser.add_argument(
+        '-l',
+        '--log_level',
+        help='The level of logging to use for output. Valid options are: DEBUG, INFO, WARN, ERROR, CRITICAL. '
+        'Defaults to INFO.',
+        required=False,
+    )
+    parser.add_argument(
+        '-r',
+        '--reference',
+        help="The name of the commit/branch/tag. Default: the repository's default branch.",
+        required=False,
+    )
+    parser.add_argument(
+        '-s',
+        '--submodules',
+        help='A switch specifying that all submodules are to be downloaded.',
+        required=False,
+        # store_true automatically sets the default value to False
+        action='store_true',
+    )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        help='The number of files/directories to download concurrently. Defaults to 1.',
+        required=False,
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        '--via-archive',
+        help='A switch specifying that directories are to be extracted from a single streamed repository tarball.',
+        required=False,
+        # store_true automatically sets the default value to False
+        action='store_true',
+    )
+    parser.add_argument(
+        '--graphql',
+        help='A switch specifying that small files are to be downloaded in batches through the GraphQL API.',
+        required=False,
+        # store_true automatically sets the default value to False
+        action='store_true',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        help='A directory where the responses are cached and revalidated on the next runs. Disabled by default.',
+        required=False,
+    )
+    parser.add_argument(
+        '--cache-size',
+        help='The maximum size of the cache in MB. Defaults to 1024.',
+        required=False,
+        type=int,
+        default=1024,
+    )
+    parser.add_argument(
+        '--name',
+        help='With -a/--tags or -b/--branches, only list the tags/branches with this name. Can be repeated.',
+        required=False,
+        action='append',
+    )
+    parser.add_argument(
+        '--ndjson',
+        help='With -a/--tags or -b/--branches, a switch specifying that the list is written as '
+        'newline delimited JSON (tags.ndjson/branches.ndjson).',
+        required=False,
+        # store_true automatically sets the default value to False
+        action='store_true',
+    )
+    parser.add_argument(
+        '--sync',
+        help='A switch specifying that only the files missing or differing from the local ones are to be downloaded.',
+        required=False,
+        # store_true automatically sets the default value to False
+        action='store_true',
+    )
+    parser.add_argument(
+        '--delete',
+        help='With --sync, a switch specifying that local files which do not exist in the repository are removed.',
+        required=False,
+        # store_true automatically sets the default value to False
+        action='store_true',
+    )
+    parser.add_argument(
+        '--include',
+        help='With -d/--dir, only download the files matching this glob pattern (gitignore syntax, relative to '
+        'the directory). Can be repeated.',
+        required=False,
+        action='append',
+    )
+    parser.add_argument(
+        '--exclude',
+        help='With -d/--dir, do not download the files matching this glob pattern (gitignore syntax, relative to '
+        'the directory). Can be repeated.',
+        required=False,
+        action='append',
+    )
+    parser.add_argument(
+        '--resume',
+        help='A switch specifying that the files already downloaded by an interrupted run are not downloaded again.',
+        required=False,
+        # store_true automatically sets the default value to False
+        action='store_true',
+    )
+    parser.add_argument(
+        '--fsync',
+        help='With -d/--dir, when the written files are synced to disk: none (left to the operating system), '
+        'file (each file before it is renamed into place) or end (all the files once the download is complete). '
+        'Defaults to none.',
+        required=False,
+        choices=('none', 'file', 'end'),
+        default='none',
+    )
+    parser.add_argument(
+        '--io-workers',
+        help='With -d/--dir, the number of threads writing the downloaded files to disk. Defaults to 4.',
+        required=False,
+        type=int,
+        default=4,
+    )
+    parser.add_argument(
+        '--output-archive',
+        help='With -d/--dir, an archive (.tar.gz, .tar.zst or .zip) the files are written to, instead of the disk. '
+        'The target path is then the directory of the files within the archive. '
+        '.tar.zst archives require the zstandard package.',
+        required=False,
+    )
+    parser.add_argument(
+        '--stats',
+        help='A JSON file where a report of the run is written: requests, latency percentiles, retries, cache hits, '
+        'throughput, API calls per file and rate limit headroom.',
+        required=False,
+    )
+    parser.add_argument(
+        '--blob-store',
+        help='A directory where the downloaded files are stored by git blob SHA, '
+        'so that identical files are only downloaded once across refs and repositories. Disabled by default.',
+        required=False,
+    )
+    parser.add_argument(
+        '--gc-max-age',
+        help='With --gc, remove the blobs unused for more than this number of days.',
+        required=False,
+        type=float,
+    )
+    parser.add_argument(
+        '--gc-max-size',
+        help='With --gc, remove the least recently used blobs until the store fits in this size in MB.',
+        required=False,
+        type=int,
+    )
+
+    return parser
+
+
+def check_args(parser: argparse.ArgumentParser, args: dict) -> None:
+    """
+    Check the arguments that depend on each other, exiting with a usage error if needed
+    """
+    if args['jobs'] < 1:
+        parser.error('argument -j/--jobs: must be at least 1')
+
+    if args['io_workers'] < 1:
+        parser.error('argument --io-workers: must be at least 1')
+
+    if args['delete'] and not args['sync']:
+        parser.error('argument --delete: requires --sync')
+
+    if args['via_archive']:
+        options = ('sync', 'delete', 'resume', 'blob_store')
+
+        if conflicting := [f'--{x.replace("_", "-")}' for x in options if args[x]]:
+            parser.error(f'argument --via-archive: not allowed with {", ".join(conflicting)}')
+
+    if args['output_archive'] is not None:
+        options = ('submodules', 'via_archive', 'sync', 'delete', 'resume')
+
+        if conflicting := [f'--{x.replace("_", "-")}' for x in options if args[x]]:
+            parser.error(f'argument --output-archive: not allowed with {", ".join(conflicting)}')
+
+    if args['gc'] and args['blob_store'] is None:
+        parser.error('argument --gc: requires --blob-store')
+
+    if not args['gc'] and not args['manifest'] and args['url'] is None:
+        parser.error('the following arguments are required: -u/--url')
+
+
+def main() -> None:
+    """
+    Run the cli application
+    """
+    parser = build_parser()
+    args = vars(parser.parse_args())
+    check_args(parser, args)
+
+    from colorlog import ColoredFormatter, StreamHandler
+    from dotenv import load_dotenv
+
+    from .api import DownloadError
+    from .blob_store import BlobStore
+    from .cache import HttpCache
+    from .client import Client
+    from .metrics import Metrics
+
+    load_dotenv(encoding='utf-8')
+
+    # --- logging
+    handler = StreamHandler()
+    handler.setFormatter(
+        ColoredFormatter(
+            fmt='%(log_color)s%(asctime)s  %(levelname)-8s %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S',
+        )
+    )
+    _logger.addHandler(handler)
+    _logger.setLevel(set_log_level(args))
+    #  ---
+
+    blob_store = BlobStore(args['blob_store']) if args['blob_store'] else None
+
+    if args['gc']:
+        blob_store.gc(
+            max_age=args['gc_max_age'] * 24 * 3600 if args['gc_max_age'] is not None else None,
+            max_size=args['gc_max_size'] * 1024 * 1024 if args['gc_max_size'] is not None else None,
+        )
+        return
+
+    if not set_github_token(str(args.get('github_token'))):
+        sys_exit(1)
+
+    metrics = Metrics() if args['stats'] else None
+
+    client = Client(
+        pool_size=args['jobs'],
+        cache=HttpCache(args['cache_dir'], args['cache_size'] * 1024 * 1024) if args['cache_dir'] else None,
+        metrics=metrics,
+    )
+
+    try:
+        run(args, client, blob_store)
+    except DownloadError:
+        # Every failed path has already been logged
+        sys_exit(1)
+    finally:
+        if metrics is not None:
+            metrics.write_report(Path(args['stats']))
+
+
+def run(args: dict, client: 'Client', blob_store: 'BlobStore | None') -> None:
+    """
+    Run the action requested by the command line arguments
+    """
+    from . import file_processing as fp
+    from .api import dl_dir, dl_file, iter_branches, iter_tags
+    from .manifest import load_manifest, run_jobs
+
+    if args['tags']:
+        fp.write_json_items(
+            Path('tags.ndjson' if args['ndjson'] else 'tags.json'),
+            iter_tags(args['url'], client, args['name'], args['jobs']),
+            ndjson=args['ndjson'],
+        )
+
+    elif args['branches']:
+        fp.write_json_items(
+            Path('branches.ndjson' if args['ndjson'] else 'branches.json'),
+            iter_branches(args['url'], client, args['name'], args['jobs']),
+            ndjson=args['ndjson'],
+        )
+
+    elif args['manifest'] is not None:
+        results = run_jobs(load_manifest(Path(args['manifest'])), client, args['jobs'], blob_store)
+
+        if not all(x.ok for x in results):
+            sys_exit(1)
+
+    elif args['file'] is not None:
+        dl_file(
+            repo_url=args['url'],
+            file_name=args['file'],
+            target_filename=args['target'],
+            reference=args['reference'],
+            client=client,
+            blob_store=blob_store,
+        )
+
+    elif args['dir'] is not None:
+        dl_dir(
+            repo_url=args['url'],
+            base_path=args['dir'],
+            target_path=args['target'],
+            reference=args['reference'],
+            submodules=args['submodules'],
+            max_workers=args['jobs'],
+            via_archive=args['via_archive'],
+            client=client,
+            blob_store=blob_store,
+            sync=args['sync'],
+            delete=args['delete'],
+            graphql=args['graphql'],
+            resume=args['resume'],
+            include=args['include'],
+            exclude=args['exclude'],
+            fsync=args['fsync'],
+            io_workers=args['io_workers'],
+            output_archive=args['output_archive'],
+        )
+
+
+if __name__ == '__main__':
+    # Execute when the module is not initialised from an import statement.
+    main()
@@ -0,0 +1,320 @@
+"""
+HTTP client module
+
+Shared HTTP layer used by every Github API request
+"""
+
+import hashlib
+import time
+from logging import getLogger
+from os import environ
+from threading import Lock
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import url_processing as up
+from .cache import HttpCache
+from .metrics import Metrics, RequestEvent
+from .scheduler import Scheduler
+
+_logger = getLogger('githubdl')
+
+# Default number of connections kept alive per host
+DEFAULT_POOL_SIZE = 10
+
+# Seconds a resolved reference is reused for, so that a long-lived client follows the branches that move
+REFERENCE_TTL = 60
+
+
+class Client:
+    """
+    HTTP client owning a persistent session
+
+    Connections are pooled and kept alive across requests, and the default headers are built once.
+    The same client can be passed to any number of dl_file/dl_dir calls, including concurrent ones.
+    If no token is given, the GITHUB_TOKEN environment variable is used.
+
+    With a cache, responses are stored on disk and revalidated with conditional requests,
+    which Github answers with a 304 that does not count against the rate limit.
+
+    Every request goes through the scheduler, which follows the rate limit and retries transient errors.
+
+    The client also memoizes the references resolved to commit SHAs for `reference_ttl` seconds
+    (see `resolve_reference`).
+    Cached responses of requests pinned to a commit SHA are served without revalidation.
+
+    With a transport, e.g. a Cassette, requests are sent through this adapter instead of a default HTTPAdapter.
+
+    With metrics, every request is measured and recorded, along with the files written by the downloads.
+
+    With a server URL, e.g. the benchmark stand-in server, every request is sent to this server instead of Github.
+    """
+
+    def __init__(
+        self,
+        token: str | None = None,
+        *,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: float = 30,
+        cache: HttpCache | None = None,
+        scheduler: Scheduler | None = None,
+        transport: HTTPAdapter | None = None,
+        metrics: Metrics | None = None,
+        server_url: str | None = None,
+        reference_ttl: float = REFERENCE_TTL,
+    ) -> None:
+        """
+        Create the session and its connection pools
+        """
+        self.timeout = timeout
+        self.server_url = server_url
+        self.cache = cache
+        self.scheduler = scheduler or Scheduler()
+        self.transport = transport
+        self.metrics = metrics
+        self.pool_size = 0
+        self._lock = Lock()
+        self.reference_ttl = reference_ttl
+        # Commit SHA and monotonic time of resolution of each reference
+        self.resolved_references: dict[tuple[str, str | None], tuple[str, float]] = {}
+        self._reference_locks: dict[tuple[str, str | None], Lock] = {}
+
+        token = token or environ['GITHUB_TOKEN']
+        # Cached responses are only served to the same credentials, so that a shared cache cannot leak private content
+        self._cache_scope = hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'token {token}',
+            'Accept': 'application/vnd.github.v3.raw',
+        })
+
+        self.resize_pool(pool_size)
+
+    def resize_pool(self, pool_size: int) -> None:
+        """
+        Make sure the connection pools can keep at least pool_size connections alive per host
+
+        Pools are never shrunk, so that a client shared by several calls fits the most concurrent one
+        """
+        with self._lock:
+            if pool_size <= self.pool_size:
+                return
+
+            _logger.debug('Resizing the connection pool to %d connections', pool_size)
+
+            if self.transport is None:
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            else:
+                adapter = self.transport
+                adapter.init_poolmanager(pool_size, pool_size)
+
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+            self.pool_size = pool_size
+            self.scheduler.max_concurrency = pool_size
+
+    def repo_urls(self, repo_url: str | up.RepoUrls) -> up.RepoUrls:
+        """
+        Return the base URLs of a repository, pointing to the server of the client if any
+        """
+        return up.get_repo_urls(repo_url, self.server_url)
+
+    def reference_lock(self, key: tuple[str, str | None]) -> Lock:
+        """
+        Return the lock serializing the resolutions of a reference, so that concurrent calls resolve it only once
+        """
+        with self._lock:
+            return self._reference_locks.setdefault(key, Lock())
+
+    def get(
+        self,
+        http_url: str,
+        headers: dict[str, str] | None = None,
+        stream: bool = False,
+        cached: bool = True,
+    ) -> requests.Response:
+        """
+        Make a GET request through the session, and the cache if any unless `cached` is False
+        """
+        # Handle windows and Linux URLs
+        http_url = http_url.replace('\\', '/')
+
+        if self.metrics is None:
+            return self._cached_get(http_url, headers, stream, cached, None)
+
+        start = time.perf_counter()
+        probe = _Probe()
+        response = self._cached_get(http_url, headers, stream, cached, probe)
+        self._record('GET', http_url, response, stream=stream, start=start, probe=probe)
+
+        return response
+
+    def _cached_get(
+        self,
+        http_url: str,
+        headers: dict[str, str] | None,
+        stream: bool,
+        cached: bool,
+        probe: '_Probe | None',
+    ) -> requests.Response:
+        """
+        Make a GET request through the cache if any, noting the cache outcome and the attempts in the probe
+        """
+        if self.cache is None or not cached:
+            return self._get(http_url, headers, stream, probe)
+
+        # Responses are cached per credentials and per representation: the session default (raw content) or the
+        # requested one
+        variant = f'{self._cache_scope}\n{(headers or {}).get("Accept", "")}'
+
+        if up.is_immutable_url(http_url) and (cached := self.cache.response(http_url, variant)) is not None:
+            if probe is not None:
+                probe.cache = 'hit'
+            return cached
+
+        response = self._get(http_url, {**(headers or {}), **self.cache.validators(http_url, variant)}, True, probe)
+
+        if response.status_code == 304:
+            response.close()
+
+            if (cached := self.cache.response(http_url, variant)) is not None:
+                if probe is not None:
+                    probe.cache = 'revalidated'
+                return cached
+
+            # Evicted by another process since its validators were read
+            response = self._get(http_url, headers, True, probe)
+
+        if response.status_code == 200 and ('ETag' in response.headers or 'Last-Modified' in response.headers):
+            return self.cache.store(http_url, response, variant)
+
+        if not stream:
+            # Load the body like a non streamed request would
+            _ = response.content
+
+        return response
+
+    def post(self, http_url: str, json: dict, headers: dict[str, str] | None = None) -> requests.Response:
+        """
+        Make a POST request with a JSON body through the session, as allowed by the scheduler
+
+        POST requests are never cached
+        """
+        probe = None if self.metrics is None else _Probe()
+        start = time.perf_counter()
+
+        def send() -> requests.Response:
+            if probe is not None:
+                probe.attempts += 1
+            return self.session.post(url=http_url, json=json, headers=headers, timeout=self.timeout)
+
+        response = self.scheduler.run(send)
+
+        if probe is not None:
+            self._record('POST', http_url, response, stream=False, start=start, probe=probe)
+
+        return response
+
+    def _get(
+        self,
+        http_url: str,
+        headers: dict[str, str] | None,
+        stream: bool,
+        probe: '_Probe | None' = None,
+    ) -> requests.Response:
+        """
+        Make a GET request through the session, as allowed by the scheduler
+        """
+
+        def send() -> requests.Response:
+            if probe is not None:
+                probe.attempts += 1
+            return self.session.get(url=http_url, headers=headers, timeout=self.timeout, stream=stream)
+
+        return self.scheduler.run(send)
+
+    def _record(
+        self,
+        method: str,
+        http_url: str,
+        response: requests.Response,
+        *,
+        stream: bool,
+        start: float,
+        probe: '_Probe',
+    ) -> None:
+        """
+        Record a request in the metrics
+        """
+        headers = response.headers
+
+        if (size := headers.get('Content-Length')) is not None:
+            size = int(size)
+        elif not stream:
+            size = len(response.content)
+
+        remaining = headers.get('X-RateLimit-Remaining')
+
+        self.metrics.record(
+            RequestEvent(
+                method=method,
+                url=http_url,
+                status=response.status_code,
+                elapsed=time.perf_counter() - start,
+                size=size,
+                retries=max(0, probe.attempts - 1),
+                cache=probe.cache,
+                rate_limit_remaining=None if remaining is None else int(remaining),
+            )
+        )
+
+    def close(self) -> None:
+        """
+        Close the session and all of its connections
+        """
+        self.session.close()
+
+    def __enter__(self) -> 'Client':
+        """
+        Use the client as a context manager
+        """
+        return self
+
+    def __exit__(self, *_args: object) -> None:
+        """
+        Close the client when leaving the context
+        """
+        self.close()
+
+
+class _Probe:
+    """
+    Outcome of a request, noted along its way through the cache and the scheduler
+    """
+
+    __slots__ = ('attempts', 'cache')
+
+    def __init__(self) -> None:
+        """
+        Start with no attempt and no cache outcome
+        """
+        self.attempts = 0
+        self.cache: str | None = None
+
+
+# The client used when none is given, under the 'client' key once created
+_defaults: dict[str, Client] = {}
+_defaults_lock = Lock()
+
+
+def get_default_client() -> Client:
+    """
+    Return the client used when none is given, creating it on first use
+    """
+    with _defaults_lock:
+        if 'client' not in _defaults:
+            _defaults['client'] = Client()
+
+        return _defaults['client']
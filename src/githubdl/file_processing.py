@@ -2,12 +2,26 @@
 Files processing module
 """
 
+import hashlib
+import json
+import mmap
+import os
+import tarfile
+import tempfile
+from collections.abc import Callable, Iterable
 from logging import getLogger
-from pathlib import Path
-
+from pathlib import Path, PurePosixPath
+from textwrap import indent
+from typing import BinaryIO
 
 _logger = getLogger('githubdl')
 
+# Size of the buffer used to copy streamed content to disk
+CHUNK_SIZE = 64 * 1024
+
+# Files larger than this are hashed through a memory map instead of a read buffer
+MMAP_THRESHOLD = 1024 * 1024
+
 
 def write_file(file_name: Path, file_data: bytes) -> None:
     """
@@ -17,6 +31,167 @@ def write_file(file_name: Path, file_data: bytes) -> None:
     file_name.write_bytes(file_data)
 
 
+def write_json_items(file_name: Path, items: Iterable[dict], ndjson: bool = False) -> int:
+    """
+    Write items to disk as they come, as a JSON array or as newline delimited JSON
+
+    The JSON array is formatted like json.dump(list(items), indent=2) would.
+    Return the number of items written
+    """
+    _logger.info('Writing to file: %s', file_name)
+
+    count = 0
+
+    with file_name.open(mode='w', encoding='utf-8') as f:
+        for item in items:
+            if ndjson:
+                f.write(f'{json.dumps(item)}\n')
+            else:
+                f.write(',\n' if count else '[\n')
+                f.write(indent(json.dumps(item, indent=2), '  '))
+            count += 1
+
+        if not ndjson:
+            f.write('\n]' if count else '[]')
+
+    return count
+
+
+def _get_umask() -> int:
+    """
+    Return the umask of the process, which can only be read by setting it
+    """
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+# Read once, as setting it is not thread safe
+_UMASK = _get_umask()
+
+
+def make_temp_file(file_name: Path) -> tuple[int, Path]:
+    """
+    Create a temporary file next to file_name, to be renamed to it once written
+
+    Unlike the 0600 of mkstemp, the temporary file gets the permissions of a file created by open():
+    0666 minus the umask.
+    Return its file descriptor and path
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=file_name.parent, prefix=f'.{file_name.name}.', suffix='.tmp')
+
+    if os.name != 'nt':
+        os.fchmod(fd, 0o666 & ~_UMASK)
+
+    return fd, Path(tmp_name)
+
+
+def write_stream(file_name: Path, stream: BinaryIO, chunk_size: int = CHUNK_SIZE, fsync: bool = False) -> int:
+    """
+    Write streamed content to disk
+
+    The stream is copied chunk by chunk through a single reusable buffer into a temporary file
+    created next to file_name, which is then atomically renamed. Memory usage is bounded by
+    chunk_size and file_name is never left partially written.
+    With `fsync`, the temporary file is synced to disk before being renamed.
+    Return the number of bytes written
+    """
+    _logger.info('Writing to file: %s', file_name)
+
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    size = 0
+
+    fd, tmp_path = make_temp_file(file_name)
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while read := stream.readinto(buffer):
+                f.write(view[:read])
+                size += read
+
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+        tmp_path.replace(file_name)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    return size
+
+
+def git_blob_sha_bytes(data: bytes) -> str:
+    """
+    Return the git blob SHA-1 of some in-memory content
+    """
+    return hashlib.sha1(f'blob {len(data)}\0'.encode() + data, usedforsecurity=False).hexdigest()
+
+
+def git_blob_sha(file_name: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Return the git blob SHA-1 of a file, as `git hash-object` would compute it
+
+    Large files are hashed through a memory map, avoiding the copies to a read buffer.
+    hashlib releases the GIL while hashing, so several files can be hashed concurrently from threads
+    """
+    with file_name.open('rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        sha = hashlib.sha1(f'blob {size}\0'.encode(), usedforsecurity=False)
+
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                sha.update(mapped)
+        else:
+            buffer = bytearray(chunk_size)
+            view = memoryview(buffer)
+
+            while read := f.readinto(buffer):
+                sha.update(view[:read])
+
+    return sha.hexdigest()
+
+
+def delete_extra_files(
+    dir_name: Path,
+    keep: set[Path],
+    keep_dirs: set[Path] | None = None,
+    only: Callable[[Path], bool] | None = None,
+) -> list[Path]:
+    """
+    Delete the files under dir_name that are not in keep, then the directories left empty
+
+    The files under one of keep_dirs are left untouched, and so are the files for which `only` returns False
+
+    Return the list of deleted files
+    """
+    deleted = []
+
+    for root, dirs, files in os.walk(dir_name, topdown=False):
+        root_path = Path(root)
+
+        for name in files:
+            file_name = root_path / name
+
+            if (
+                file_name not in keep
+                and (not keep_dirs or keep_dirs.isdisjoint(file_name.parents))
+                and (only is None or only(file_name))
+            ):
+                _logger.info('Deleting file: %s', file_name)
+                file_name.unlink()
+                deleted.append(file_name)
+
+        for name in dirs:
+            sub_dir = root_path / name
+            if not sub_dir.is_symlink() and not any(sub_dir.iterdir()):
+                _logger.info('Deleting directory: %s', sub_dir)
+                sub_dir.rmdir()
+
+    return deleted
+
+
 def create_directory(dir_name: Path) -> None:
     """
     Create local directory on disk
@@ -25,3 +200,57 @@ def create_directory(dir_name: Path) -> None:
     if not dir_name.exists():
         _logger.info('Creating directory: %s', dir_name)
         dir_name.mkdir(parents=True, exist_ok=True)
+
+
+def extract_tar_stream(
+    stream: BinaryIO,
+    base_path: str,
+    target_path: Path,
+    keep: Callable[[str], bool] | None = None,
+) -> list[Path]:
+    """
+    Extract the files under base_path of a streamed Github tarball into target_path
+
+    The archive is decompressed as it is read, one member at a time. Github archives
+    wrap the repository in a single top level directory, which is stripped.
+    With `keep`, only the files for which it returns True, given their path relative to base_path, are extracted.
+    Return the list of extracted files
+    """
+    base_path = base_path.replace('\\', '/').strip('/')
+    prefix = f'{base_path}/' if base_path else ''
+
+    extracted = []
+    created: set[Path] = set()
+
+    with tarfile.open(fileobj=stream, mode='r|gz') as tar:
+        for member in tar:
+            repo_path = PurePosixPath(member.name.partition('/')[2])
+
+            if not str(repo_path).startswith(prefix) or member.isdir():
+                continue
+
+            if repo_path.is_absolute() or '..' in repo_path.parts:
+                _logger.warning('Skipping unsafe archive member: %s', member.name)
+                continue
+
+            if keep is not None and not keep(str(repo_path).removeprefix(prefix)):
+                continue
+
+            full_file_name = target_path / repo_path
+
+            if full_file_name.parent not in created:
+                create_directory(full_file_name.parent)
+                created.add(full_file_name.parent)
+
+            if member.issym():
+                # Match the Contents API, which returns the link target as the file content
+                write_file(full_file_name, member.linkname.encode('utf-8'))
+            elif member.isfile():
+                with tar.extractfile(member) as src:
+                    write_stream(full_file_name, src)
+            else:
+                continue
+
+            extracted.append(full_file_name)
+
+    return extracted
@@ -0,0 +1,130 @@
+"""
+Journal module
+
+Append-only record of the files planned and downloaded by a dl_dir run, used to resume interrupted runs
+"""
+
+import json
+import os
+import time
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+
+_logger = getLogger('githubdl')
+
+# Name of the journal file, written in the target directory
+JOURNAL_NAME = '.githubdl-journal'
+
+# The journal is synced to disk every FSYNC_BATCH records, or every FSYNC_INTERVAL seconds
+FSYNC_BATCH = 256
+FSYNC_INTERVAL = 1.0
+
+
+class Journal:
+    """
+    Append-only journal of a directory download, one JSON record per line
+
+    Each planned file is recorded with its blob SHA before the downloads start, then again once downloaded.
+    Records are buffered and the journal is synced to disk in batches, so that it costs a write call and an fsync
+    every few hundred files rather than per file. A crash loses at most the last batch: these files are downloaded
+    again on resume. The journal is removed once the run succeeds.
+    """
+
+    def __init__(self, file_name: Path, resume: bool = False) -> None:
+        """
+        Open the journal, loading the files completed by the interrupted run when resuming
+
+        Without resume, any previous journal is discarded
+        """
+        self.file_name = file_name
+        self.completed: dict[str, str] = self._load() if resume else {}
+
+        self._lock = Lock()
+        self._file = file_name.open('a' if resume else 'w', encoding='utf-8')
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def _load(self) -> dict[str, str]:
+        """
+        Return the blob SHA of the completed files, keyed by path
+        """
+        completed = {}
+
+        try:
+            f = self.file_name.open(encoding='utf-8')
+        except FileNotFoundError:
+            return completed
+
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Last line cut short by the interruption
+                    continue
+
+                if record.get('event') == 'done':
+                    completed[record['path']] = record['sha']
+
+        _logger.info('Resuming from journal: %s (%d file(s) completed)', self.file_name, len(completed))
+
+        return completed
+
+    def is_done(self, path: str, sha: str, full_file_name: Path, size: int | None) -> bool:
+        """
+        Return True if the file was completed with the same blob SHA, and is still present with the expected size
+        """
+        if self.completed.get(path) != sha:
+            return False
+
+        try:
+            return size is None or full_file_name.stat().st_size == size
+        except OSError:
+            return False
+
+    def planned(self, files: dict[str, str]) -> None:
+        """
+        Record the files about to be downloaded, with their blob SHA
+        """
+        self._write([{'event': 'planned', 'path': path, 'sha': sha} for path, sha in files.items()])
+
+    def done(self, path: str, sha: str) -> None:
+        """
+        Record a downloaded file with its blob SHA
+        """
+        self._write([{'event': 'done', 'path': path, 'sha': sha}])
+
+    def _write(self, records: list[dict]) -> None:
+        """
+        Append records to the journal, syncing it to disk once a batch is complete
+        """
+        data = ''.join(f'{json.dumps(record)}\n' for record in records)
+
+        with self._lock:
+            self._file.write(data)
+            self._unsynced += len(records)
+
+            if self._unsynced >= FSYNC_BATCH or time.monotonic() - self._synced_at >= FSYNC_INTERVAL:
+                self._sync()
+
+    def _sync(self) -> None:
+        """
+        Flush the buffered records and sync them to disk
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def close(self, success: bool) -> None:
+        """
+        Close the journal, removing it if the run succeeded or keeping it on disk to resume otherwise
+        """
+        with self._lock:
+            if success:
+                self._file.close()
+                self.file_name.unlink(missing_ok=True)
+            else:
+                self._sync()
+                self._file.close()
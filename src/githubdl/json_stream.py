@@ -0,0 +1,171 @@
+"""
+JSON stream module
+
+Incremental parsing of the large JSON arrays returned by the listing endpoints
+"""
+
+import codecs
+import json
+import re
+from collections.abc import Iterator
+from typing import Any, BinaryIO, NoReturn
+
+# Size of the chunks read from the stream
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Characters that can go on a number cut at the end of a chunk, e.g. `12` + `.5e3`
+_NUMBER_CHARS = frozenset('0123456789+-.eE')
+_DECODER = json.JSONDecoder()
+
+
+class ArrayStream:
+    """
+    Incremental parser of a JSON array read from a binary stream
+
+    The array is either the top level value (key is None) or the `key` field of the top level object.
+    Its items are parsed one at a time as the stream is read, so that only the current item and a chunk of the body
+    are held in memory, instead of the whole body and every item. Once the items have been iterated, `fields` holds
+    the other fields of the top level object.
+    """
+
+    def __init__(self, stream: BinaryIO, key: str | None = None, chunk_size: int = CHUNK_SIZE) -> None:
+        """
+        Parse the array of stream, on iteration
+        """
+        self.key = key
+        self.fields: dict[str, Any] = {}
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Yield the items of the array as they are parsed
+        """
+        if self.key is None:
+            yield from self._items()
+            self._end()
+            return
+
+        self._take('{')
+
+        if self._peek() == '}':
+            self._pos += 1
+            self._end()
+            return
+
+        while True:
+            name = self._value()
+
+            if not isinstance(name, str):
+                self._fail('Expecting property name')
+
+            self._take(':')
+
+            if name == self.key:
+                yield from self._items()
+            else:
+                self.fields[name] = self._value()
+
+            if self._take(',}') == '}':
+                break
+
+        self._end()
+
+    def _items(self) -> Iterator[Any]:
+        """
+        Yield the items of the array starting at the current position
+        """
+        self._take('[')
+
+        if self._peek() == ']':
+            self._pos += 1
+            return
+
+        while True:
+            yield self._value()
+
+            if self._take(',]') == ']':
+                return
+
+    def _fill(self) -> bool:
+        """
+        Append the next chunk of the stream to the buffer, dropping the parsed part
+
+        Return False at the end of the stream
+        """
+        if self._eof:
+            return False
+
+        data = self._stream.read(self._chunk_size)
+        self._eof = not data
+        self._buffer = self._buffer[self._pos :] + self._text_decoder.decode(data, final=self._eof)
+        self._pos = 0
+
+        return not self._eof
+
+    def _peek(self) -> str:
+        """
+        Skip the whitespace and return the next character
+        """
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+
+            if not self._fill():
+                self._fail('Unexpected end of data')
+
+    def _take(self, expected: str) -> str:
+        """
+        Consume the next character, which must be one of expected
+        """
+        if (char := self._peek()) not in expected:
+            self._fail(f'Expecting one of {expected!r}')
+
+        self._pos += 1
+        return char
+
+    def _value(self) -> object:
+        """
+        Parse the value at the current position, reading more of the stream until it is complete
+        """
+        self._peek()
+
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+
+            # A number at the end of the buffer may go on in the next chunk
+            if (end < len(self._buffer) and self._buffer[end] not in _NUMBER_CHARS) or not self._fill():
+                self._pos = end
+                return value
+
+    def _end(self) -> None:
+        """
+        Check that nothing but whitespace follows the top level value
+        """
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+
+            if self._pos < len(self._buffer):
+                self._fail('Extra data')
+
+            if not self._fill():
+                return
+
+    def _fail(self, message: str) -> NoReturn:
+        """
+        Raise a JSONDecodeError at the current position
+        """
+        raise json.JSONDecodeError(message, self._buffer, self._pos)
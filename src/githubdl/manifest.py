@@ -0,0 +1,203 @@
+"""
+Manifest module
+
+Run many download jobs (repositories, paths, references and targets) in one process, sharing a single client
+"""
+
+import json
+import time
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from logging import getLogger
+from pathlib import Path
+
+from .api import dl_dir, dl_file
+from .blob_store import BlobStore
+from .client import Client, get_default_client
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+_logger = getLogger('githubdl')
+
+
+@dataclass(frozen=True)
+class Job:
+    """
+    Download of a file or a directory of a repository, as given in a manifest
+
+    Exactly one of `dir` and `file` must be set, the other fields match the dl_dir/dl_file arguments
+    """
+
+    url: str
+    dir: str | None = None
+    file: str | None = None
+    reference: str | None = None
+    target: str | None = None
+    submodules: bool = False
+    via_archive: bool = False
+    sync: bool = False
+    delete: bool = False
+    graphql: bool = False
+    resume: bool = False
+    include: tuple[str, ...] = ()
+    exclude: tuple[str, ...] = ()
+    fsync: str = 'none'
+    output_archive: str | None = None
+
+    @classmethod
+    def from_dict(cls, spec: dict) -> 'Job':
+        """
+        Build a job from its manifest entry, where keys can use dashes like the command line options
+        """
+        spec = {key.replace('-', '_'): value for key, value in spec.items()}
+
+        if unknown := spec.keys() - {x.name for x in fields(cls)}:
+            err_message = f'Unknown job key(s): {", ".join(sorted(unknown))}'
+            raise ValueError(err_message)
+
+        if 'url' not in spec or (spec.get('dir') is None) == (spec.get('file') is None):
+            err_message = f'A job needs an url and either a dir or a file: {spec}'
+            raise ValueError(err_message)
+
+        for key in ('include', 'exclude'):
+            if isinstance(spec.get(key), str):
+                spec[key] = (spec[key],)
+            elif key in spec:
+                spec[key] = tuple(spec[key])
+
+        return cls(**spec)
+
+    def __str__(self) -> str:
+        """
+        Describe the job in the logs
+        """
+        return f'{self.url} {self.dir if self.file is None else self.file}@{self.reference or "default branch"}'
+
+
+@dataclass(frozen=True)
+class JobResult:
+    """
+    Outcome of a job: `error` is None if it succeeded
+    """
+
+    job: Job
+    error: Exception | None
+    elapsed: float
+
+    @property
+    def ok(self) -> bool:
+        """
+        Whether the job succeeded
+        """
+        return self.error is None
+
+
+def load_manifest(file_name: Path) -> list[Job]:
+    """
+    Load the jobs of a JSON or TOML (.toml) manifest
+
+    A JSON manifest is either a list of jobs or an object with a `jobs` list,
+    a TOML manifest is a `[[jobs]]` array of tables
+    """
+    _logger.info('Loading manifest: %s', file_name)
+
+    if file_name.suffix.lower() == '.toml':
+        if tomllib is None:
+            err_message = 'TOML manifests require Python 3.11 or later'
+            raise RuntimeError(err_message)
+
+        with file_name.open('rb') as f:
+            content = tomllib.load(f)
+    else:
+        with file_name.open(encoding='utf-8') as f:
+            content = json.load(f)
+
+    specs = content if isinstance(content, list) else content.get('jobs')
+
+    if not isinstance(specs, list):
+        err_message = f'No list of jobs in manifest: {file_name}'
+        raise TypeError(err_message)
+
+    return [Job.from_dict(x) for x in specs]
+
+
+def run_jobs(
+    jobs: Iterable[Job | dict],
+    client: Client | None = None,
+    max_workers: int = 1,
+    blob_store: BlobStore | None = None,
+) -> list[JobResult]:
+    """
+    Run download jobs, max_workers at a time, and return their results in the order of the jobs
+
+    Every job goes through the same client, so they share its connections, its rate limit budget,
+    its cache and its resolved references: a reference used by several jobs is only resolved once.
+    A failed job does not stop the others.
+    """
+    jobs = [x if isinstance(x, Job) else Job.from_dict(x) for x in jobs]
+
+    client = client or get_default_client()
+    client.resize_pool(max_workers)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(lambda x: _run_job(x, client, max_workers, blob_store), jobs))
+
+    failed = [x for x in results if not x.ok]
+
+    for result in results:
+        if result.ok:
+            _logger.info('Job succeeded in %.1fs: %s', result.elapsed, result.job)
+        else:
+            _logger.error('Job failed in %.1fs: %s: %s', result.elapsed, result.job, result.error)
+
+    _logger.info('%d/%d job(s) succeeded', len(results) - len(failed), len(results))
+
+    return results
+
+
+def _run_job(job: Job, client: Client, max_workers: int, blob_store: BlobStore | None) -> JobResult:
+    """
+    Run a single job, catching its error
+    """
+    _logger.info('Starting job: %s', job)
+
+    start = time.perf_counter()
+
+    try:
+        if job.file is not None:
+            dl_file(
+                repo_url=job.url,
+                file_name=job.file,
+                target_filename=job.target,
+                reference=job.reference,
+                client=client,
+                blob_store=blob_store,
+            )
+        else:
+            dl_dir(
+                repo_url=job.url,
+                base_path=job.dir,
+                target_path=job.target,
+                reference=job.reference,
+                submodules=job.submodules,
+                max_workers=max_workers,
+                via_archive=job.via_archive,
+                client=client,
+                blob_store=blob_store,
+                sync=job.sync,
+                delete=job.delete,
+                graphql=job.graphql,
+                resume=job.resume,
+                include=job.include,
+                exclude=job.exclude,
+                fsync=job.fsync,
+                output_archive=job.output_archive,
+            )
+    except Exception as ex:  # ruff: ignore[blind-except] - a failed job must not stop the others
+        return JobResult(job, ex, time.perf_counter() - start)
+
+    return JobResult(job, None, time.perf_counter() - start)
@@ -0,0 +1,177 @@
+"""
+Metrics module
+
+Per-request and per-file measures of a run, forwarded to hooks and aggregated into a report
+"""
+
+import json
+import math
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+
+_logger = getLogger('githubdl')
+
+
+@dataclass(frozen=True, slots=True)
+class RequestEvent:
+    """
+    HTTP request made by a client
+
+    `elapsed` is the time until the response headers for streamed requests, until the whole body otherwise.
+    `size` is the size of the body as received (compressed), if known.
+    `cache` is 'hit' for a response served from the cache without a request,
+    'revalidated' for a cached response confirmed by a 304, and None otherwise.
+    `retries` counts the extra attempts, including the ones waiting for the rate limit to reset.
+    """
+
+    method: str
+    url: str
+    status: int
+    elapsed: float
+    size: int | None
+    retries: int
+    cache: str | None
+    rate_limit_remaining: int | None
+
+
+@dataclass(frozen=True, slots=True)
+class FileEvent:
+    """
+    File written by a download
+
+    `source` is how its content was obtained: 'rest', 'ranges', 'graphql', 'archive' or 'store' (blob store),
+    and `elapsed` the time from the start of its download until it was written
+    """
+
+    path: str
+    size: int
+    elapsed: float
+    source: str
+
+
+Event = RequestEvent | FileEvent
+
+
+class Metrics:
+    """
+    Collector of the request and file events of a run
+
+    Give it to a Client to instrument every request made through it, and every file written by the downloads
+    using that client. Each event is passed to the hooks, from the thread that produced it, so that it can be
+    forwarded to an external telemetry system. Without metrics, the client does not measure anything.
+    """
+
+    def __init__(self, hooks: Iterable[Callable[[Event], None]] = ()) -> None:
+        """
+        Start measuring the run
+        """
+        self.hooks = list(hooks)
+        self.requests: list[RequestEvent] = []
+        self.files: list[FileEvent] = []
+        self.started = time.perf_counter()
+        self._lock = Lock()
+
+    def add_hook(self, hook: Callable[[Event], None]) -> None:
+        """
+        Call hook with every following event
+        """
+        self.hooks.append(hook)
+
+    def record(self, event: Event) -> None:
+        """
+        Store an event and pass it to the hooks
+        """
+        with self._lock:
+            if isinstance(event, RequestEvent):
+                self.requests.append(event)
+            else:
+                self.files.append(event)
+
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception:
+                _logger.exception('Metrics hook failed')
+
+    def summary(self) -> dict:
+        """
+        Return the aggregates of the events recorded so far
+        """
+        elapsed = time.perf_counter() - self.started
+
+        with self._lock:
+            requests = list(self.requests)
+            files = list(self.files)
+
+        sent = [x for x in requests if x.cache != 'hit']
+        latencies = sorted(x.elapsed for x in sent)
+        received = sum(x.size or 0 for x in sent)
+        written = sum(x.size for x in files)
+        remaining = [x.rate_limit_remaining for x in requests if x.rate_limit_remaining is not None]
+
+        return {
+            'elapsed': elapsed,
+            'requests': {
+                'count': len(sent),
+                'by_status': _count(str(x.status) for x in sent),
+                'retries': sum(x.retries for x in sent),
+                'cache_hits': sum(x.cache == 'hit' for x in requests),
+                'cache_revalidated': sum(x.cache == 'revalidated' for x in requests),
+                'bytes': received,
+                'latency': {
+                    'p50': _percentile(latencies, 50),
+                    'p95': _percentile(latencies, 95),
+                    'max': latencies[-1] if latencies else None,
+                },
+            },
+            'files': {
+                'count': len(files),
+                'bytes': written,
+                'by_source': _count(x.source for x in files),
+            },
+            'throughput': {
+                'received_bytes_per_second': received / elapsed if elapsed else None,
+                'written_bytes_per_second': written / elapsed if elapsed else None,
+                'files_per_second': len(files) / elapsed if elapsed else None,
+            },
+            'api_calls_per_file': len(sent) / len(files) if files else None,
+            'rate_limit': {
+                'min_remaining': min(remaining) if remaining else None,
+                'last_remaining': remaining[-1] if remaining else None,
+            },
+        }
+
+    def write_report(self, file_name: Path) -> None:
+        """
+        Write the summary as a JSON report
+        """
+        _logger.info('Writing run report: %s', file_name)
+
+        file_name.parent.mkdir(parents=True, exist_ok=True)
+        file_name.write_text(json.dumps(self.summary(), indent=2), encoding='utf-8')
+
+
+def _count(values: Iterable[str]) -> dict[str, int]:
+    """
+    Count the occurrences of each value
+    """
+    counts: dict[str, int] = {}
+
+    for value in values:
+        counts[value] = counts.get(value, 0) + 1
+
+    return counts
+
+
+def _percentile(values: list[float], percent: float) -> float | None:
+    """
+    Return the nearest-rank percentile of sorted values
+    """
+    if not values:
+        return None
+
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
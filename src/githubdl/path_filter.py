@@ -0,0 +1,199 @@
+"""
+Path filter module
+
+Include/exclude glob patterns, with gitignore semantics, evaluated against repository paths
+"""
+
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass, field, replace
+
+
+@dataclass(frozen=True)
+class _Pattern:
+    """
+    Compiled glob pattern
+    """
+
+    regex: re.Pattern
+    negated: bool
+    dir_only: bool
+
+
+def compile_pattern(pattern: str) -> _Pattern:
+    r"""
+    Compile a gitignore-style glob pattern
+
+    - `*` matches anything but a `/`, `?` any character but a `/`, `[...]` a character class,
+      negated by a `!` or a `^` right after the `[`
+    - a `\` escapes the next character, e.g. `\*` or a leading `\!` match a literal `*` or `!`
+    - `**` matches any number of directories: `**/name`, `dir/**` and `a/**/b`
+    - a pattern with a `/` at its start or middle is anchored to the root, otherwise it matches at any depth
+    - a trailing `/` only matches directories
+    - a leading `!` negates the pattern
+    """
+    negated = pattern.startswith('!')
+    pattern = pattern.removeprefix('!')
+
+    dir_only = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+
+    anchored = '/' in pattern
+    pattern = pattern.removeprefix('/')
+
+    regex = '' if anchored else '(?:.*/)?'
+    i = 0
+
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        elif pattern[i] == '\\' and i + 1 < len(pattern):
+            regex += re.escape(pattern[i + 1])
+            i += 2
+        elif pattern[i] == '[' and (translated := _translate_class(pattern, i)) is not None:
+            class_regex, i = translated
+            regex += class_regex
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+
+    return _Pattern(re.compile(regex), negated, dir_only)
+
+
+def _translate_class(pattern: str, start: int) -> tuple[str, int] | None:
+    """
+    Translate the character class starting at pattern[start] to a regex
+
+    Return the regex and the index following the class, or None if the class is not closed
+    """
+    i = start + 1
+    negated = i < len(pattern) and pattern[i] in '!^'
+
+    if negated:
+        i += 1
+
+    # Like `*`, a negated class does not match a `/`
+    regex = '[^/' if negated else '['
+    first = True
+
+    while i < len(pattern):
+        char = pattern[i]
+
+        # A `]` right after the `[` (or `[!`) is part of the class
+        if char == ']' and not first:
+            return f'{regex}]', i + 1
+
+        if char == '\\' and i + 1 < len(pattern):
+            regex += re.escape(pattern[i + 1])
+            i += 2
+        else:
+            regex += f'\\{char}' if char in '\\[]^' else char
+            i += 1
+
+        first = False
+
+    return None
+
+
+def _last_match(patterns: tuple[_Pattern, ...], path: str, is_dir: bool) -> bool | None:
+    """
+    Return whether the last pattern matching the path is a positive one, or None if no pattern matches
+    """
+    for pattern in reversed(patterns):
+        if (is_dir or not pattern.dir_only) and pattern.regex.fullmatch(path):
+            return not pattern.negated
+
+    return None
+
+
+@dataclass(frozen=True)
+class PathFilter:
+    """
+    Selection of the files of a directory listing by include and exclude patterns
+
+    Paths are relative to the downloaded directory. A file is kept if it, or one of its parent directories,
+    matches the include patterns (when there are any), and neither it nor one of its parent directories
+    matches the exclude patterns. As with gitignore, the last matching pattern of a list wins,
+    and a file cannot be re-included once one of its parent directories is excluded,
+    so excluded directories can be pruned without listing their content.
+    """
+
+    include: tuple[_Pattern, ...] = ()
+    exclude: tuple[_Pattern, ...] = ()
+    # Path of the filtered directory in the directory the patterns are relative to (submodules)
+    prefix: str = ''
+    _excluded_dirs: dict[str, bool] = field(default_factory=dict, compare=False, repr=False)
+
+    @classmethod
+    def from_patterns(cls, include: Iterable[str] | None = None, exclude: Iterable[str] | None = None) -> 'PathFilter':
+        """
+        Compile the include and exclude patterns
+        """
+        return cls(
+            include=tuple(compile_pattern(x) for x in include or ()),
+            exclude=tuple(compile_pattern(x) for x in exclude or ()),
+        )
+
+    def under(self, path: str) -> 'PathFilter':
+        """
+        Return the filter of a sub directory, whose paths are relative to it
+        """
+        return replace(self, prefix=f'{self.prefix}{path.strip("/")}/', _excluded_dirs={})
+
+    def match(self, path: str) -> bool:
+        """
+        Return True if the file is kept
+        """
+        path = f'{self.prefix}{path}'
+        parents = _parents(path)
+
+        if any(self._is_excluded_dir(x) for x in parents) or _last_match(self.exclude, path, is_dir=False):
+            return False
+
+        if not self.include:
+            return True
+
+        included = False
+
+        for parent in parents:
+            if (match := _last_match(self.include, parent, is_dir=True)) is not None:
+                included = match
+
+        if (match := _last_match(self.include, path, is_dir=False)) is not None:
+            included = match
+
+        return included
+
+    def prune(self, path: str) -> bool:
+        """
+        Return True if no file under the directory can be kept, so that it does not need to be listed
+        """
+        path = f'{self.prefix}{path}'
+        return any(self._is_excluded_dir(x) for x in (*_parents(path), path))
+
+    def _is_excluded_dir(self, path: str) -> bool:
+        """
+        Return True if the directory matches the exclude patterns, memoized per directory
+        """
+        if (excluded := self._excluded_dirs.get(path)) is None:
+            excluded = self._excluded_dirs[path] = bool(_last_match(self.exclude, path, is_dir=True))
+
+        return excluded
+
+
+def _parents(path: str) -> list[str]:
+    """
+    Return the parent directories of a path, from the outermost
+    """
+    parts = path.split('/')
+    return ['/'.join(parts[:i]) for i in range(1, len(parts))]
@@ -0,0 +1,187 @@
+"""
+Range file module
+
+Large files downloaded by byte ranges, with their progress recorded on disk to resume interrupted downloads
+"""
+
+import json
+import os
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import BinaryIO
+
+from . import file_processing as fp
+
+_logger = getLogger('githubdl')
+
+# Files at least this large are downloaded by byte ranges
+RANGE_THRESHOLD = 32 * 1024 * 1024
+
+# Size of the byte ranges
+RANGE_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Minimum number of byte ranges of a file downloaded concurrently
+RANGE_WORKERS = 4
+
+
+class RangeFile:
+    """
+    File written by byte ranges into a preallocated temporary file
+
+    Ranges are written with positional writes, so that they can be downloaded concurrently in any order.
+    The completed ranges are recorded in a progress file next to the temporary file: if the download is
+    interrupted, the next one with the same blob SHA, size and chunk size only downloads the missing ranges.
+    Once all the ranges are written, the content is checked against the blob SHA before replacing file_name.
+    """
+
+    def __init__(self, file_name: Path, sha: str, size: int, chunk_size: int | None = None) -> None:
+        """
+        Load the progress of a previous download of the same blob, if any
+
+        chunk_size defaults to RANGE_CHUNK_SIZE
+        """
+        self.file_name = file_name
+        self.sha = sha
+        self.size = size
+        self.chunk_size = chunk_size = chunk_size or RANGE_CHUNK_SIZE
+        self.part_name = file_name.with_name(f'.{file_name.name}.part')
+        self.progress_name = file_name.with_name(f'.{file_name.name}.part.json')
+
+        self.chunks = [(start, min(start + chunk_size, size) - 1) for start in range(0, size, chunk_size)]
+        self.done = self._load_progress()
+
+        self._fd: int | None = None
+        self._lock = Lock()
+
+    def _load_progress(self) -> set[int]:
+        """
+        Return the chunks completed by a previous download of the same blob
+        """
+        try:
+            progress = json.loads(self.progress_name.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return set()
+
+        if (
+            not self.part_name.is_file()
+            or progress.get('sha') != self.sha
+            or progress.get('size') != self.size
+            or progress.get('chunk_size') != self.chunk_size
+        ):
+            return set()
+
+        return set(progress.get('done', [])) & set(range(len(self.chunks)))
+
+    def pending(self) -> list[int]:
+        """
+        Return the indexes of the chunks left to download
+        """
+        return [i for i in range(len(self.chunks)) if i not in self.done]
+
+    def __enter__(self) -> 'RangeFile':
+        """
+        Open the temporary file, preallocated to the size of the file
+        """
+        if not self.done:
+            self.part_name.unlink(missing_ok=True)
+
+        self._fd = os.open(self.part_name, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o666)
+
+        if os.fstat(self._fd).st_size != self.size:
+            os.ftruncate(self._fd, self.size)
+
+        return self
+
+    def __exit__(self, *_args: object) -> None:
+        """
+        Close the temporary file, which is kept with its progress file to resume the download
+        """
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def write_chunk(self, index: int, stream: BinaryIO, chunk_size: int = fp.CHUNK_SIZE) -> None:
+        """
+        Write a chunk from a stream of its content at its position in the file, then record it as done
+        """
+        start, end = self.chunks[index]
+        offset = start
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+
+        while read := stream.readinto(buffer):
+            if offset + read > end + 1:
+                err_message = f'Too much data received for bytes {start}-{end} of: {self.file_name}'
+                raise RuntimeError(err_message)
+
+            self._pwrite(view[:read], offset)
+            offset += read
+
+        if offset != end + 1:
+            err_message = f'Incomplete data received for bytes {start}-{end} of: {self.file_name}'
+            raise RuntimeError(err_message)
+
+        with self._lock:
+            self.done.add(index)
+            self._save_progress()
+
+    def _pwrite(self, data: memoryview, offset: int) -> None:
+        """
+        Write data at an offset of the temporary file
+        """
+        if hasattr(os, 'pwrite'):
+            while data:
+                written = os.pwrite(self._fd, data, offset)
+                data = data[written:]
+                offset += written
+            return
+
+        # No positional writes on Windows: serialize the seek and the write
+        with self._lock:
+            os.lseek(self._fd, offset, os.SEEK_SET)
+            while data:
+                data = data[os.write(self._fd, data) :]
+
+    def _save_progress(self) -> None:
+        """
+        Atomically record the completed chunks
+        """
+        fd, tmp_path = fp.make_temp_file(self.progress_name)
+
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(
+                    {'sha': self.sha, 'size': self.size, 'chunk_size': self.chunk_size, 'done': sorted(self.done)}, f
+                )
+
+            tmp_path.replace(self.progress_name)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def commit(self) -> None:
+        """
+        Check the downloaded content against the blob SHA, then move it to file_name
+
+        On a mismatch, the partial download is discarded so that the next one starts over
+        """
+        self.__exit__()
+
+        if (sha := fp.git_blob_sha(self.part_name)) != self.sha:
+            self.discard()
+            err_message = f'Blob SHA mismatch for {self.file_name}: expected {self.sha}, got {sha}'
+            raise RuntimeError(err_message)
+
+        _logger.info('Writing to file: %s', self.file_name)
+
+        self.part_name.replace(self.file_name)
+        self.progress_name.unlink(missing_ok=True)
+
+    def discard(self) -> None:
+        """
+        Remove the temporary file and its progress
+        """
+        self.part_name.unlink(missing_ok=True)
+        self.progress_name.unlink(missing_ok=True)
+        self.done.clear()
@@ -3,78 +3,586 @@ Requests processing module
 """
 
 import json
+import sys
+import time
+from collections import deque
+from collections.abc import Callable, Generator, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
 from logging import getLogger
-from os import environ
+from typing import BinaryIO
+from urllib.parse import parse_qs, urlparse
 
 import requests
 
 from . import url_processing as up
+from .client import Client, get_default_client
+from .json_stream import ArrayStream
 
 _logger = getLogger('githubdl')
 
+# Number of items per page of the paginated lists, the maximum allowed by Github
+PER_PAGE = 100
 
-def get_list_of_files_in_path(repo_url: str, base_path: str, reference: str | None) -> dict[str, str]:
+# Blobs up to this size are fetched in batches through the GraphQL API
+GRAPHQL_MAX_BLOB_SIZE = 32 * 1024
+
+# Maximum number of blobs per GraphQL query: each `object` lookup is a node of the query,
+# and Github rejects or times out queries with too many of them
+GRAPHQL_BATCH_SIZE = 100
+
+# Maximum total size of the blobs of a GraphQL query, which keeps the response size bounded
+GRAPHQL_BATCH_BYTES = 1024 * 1024
+
+# Maximum number of entries of a directory listed by the Contents API, which silently drops the other ones
+CONTENTS_MAX_ENTRIES = 1000
+
+# Types of the Contents API for the types of the Git Trees API
+_CONTENTS_TYPES = {'blob': 'file', 'tree': 'dir', 'commit': 'submodule'}
+
+_GRAPHQL_BLOB_FRAGMENT = 'fragment BlobText on Blob { text byteSize isBinary isTruncated }'
+
+
+class RequestError(RuntimeError):
+    """
+    Raised when the Github API answers a request with an error status
+
+    The `status_code` attribute holds the HTTP status of the response
+    """
+
+    def __init__(self, message: str, status_code: int) -> None:
+        """
+        Build the error message from the Github error message and the status code
+        """
+        self.status_code = status_code
+        super().__init__(f'GET query error!\nmessage: {message}\nStatus code: {status_code}')
+
+
+@dataclass(frozen=True, slots=True)
+class TreeEntry:
+    """
+    Entry of a git tree listing
+
+    `path` is relative to the listed directory, `type` is one of 'blob', 'tree' or 'commit' (submodules)
+    and `size` is only set for blobs
+    """
+
+    path: str
+    type: str
+    mode: str
+    sha: str
+    size: int | None = None
+
+
+def _repo_urls(repo_url: str | up.RepoUrls, client: Client | None) -> up.RepoUrls:
+    """
+    Return the base URLs of a repository, as served to the client (or the default client)
+    """
+    return (client or get_default_client()).repo_urls(repo_url)
+
+
+def get_list_of_files_in_path(
+    repo_url: str,
+    base_path: str,
+    reference: str | None,
+    client: Client | None = None,
+) -> dict[str, str]:
     """
     Get the list of files for a given directory path
+
+    The listing is parsed as it is downloaded. The Contents API lists at most CONTENTS_MAX_ENTRIES entries,
+    so larger directories are listed through the Git Trees API instead
     """
     _logger.info('Retrieving a list of files for directory: %s', base_path)
 
-    response_object = json.loads(download_git_file_content(repo_url, base_path, reference).decode('utf-8'))
-
     files = {}
 
     try:
-        for item in response_object:
-            files[item.get('name')] = item.get('type')
-    except AttributeError as ex:
-        err_message = f'Unable to retrieve list of files from response.\n Response: {response_object}'
+        with stream_git_file_content(repo_url, base_path, reference, client) as stream:
+            for item in ArrayStream(stream):
+                files[item.get('name')] = item.get('type')
+    except (AttributeError, ValueError) as ex:
+        err_message = f'Unable to retrieve list of files from response: {ex}'
         _logger.critical(err_message, exc_info=True)
         raise RuntimeError(err_message) from ex
-    else:
+
+    if len(files) < CONTENTS_MAX_ENTRIES:
         return files
 
+    _logger.info('Directory %s has %d entries or more, listing it through the Git Trees API', base_path, len(files))
+
+    if reference is None:
+        reference = get_default_branch(repo_url, client)
+
+    base_path = base_path.replace('\\', '/').strip('/')
+    entries, _ = get_tree_entries(repo_url, f'{reference}:{base_path}', recursive=False, client=client)
+
+    return {x.path: _CONTENTS_TYPES.get(x.type, x.type) for x in entries}
+
+
+def get_default_branch(repo_url: str, client: Client | None = None) -> str:
+    """
+    Get the name of the default branch of the repository
+    """
+    _logger.info('Retrieving the default branch of: %s', repo_url)
+
+    return json.loads(download_git_repo_info(repo_url, '', client).decode('utf-8'))['default_branch']
+
+
+def resolve_reference(repo_url: str, reference: str | None, client: Client | None = None) -> str:
+    """
+    Resolve a branch, a tag or the default branch (reference is None) to its commit SHA
+
+    Resolutions are memoized by the client for its reference_ttl, so that the runs sharing a client, e.g. the jobs
+    of a manifest, target the same commit, while a long-lived client still follows the branches that move.
+    Concurrent resolutions of the same reference wait for the first one
+    """
+    if reference is not None and up.is_commit_sha(reference):
+        return reference
+
+    client = client or get_default_client()
+    key = (repo_url, reference)
+
+    with client.reference_lock(key):
+        if (resolved := client.resolved_references.get(key)) is not None:
+            sha, resolved_at = resolved
+
+            if time.monotonic() - resolved_at < client.reference_ttl:
+                return sha
+
+        # HEAD is the default branch, resolved in the same single request
+        http_url = up.generate_repo_api_url(_repo_urls(repo_url, client), reference or 'HEAD', None, 'commits')
+
+        _logger.info('Resolving reference: %s at url: %s', reference or 'HEAD', http_url)
+
+        sha = process_request(http_url, client, {'Accept': 'application/vnd.github.sha'}).decode('utf-8').strip()
+
+        _logger.info('Reference %s resolved to commit: %s', reference or 'HEAD', sha)
+
+        client.resolved_references[key] = (sha, time.monotonic())
+
+    return sha
+
+
+def get_tree_entries(
+    repo_url: str,
+    tree_sha: str,
+    recursive: bool,
+    client: Client | None = None,
+    prefix: str = '',
+) -> tuple[list[TreeEntry], bool]:
+    """
+    Get the entries of a git tree, optionally with all of its sub trees, and whether Github truncated the listing
+
+    The response is parsed as it is downloaded, and each item converted to a TreeEntry right away,
+    so that the memory used is about the size of the entries rather than of the JSON body
+    """
+    http_url = up.generate_repo_api_url(_repo_urls(repo_url, client), tree_sha, None, 'git/trees')
+
+    if recursive:
+        http_url = f'{http_url}?recursive=1'
+
+    _logger.info('Requesting tree: %s at url: %s', tree_sha, http_url)
+
+    with stream_request(http_url, client) as stream:
+        tree = ArrayStream(stream, 'tree')
+        entries = [_to_tree_entry(item, prefix) for item in tree]
+
+    return entries, tree.fields.get('truncated', False)
+
+
+def get_tree_listing(
+    repo_url: str,
+    base_path: str,
+    reference: str | None,
+    client: Client | None = None,
+    prune: Callable[[str], bool] | None = None,
+) -> list[TreeEntry]:
+    """
+    Get the recursive listing of a directory through the Git Trees API
+
+    The whole directory is listed with a single request, unless Github truncates the response,
+    in which case every sub tree is walked separately, except the ones for which `prune` returns True
+    """
+    _logger.info('Retrieving the tree of directory: %s', base_path)
+
+    if reference is None:
+        reference = get_default_branch(repo_url, client)
+
+    base_path = base_path.replace('\\', '/').strip('/')
+    tree_ish = f'{reference}:{base_path}' if base_path else reference
+
+    entries: list[TreeEntry] = []
+    _walk_tree(repo_url, tree_ish, '', entries, client=client, prune=prune)
+
+    return entries
+
+
+def _walk_tree(
+    repo_url: str,
+    tree_sha: str,
+    prefix: str,
+    entries: list[TreeEntry],
+    *,
+    client: Client | None,
+    prune: Callable[[str], bool] | None,
+) -> None:
+    """
+    Add the recursive listing of a tree to entries, walking the sub trees one by one when truncated
+    """
+    tree_entries, truncated = get_tree_entries(repo_url, tree_sha, True, client, prefix)
+
+    if not truncated:
+        entries.extend(tree_entries)
+        return
+
+    _logger.warning('Tree listing truncated for: %s, walking its sub trees', prefix or tree_sha)
+
+    # Not kept alive while the sub trees are walked
+    del tree_entries
+
+    for entry in get_tree_entries(repo_url, tree_sha, False, client, prefix)[0]:
+        if entry.type == 'tree' and prune is not None and prune(entry.path):
+            _logger.debug('Pruning tree: %s', entry.path)
+            continue
+
+        entries.append(entry)
+
+        if entry.type == 'tree':
+            _walk_tree(repo_url, entry.sha, f'{entry.path}/', entries, client=client, prune=prune)
+
+
+def _to_tree_entry(item: dict, prefix: str) -> TreeEntry:
+    """
+    Convert an item of a Git Trees API response to a TreeEntry
+
+    The types and modes, shared by many entries, are interned
+    """
+    return TreeEntry(
+        path=f'{prefix}{item["path"]}',
+        type=sys.intern(item['type']),
+        mode=sys.intern(item['mode']),
+        sha=item['sha'],
+        size=item.get('size'),
+    )
+
+
+def get_blob_texts(
+    repo_url: str,
+    file_names: list[str],
+    reference: str,
+    client: Client | None = None,
+) -> dict[str, str | None]:
+    """
+    Get the text content of many files with a single GraphQL query
+
+    Binary, truncated and missing blobs are mapped to None, so that they can be downloaded through REST instead
+    """
+    repo_name = _repo_urls(repo_url, client).repo_name
+    owner, name = repo_name.split('/', 1)
+
+    variables = {'owner': owner, 'name': name}
+    declarations = ['$owner: String!', '$name: String!']
+    fields = []
+
+    for i, file_name in enumerate(file_names):
+        path = file_name.replace('\\', '/').strip('/')
+        variables[f'e{i}'] = f'{reference}:{path}'
+        declarations.append(f'$e{i}: String!')
+        fields.append(f'f{i}: object(expression: $e{i}) {{ ...BlobText }}')
+
+    query = (
+        f'query({", ".join(declarations)}) {{ repository(owner: $owner, name: $name) {{ {" ".join(fields)} }} }} '
+        f'{_GRAPHQL_BLOB_FRAGMENT}'
+    )
 
-def process_request(http_url: str) -> bytes:
+    http_url = up.generate_graphql_api_url(_repo_urls(repo_url, client))
+
+    _logger.info('Requesting %d files at url: %s', len(file_names), http_url)
+
+    repository = process_graphql_request(http_url, query, variables, client)['repository']
+
+    if repository is None:
+        err_message = f'Repository not found: {repo_name}'
+        raise RequestError(err_message, 404)
+
+    texts = {}
+
+    for i, file_name in enumerate(file_names):
+        blob = repository.get(f'f{i}')
+
+        if blob is None or blob.get('isBinary') or blob.get('isTruncated') or blob.get('text') is None:
+            texts[file_name] = None
+        else:
+            texts[file_name] = blob['text']
+
+    return texts
+
+
+def process_graphql_request(
+    http_url: str,
+    query: str,
+    variables: dict[str, str],
+    client: Client | None = None,
+) -> dict:
+    """
+    Make a Github GraphQL API request and return its data
+
+    Errors only affecting some fields (e.g. an unknown path) leave these fields null,
+    a RequestError is raised if the query returned no data at all
+    """
+    client = client or get_default_client()
+
+    with client.post(http_url, {'query': query, 'variables': variables}, {'Accept': 'application/json'}) as response:
+        _check_response(response)
+        result = response.json()
+
+    if (data := result.get('data')) is None:
+        raise RequestError('; '.join(x.get('message', '') for x in result.get('errors', [])), response.status_code)
+
+    for error in result.get('errors', []):
+        _logger.debug('GraphQL error: %s', error.get('message'))
+
+    return data
+
+
+def process_request(http_url: str, client: Client | None = None, headers: dict[str, str] | None = None) -> bytes:
     """
     Make the Github API requests
+
+    Requests go through the given client, or the default one
     """
+    client = client or get_default_client()
+
     try:
-        response = requests.get(
-            # Handle windows and Linux URLs
-            url=http_url.replace('\\', '/'),
-            headers={
-                'Authorization': f'token {environ["GITHUB_TOKEN"]}',
-                'Accept': 'application/vnd.github.v3.raw',
-            },
-            timeout=30,
-        )
+        response = client.get(http_url, headers)
     except requests.exceptions.RequestException:
         _logger.exception('Error requesting file')
-        return b''
-    else:
-        if response.status_code != 200:
-            raise Exception('GET query error!\nmessage: {message}\nStatus code: {status}'.format(**response.json()))
+        raise
+
+    with response:
+        _check_response(response)
 
         return response.content
 
 
-def download_git_file_content(repo_url: str, file_name: str, reference: str | None) -> bytes:
+def _check_response(response: requests.Response) -> None:
+    """
+    Raise a RequestError if the response is not successful
+    """
+    if response.status_code == 200:
+        return
+
+    try:
+        message = response.json().get('message')
+    except ValueError:
+        message = response.text[:200]
+
+    raise RequestError(message, response.status_code)
+
+
+@contextmanager
+def stream_request(
+    http_url: str,
+    client: Client | None = None,
+    cached: bool = True,
+) -> Generator[BinaryIO, None, None]:
+    """
+    Make a Github API request and give access to the response body as a file object
+
+    The body is read from the network as the file object is consumed,
+    so the response is never fully loaded in memory. Without `cached`, the HTTP cache is bypassed
+    """
+    client = client or get_default_client()
+
+    with client.get(http_url, headers={'Accept-Encoding': 'gzip'}, stream=True, cached=cached) as response:
+        _check_response(response)
+
+        # Let urllib3 decompress the body on the fly when the server applied gzip
+        response.raw.decode_content = True
+
+        yield response.raw
+
+
+@contextmanager
+def stream_range_request(
+    http_url: str,
+    start: int,
+    end: int,
+    *,
+    client: Client | None = None,
+) -> Generator[BinaryIO, None, None]:
+    """
+    Make a request for the bytes start to end (inclusive) of a resource and give access to them as a file object
+    """
+    client = client or get_default_client()
+
+    headers = {'Range': f'bytes={start}-{end}', 'Accept-Encoding': 'identity'}
+
+    with client.get(http_url, headers=headers, stream=True) as response:
+        if response.status_code != 206:
+            _check_response(response)
+            err_message = f'Byte ranges not supported by: {http_url}'
+            raise RequestError(err_message, response.status_code)
+
+        yield response.raw
+
+
+def download_git_file_content(
+    repo_url: str,
+    file_name: str,
+    reference: str | None,
+    client: Client | None = None,
+) -> bytes:
     """
     Download the file content for a given file
     """
-    http_url = up.generate_repo_api_url(repo_url, file_name, reference, 'contents')
+    http_url = up.generate_repo_api_url(_repo_urls(repo_url, client), file_name, reference, 'contents')
 
     _logger.info('Requesting file: %s at url: %s', file_name, http_url)
 
-    return process_request(http_url)
+    return process_request(http_url, client)
 
 
-def download_git_repo_info(repo_url: str, info_type: str) -> bytes:
+def get_git_file_info(
+    repo_url: str | up.RepoUrls,
+    file_name: str,
+    reference: str | None,
+    client: Client | None = None,
+) -> dict | list:
+    """
+    Get the metadata of a given file from the Contents API: type, blob SHA and size
+
+    Files up to 1 MB come with their content, base64 encoded. A directory yields the list of its entries
+    """
+    http_url = up.generate_repo_api_url(_repo_urls(repo_url, client), file_name, reference, 'contents')
+
+    _logger.info('Requesting file metadata: %s at url: %s', file_name, http_url)
+
+    return json.loads(process_request(http_url, client, {'Accept': 'application/vnd.github.v3+json'}))
+
+
+@contextmanager
+def stream_git_file_content(
+    repo_url: str | up.RepoUrls,
+    file_name: str,
+    reference: str | None,
+    client: Client | None = None,
+) -> Generator[BinaryIO, None, None]:
+    """
+    Open the file content for a given file as a stream
+    """
+    http_url = up.generate_repo_api_url(_repo_urls(repo_url, client), file_name, reference, 'contents')
+
+    _logger.info('Requesting file: %s at url: %s', file_name, http_url)
+
+    with stream_request(http_url, client) as stream:
+        yield stream
+
+
+@contextmanager
+def stream_git_file_range(
+    repo_url: str | up.RepoUrls,
+    file_name: str,
+    reference: str,
+    start: int,
+    end: int,
+    *,
+    client: Client | None = None,
+) -> Generator[BinaryIO, None, None]:
+    """
+    Open the bytes start to end (inclusive) of a given file as a stream, through the raw content endpoint
+    """
+    http_url = up.generate_raw_url(_repo_urls(repo_url, client), file_name, reference)
+
+    _logger.debug('Requesting bytes %d-%d of file: %s at url: %s', start, end, file_name, http_url)
+
+    with stream_range_request(http_url, start, end, client) as stream:
+        yield stream
+
+
+def download_git_repo_info(repo_url: str, info_type: str, client: Client | None = None) -> bytes:
     """
     Download the repo information for a given repo and information type
     """
-    http_url = up.generate_repo_api_url(repo_url, None, None, info_type)
+    http_url = up.generate_repo_api_url(_repo_urls(repo_url, client), None, None, info_type)
 
     _logger.info('Requesting repository %s  at url: %s', info_type, http_url)
 
-    return process_request(http_url)
+    return process_request(http_url, client)
+
+
+def iter_git_repo_info_pages(
+    repo_url: str,
+    info_type: str,
+    client: Client | None = None,
+    max_workers: int = 4,
+) -> Iterator[list[dict]]:
+    """
+    Iterate over all the pages of a paginated repository information list (tags, branches, ...)
+
+    The first page gives the number of pages through its `Link: rel="last"` header, then the next pages
+    are fetched concurrently, at most max_workers ahead of the consumer. Pages are yielded in order,
+    as soon as they arrive, and the pages not yet requested are never fetched if the consumer stops early.
+    """
+    http_url = f'{up.generate_repo_api_url(_repo_urls(repo_url, client), None, None, info_type)}?per_page={PER_PAGE}'
+
+    _logger.info('Requesting repository %s at url: %s', info_type, http_url)
+
+    first_page, last_page = _get_page(http_url, 1, client)
+    yield first_page
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = deque()
+    next_page = 2
+
+    try:
+        while next_page <= last_page or pending:
+            while next_page <= last_page and len(pending) < max_workers:
+                pending.append(executor.submit(_get_page, http_url, next_page, client))
+                next_page += 1
+
+            yield pending.popleft().result()[0]
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def _get_page(http_url: str, page: int, client: Client | None) -> tuple[list[dict], int]:
+    """
+    Get a page of a paginated list, and the number of the last page
+    """
+    client = client or get_default_client()
+
+    if page > 1:
+        http_url = f'{http_url}&page={page}'
+
+    _logger.debug('Requesting page %d at url: %s', page, http_url)
+
+    with client.get(http_url) as response:
+        _check_response(response)
+
+        if (last_url := response.links.get('last', {}).get('url')) is not None:
+            last_page = int(parse_qs(urlparse(last_url).query)['page'][0])
+        else:
+            last_page = page
+
+        return response.json(), last_page
+
+
+@contextmanager
+def open_git_archive(
+    repo_url: str,
+    reference: str | None,
+    client: Client | None = None,
+) -> Generator[BinaryIO, None, None]:
+    """
+    Open a streamed gzipped tarball of the repository at a given reference
+    """
+    http_url = up.generate_repo_api_url(_repo_urls(repo_url, client), reference, None, 'tarball')
+
+    _logger.info('Requesting repository archive at url: %s', http_url)
+
+    # Not cached: the cache would write the whole archive to disk before it could be extracted
+    with stream_request(http_url, client, cached=False) as stream:
+        yield stream
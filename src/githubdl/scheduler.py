@@ -0,0 +1,200 @@
+"""
+Scheduler module
+
+Rate limit aware scheduling of the Github API requests, with retries
+"""
+
+import random
+import time
+from collections.abc import Callable
+from logging import getLogger
+from threading import Condition
+
+import requests
+
+_logger = getLogger('githubdl')
+
+# Status codes worth retrying
+_TRANSIENT_STATUS = frozenset((500, 502, 503, 504))
+
+# Connection level errors worth retrying
+_TRANSIENT_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+# Source of the backoff jitter, drawn from the OS so that concurrent clients do not retry in step
+_jitter = random.SystemRandom()
+
+
+class Scheduler:
+    """
+    Central scheduler every request of a client goes through
+
+    It tracks the remaining rate limit quota from the X-RateLimit-* headers and reduces the number of
+    concurrent requests as the quota runs low. When the quota is exhausted, or Github asks to slow down
+    (Retry-After, secondary rate limits), every request waits until the given time instead of failing, at most
+    max_rate_limit_waits times per request, after which the last response is returned.
+    Transient server errors and connection errors are retried with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 10,
+        *,
+        max_retries: int = 5,
+        max_rate_limit_waits: int = 10,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        low_budget: int = 100,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """
+        Initialize the rate limit state
+        """
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.max_rate_limit_waits = max_rate_limit_waits
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.low_budget = low_budget
+        self.sleep = sleep
+        self.clock = clock
+
+        self.remaining: int | None = None
+        self.reset: float | None = None
+
+        self._condition = Condition()
+        self._active = 0
+        self._paused_until = 0.0
+
+    def allowed_concurrency(self) -> int:
+        """
+        Return the number of requests allowed to run concurrently for the remaining quota
+        """
+        if self.remaining is None or self.remaining >= self.low_budget:
+            return self.max_concurrency
+
+        return max(1, self.max_concurrency * self.remaining // self.low_budget)
+
+    def run(self, send: Callable[[], requests.Response]) -> requests.Response:
+        """
+        Send a request when the rate limit allows it, retrying it on transient errors
+        """
+        attempt = waits = 0
+
+        while True:
+            self._acquire()
+            try:
+                response = send()
+            except _TRANSIENT_ERRORS as ex:
+                if attempt >= self.max_retries:
+                    raise
+                _logger.warning('Request failed: %s, retrying', ex)
+            else:
+                self._update(response)
+
+                if (delay := self._retry_delay(response)) is None:
+                    return response
+
+                # Waiting for the rate limit to reset is not a failed attempt, but is bounded as well
+                if delay and waits < self.max_rate_limit_waits:
+                    response.close()
+                    self._pause(delay)
+                    waits += 1
+                    continue
+
+                if delay or attempt >= self.max_retries:
+                    return response
+
+                response.close()
+
+                _logger.warning('Request failed with status %d: %s, retrying', response.status_code, response.url)
+            finally:
+                self._release()
+
+            self.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def _acquire(self) -> None:
+        """
+        Wait for the rate limit to allow a new request
+        """
+        with self._condition:
+            while True:
+                if (delay := self._paused_until - self.clock()) > 0:
+                    self._condition.release()
+                    try:
+                        self.sleep(delay)
+                    finally:
+                        self._condition.acquire()
+                elif self._active < self.allowed_concurrency():
+                    break
+                else:
+                    self._condition.wait()
+
+            self._active += 1
+
+    def _release(self) -> None:
+        """
+        Let the next request run
+        """
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def _pause(self, delay: float) -> None:
+        """
+        Hold every request for delay seconds
+        """
+        with self._condition:
+            self._paused_until = max(self._paused_until, self.clock() + delay)
+
+        _logger.warning('Rate limit reached, waiting %.0f seconds', delay)
+
+    def _update(self, response: requests.Response) -> None:
+        """
+        Track the rate limit quota from the response headers
+        """
+        headers = response.headers
+
+        with self._condition:
+            if (remaining := headers.get('X-RateLimit-Remaining')) is not None:
+                self.remaining = int(remaining)
+            if (reset := headers.get('X-RateLimit-Reset')) is not None:
+                self.reset = float(reset)
+
+            if self.remaining == 0 and self.reset is not None:
+                self._paused_until = max(self._paused_until, self.reset + 1)
+
+            self._condition.notify_all()
+
+    def _retry_delay(self, response: requests.Response) -> float | None:
+        """
+        Return None if the response is final, else the delay before retrying it
+
+        The delay is the time to wait for the rate limit, or 0 to use the exponential backoff
+        """
+        headers = response.headers
+
+        if response.status_code in {403, 429}:
+            if (retry_after := headers.get('Retry-After')) is not None:
+                return max(float(retry_after), 1.0)
+
+            if headers.get('X-RateLimit-Remaining') == '0' and (reset := headers.get('X-RateLimit-Reset')):
+                return max(float(reset) - self.clock(), 0) + 1
+
+            if response.status_code == 429 or 'secondary rate limit' in response.text.lower():
+                return 0
+
+            return None
+
+        return 0 if response.status_code in _TRANSIENT_STATUS else None
+
+    def _backoff(self, attempt: int) -> float:
+        """
+        Return the jittered exponential backoff delay of a retry
+        """
+        return min(self.backoff_max, self.backoff_base * 2**attempt) * _jitter.uniform(0.5, 1)
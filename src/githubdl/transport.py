@@ -0,0 +1,192 @@
+"""
+Transport module
+
+Transport adapter recording the HTTP exchanges of a client to a cassette file, and replaying them without network
+"""
+
+import base64
+import hashlib
+import io
+import json
+from collections import deque
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+
+_logger = getLogger('githubdl')
+
+# Request headers telling apart the responses of the same URL
+_MATCHED_HEADERS = ('Accept', 'Range')
+
+# Hop-by-hop response headers, which do not apply to a replayed body
+_DROPPED_HEADERS = frozenset(('connection', 'keep-alive', 'transfer-encoding'))
+
+CASSETTE_MODES = ('once', 'record', 'replay')
+
+
+class CassetteError(RuntimeError):
+    """
+    Raised when a replayed request has no recorded response
+    """
+
+
+class Cassette(HTTPAdapter):
+    """
+    Transport adapter recording the exchanges of a session to a JSON file, or replaying them from it
+
+    Modes:
+    - 'once': replay the cassette if the file exists, otherwise record it
+    - 'record': always send the requests to the network, and (over)write the cassette
+    - 'replay': only replay, a missing file is an error
+
+    Requests are matched by method, URL, Accept and Range headers and body; the same request made several times
+    gets its recorded responses in order, the last one being repeated. Status codes, headers (including the
+    pagination links) and raw bodies are replayed as recorded, from memory. The credentials are never recorded.
+    A recording is written to the file when the cassette is closed, i.e. when its client is closed,
+    unless a request failed to reach the server: an incomplete cassette would fail the next replays.
+    """
+
+    def __init__(self, file_name: Path, mode: str = 'once') -> None:
+        """
+        Load the cassette when replaying
+
+        The client resizes the connection pools of the adapter, which are only used when recording
+        """
+        if mode not in CASSETTE_MODES:
+            err_message = f'Unknown cassette mode: {mode}'
+            raise ValueError(err_message)
+
+        super().__init__()
+
+        self.file_name = file_name
+        self.replaying = mode == 'replay' or (mode == 'once' and file_name.is_file())
+        self._lock = Lock()
+        self._failed = False
+        self._interactions: list[dict] = []
+        self._responses: dict[str, deque[dict]] = {}
+
+        if self.replaying:
+            _logger.debug('Replaying cassette: %s', file_name)
+
+            with file_name.open(encoding='utf-8') as f:
+                self._interactions = json.load(f)['interactions']
+
+            for interaction in self._interactions:
+                self._responses.setdefault(interaction['request']['key'], deque()).append(interaction['response'])
+        else:
+            _logger.debug('Recording cassette: %s', file_name)
+
+    def send(
+        self,
+        request: requests.PreparedRequest,
+        *,
+        stream: bool = False,
+        timeout: float | tuple[float, float] | None = None,
+        verify: bool | str = True,
+        cert: str | tuple[str, str] | None = None,
+        proxies: dict[str, str] | None = None,
+    ) -> requests.Response:
+        """
+        Answer a request from the cassette, or send it and record its response
+        """
+        # The body is always read at once, to be recorded
+        del stream
+
+        key = _request_key(request)
+
+        if self.replaying:
+            with self._lock:
+                if not (responses := self._responses.get(key)):
+                    err_message = f'No recorded response in {self.file_name} for: {key}'
+                    raise CassetteError(err_message)
+
+                recorded = responses.popleft() if len(responses) > 1 else responses[0]
+
+            return self._build(request, recorded)
+
+        try:
+            response = super().send(request, stream=True, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+
+            # Keep the body as sent, still compressed, so that it is decoded like the original when replayed
+            body = response.raw.read(decode_content=False)
+            response.raw.release_conn()
+        except Exception:
+            self._failed = True
+            raise
+
+        recorded = {
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS},
+            'body': base64.b64encode(body).decode('ascii'),
+        }
+
+        with self._lock:
+            self._interactions.append({'request': {'key': key}, 'response': recorded})
+
+        return self._build(request, recorded)
+
+    def _build(self, request: requests.PreparedRequest, recorded: dict) -> requests.Response:
+        """
+        Build a response from a recorded one, its body read from memory
+        """
+        body = base64.b64decode(recorded['body'])
+        headers = {**recorded['headers'], 'Content-Length': str(len(body))}
+
+        raw = HTTPResponse(
+            body=io.BytesIO(body),
+            headers=headers,
+            status=recorded['status'],
+            reason=recorded['reason'],
+            preload_content=False,
+            decode_content=False,
+        )
+
+        return self.build_response(request, raw)
+
+    def save(self) -> None:
+        """
+        Write the recorded exchanges to the cassette file
+        """
+        with self._lock:
+            if self.replaying:
+                return
+
+            if self._failed:
+                _logger.warning('Not writing cassette: %s, some requests failed', self.file_name)
+                return
+
+            _logger.debug('Writing cassette: %s (%d exchanges)', self.file_name, len(self._interactions))
+
+            self.file_name.parent.mkdir(parents=True, exist_ok=True)
+            self.file_name.write_text(
+                json.dumps({'version': 1, 'interactions': self._interactions}, indent=1), encoding='utf-8'
+            )
+
+    def close(self) -> None:
+        """
+        Close the connections, writing the cassette if recording
+        """
+        super().close()
+        self.save()
+
+
+def _request_key(request: requests.PreparedRequest) -> str:
+    """
+    Return the string identifying a request in a cassette
+    """
+    key = f'{request.method} {request.url}'
+
+    for name in _MATCHED_HEADERS:
+        if (value := request.headers.get(name)) is not None:
+            key += f' {name}: {value}'
+
+    if request.body:
+        body = request.body if isinstance(request.body, bytes) else request.body.encode('utf-8')
+        key += f' body: {hashlib.sha256(body).hexdigest()}'
+
+    return key
@@ -2,21 +2,90 @@
 URLs processing module
 """
 
+import posixpath
 from logging import getLogger
+from re import compile as re_compile
 from re import match as re_match
-from urllib.parse import urlparse
+from urllib.parse import quote, urljoin, urlparse
 
 _logger = getLogger('githubdl')
 
+_COMMIT_SHA = re_compile(r'[0-9a-f]{40}')
 
-def generate_repo_api_url(
-    repo_url: str,
-    file_name: str | None,
-    reference: str | None,
-    api_path: str,
-) -> str:
+# API URLs addressing content by commit SHA, whose responses never change
+_IMMUTABLE_URL = re_compile(r'(?:[?&]ref=|/git/trees/|/tarball/)[0-9a-f]{40}(?:[:&?/]|$)')
+
+# Parsed repository URLs, by repository URL and server URL, cleared once it holds this many
+_REPO_URLS_MAX_SIZE = 256
+_repo_urls: dict[tuple[str, str | None], 'RepoUrls'] = {}
+
+
+class RepoUrls:
     """
-    Generate the HTTP repo URL that will be used to query the Github API
+    Base URLs of the APIs serving a repository (Github /Github Enterprise)
+
+    Built once per repository URL, so that the URL of a request is only a matter of appending its path.
+    A plain class rather than a dataclass, which would slow down the import of this module
+    """
+
+    __slots__ = ('api_base', 'domain_name', 'graphql_url', 'raw_base', 'repo_name')
+
+    def __init__(self, domain_name: str, repo_name: str, api_base: str, graphql_url: str, raw_base: str) -> None:
+        """
+        Store the base URLs
+        """
+        self.domain_name = domain_name
+        self.repo_name = repo_name
+        self.api_base = api_base
+        self.graphql_url = graphql_url
+        self.raw_base = raw_base
+
+    def __repr__(self) -> str:
+        """
+        Return the representation of the URLs
+        """
+        return f'RepoUrls({self.domain_name!r}, {self.repo_name!r}, {self.api_base!r})'
+
+    def api_url(self, api_path: str, file_name: str | None = None, reference: str | None = None) -> str:
+        """
+        Return the URL of a repository API endpoint, e.g. api_path='contents' with a file name and a reference
+        """
+        api_path = f'/{api_path}' if api_path else ''
+        return f'{self.api_base}{api_path}{generate_request_string(file_name, reference)}'
+
+    def raw_url(self, file_name: str, reference: str) -> str:
+        """
+        Return the URL of the raw content of a file, which has no size limit and supports byte ranges
+        """
+        path = file_name.replace('\\', '/').strip('/')
+        return f'{self.raw_base}/{reference}/{quote(path)}'
+
+
+def get_repo_urls(repo_url: str | RepoUrls, server_url: str | None = None) -> RepoUrls:
+    """
+    Return the base URLs of a repository, parsed from its SSH or HTTP URL on first use
+
+    With server_url, the root URL of a server with the Github Enterprise layout (e.g. http://127.0.0.1:8000),
+    every URL points to this server instead. Already parsed URLs are returned as is, so that hot loops can skip
+    the lookup.
+    """
+    if isinstance(repo_url, RepoUrls):
+        return repo_url
+
+    key = (repo_url, server_url)
+
+    if (urls := _repo_urls.get(key)) is None:
+        if len(_repo_urls) >= _REPO_URLS_MAX_SIZE:
+            _repo_urls.clear()
+
+        urls = _repo_urls[key] = _parse_repo_urls(repo_url, server_url)
+
+    return urls
+
+
+def _parse_repo_urls(repo_url: str, server_url: str | None) -> RepoUrls:
+    """
+    Parse a repository URL and build its base URLs, for Github, Github Enterprise or the server at server_url
     """
     url_type, domain_name, repo_name = get_url_components(repo_url)
 
@@ -25,15 +94,64 @@ def generate_repo_api_url(
         _logger.critical(err_message)
         raise RuntimeError(err_message)
 
-    return generate_github_api_url(
-        repo_name=repo_name,
+    if server_url:
+        root = server_url.rstrip('/')
+        api_root, graphql_url, raw_root = f'{root}/api/v3', f'{root}/api/graphql', f'{root}/raw'
+    elif domain_name.lower() == 'github.com':
+        api_root, graphql_url = 'https://api.github.com', 'https://api.github.com/graphql'
+        raw_root = 'https://raw.githubusercontent.com'
+    else:
+        api_root, graphql_url = f'https://{domain_name}/api/v3', f'https://{domain_name}/api/graphql'
+        raw_root = f'https://{domain_name}/raw'
+
+    return RepoUrls(
         domain_name=domain_name,
-        file_name=file_name,
-        reference=reference,
-        api_path=api_path,
+        repo_name=repo_name,
+        api_base=f'{api_root}/repos/{repo_name}',
+        graphql_url=graphql_url,
+        raw_base=f'{raw_root}/{repo_name}',
     )
 
 
+def generate_repo_api_url(
+    repo_url: str | RepoUrls,
+    file_name: str | None,
+    reference: str | None,
+    api_path: str,
+) -> str:
+    """
+    Generate the HTTP repo URL that will be used to query the Github API
+    """
+    return get_repo_urls(repo_url).api_url(api_path, file_name, reference)
+
+
+def generate_github_api_url(
+    repo_name: str,
+    domain_name: str,
+    file_name: str,
+    reference: str | None,
+    api_path: str,
+) -> str:
+    """
+    Return the API URL depending on the domain name (Github /Github Enterprise)
+    """
+    return get_repo_urls(f'https://{domain_name}/{repo_name}').api_url(api_path, file_name, reference)
+
+
+def generate_graphql_api_url(repo_url: str | RepoUrls) -> str:
+    """
+    Generate the URL of the GraphQL API serving a repository (Github /Github Enterprise)
+    """
+    return get_repo_urls(repo_url).graphql_url
+
+
+def generate_raw_url(repo_url: str | RepoUrls, file_name: str, reference: str) -> str:
+    """
+    Generate the URL of the raw content of a file, which has no size limit and supports byte ranges
+    """
+    return get_repo_urls(repo_url).raw_url(file_name, reference)
+
+
 def get_url_components(repo_url: str) -> tuple[str | None, str | None, str | None]:
     """
     Extract the URL type, domain name and the repo name from an SSH or an HTTP URL
@@ -69,21 +187,28 @@ def generate_request_string(file_name: str | None, reference: str | None) -> str
     return ''
 
 
-def generate_github_api_url(
-    repo_name: str,
-    domain_name: str,
-    file_name: str,
-    reference: str | None,
-    api_path: str,
-) -> str:
+def is_commit_sha(reference: str) -> bool:
     """
-    Return the API URL depending on the domain name (Github /Github Enterprise)
+    Return True if the reference is a full commit SHA
+    """
+    return _COMMIT_SHA.fullmatch(reference) is not None
+
+
+def is_immutable_url(http_url: str) -> bool:
     """
-    request_string = generate_request_string(file_name, reference)
+    Return True if the API URL is pinned to a commit SHA, so that its response can never change
+    """
+    return _IMMUTABLE_URL.search(http_url) is not None
+
 
-    _logger.info('repo_name: %s api_path: %s request_string: %s', repo_name, api_path, request_string)
+def resolve_submodule_url(repo_url: str, url: str) -> str:
+    """
+    Resolve a submodule URL of a .gitmodules file, which can be relative to the repository URL
+    """
+    if not url.startswith(('./', '../')):
+        return url
 
-    if domain_name.lower() == 'github.com':
-        return f'https://api.github.com/repos/{repo_name}/{api_path}{request_string}'
+    if (res := re_match(r'(git@.+?):(.+?)(?:\.git)?$', repo_url)) is not None:
+        return f'{res.group(1)}:{posixpath.normpath(posixpath.join(res.group(2), url))}'
 
-    return f'https://{domain_name}/api/v3/repos/{repo_name}/{api_path}{request_string}'
+    return urljoin(f'{repo_url.removesuffix("/")}/', url)
@@ -0,0 +1,216 @@
+"""
+Writer module
+
+Filesystem stage of the directory downloads, so that disk I/O does not hold up the network requests
+"""
+
+import io
+import os
+from collections.abc import Callable, Generator, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from logging import getLogger
+from pathlib import Path
+from threading import BoundedSemaphore, Lock
+from typing import TYPE_CHECKING, Any, BinaryIO
+
+from . import file_processing as fp
+
+if TYPE_CHECKING:
+    from .blob_store import BlobStore
+
+_logger = getLogger('githubdl')
+
+# When the written files are synced to disk: never (left to the OS), once each file is written,
+# or all together once the download is complete
+FSYNC_POLICIES = ('none', 'file', 'end')
+
+# Number of threads writing files
+IO_WORKERS = 4
+
+# Maximum number of writes waiting for an I/O thread, or running, before the downloads wait for them
+QUEUE_SIZE = 64
+
+# Files up to this size are downloaded in memory then handed over to the writer, larger ones are streamed to disk
+BUFFERED_MAX_SIZE = 1024 * 1024
+
+
+class Writer:
+    """
+    Writer of the files of a download
+
+    Directories are created once: the writer remembers the ones it created, so that each file does not cost
+    an existence check and a mkdir. Writes are queued to a small pool of I/O threads; the queue is bounded,
+    so that a slow disk holds up the downloads instead of filling the memory with pending writes.
+
+    With the 'file' fsync policy, each file is synced before being renamed into place. With 'end', the files
+    are synced together when the writer is closed, along with their directories.
+
+    The git mode of the listing passed to the write methods is not applied to the written files.
+    """
+
+    # Whether the files are written to the filesystem, under the target path
+    on_disk = True
+
+    def __init__(self, io_workers: int = IO_WORKERS, queue_size: int = QUEUE_SIZE, fsync: str = 'none') -> None:
+        """
+        Start the I/O threads
+        """
+        if fsync not in FSYNC_POLICIES:
+            err_message = f'Unknown fsync policy: {fsync} (expected one of: {", ".join(FSYNC_POLICIES)})'
+            raise ValueError(err_message)
+
+        self.fsync = fsync
+        self._io_workers = io_workers
+        self._executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='githubdl-writer')
+        self._slots = BoundedSemaphore(queue_size)
+        self._lock = Lock()
+        self._dirs: set[Path] = set()
+        self._unsynced: list[Path] = []
+
+    def make_dirs(self, dir_names: Iterable[Path]) -> None:
+        """
+        Create directories along with their missing parents
+
+        The directories not created yet are created in a single pass, parents first,
+        so that the directories of a whole listing cost one mkdir each
+        """
+        with self._lock:
+            new = set()
+
+            for dir_name in dir_names:
+                path = dir_name
+
+                while path not in self._dirs and path not in new:
+                    new.add(path)
+
+                    if path.parent == path:
+                        break
+
+                    path = path.parent
+
+            for dir_name in sorted(new, key=lambda x: len(x.parts)):
+                dir_name.mkdir(exist_ok=True)
+
+            self._dirs.update(new)
+
+    def submit(self, fn: Callable[..., Any], *args: object, **kwargs: object) -> Future:
+        """
+        Run fn(*args, **kwargs) on an I/O thread, waiting first for a free slot in the queue
+        """
+        self._slots.acquire()
+
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def write_bytes(self, file_name: Path, data: bytes, mode: str | None = None) -> None:
+        """
+        Write in-memory content to disk, following the fsync policy
+        """
+        self.write_stream(file_name, io.BytesIO(data), mode)
+
+    def write_stream(self, file_name: Path, stream: BinaryIO, mode: str | None = None) -> int:
+        """
+        Write streamed content to disk, following the fsync policy
+
+        Return the number of bytes written
+        """
+        del mode
+
+        size = fp.write_stream(file_name, stream, fsync=self.fsync == 'file')
+
+        if self.fsync == 'end':
+            with self._lock:
+                self._unsynced.append(file_name)
+
+        return size
+
+    def written(self, file_name: Path) -> None:
+        """
+        Apply the fsync policy to a file written by other means, e.g. materialized from a blob store
+        """
+        if self.fsync == 'file':
+            _fsync(file_name)
+        elif self.fsync == 'end':
+            with self._lock:
+                self._unsynced.append(file_name)
+
+    def materialize(self, blob_store: 'BlobStore', sha: str, file_name: Path, mode: str | None = None) -> bool:
+        """
+        Create file_name from a blob of the store, following the fsync policy
+
+        Return False if the blob is not in the store
+        """
+        del mode
+
+        if not blob_store.materialize(sha, file_name):
+            return False
+
+        self.written(file_name)
+        return True
+
+    @contextmanager
+    def local_file(self, file_name: Path, mode: str | None = None) -> Generator[Path, None, None]:
+        """
+        Yield the path to write file_name to by other means, e.g. by byte ranges, then apply the fsync policy
+        """
+        del mode
+
+        yield file_name
+        self.written(file_name)
+
+    def cancel(self) -> None:
+        """
+        Drop the queued writes, e.g. on Ctrl-C, the running ones are left to complete
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self) -> None:
+        """
+        Wait for the queued writes, then sync the files written so far with the 'end' fsync policy
+        """
+        self._executor.shutdown(wait=True)
+
+        if not self._unsynced:
+            return
+
+        _logger.info('Syncing %d file(s) to disk', len(self._unsynced))
+
+        # The renames into place are only durable once the directories are synced as well
+        dir_names = {x.parent for x in self._unsynced} if os.name != 'nt' else set()
+
+        with ThreadPoolExecutor(max_workers=self._io_workers) as executor:
+            list(executor.map(_fsync, [*self._unsynced, *dir_names]))
+
+        self._unsynced.clear()
+
+    def __enter__(self) -> 'Writer':
+        """
+        Use the writer as a context manager
+        """
+        return self
+
+    def __exit__(self, *_args: object) -> None:
+        """
+        Close the writer when leaving the context
+        """
+        self.close()
+
+
+def _fsync(path: Path) -> None:
+    """
+    Sync a file, or a directory, to disk
+    """
+    # Windows only syncs files opened for writing
+    fd = os.open(path, os.O_RDWR if os.name == 'nt' else os.O_RDONLY)
+
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -2,13 +2,40 @@
 Pytest fixtures
 """
 
-from pathlib import Path
+import base64
+import hashlib
+import io
+import json
+import tarfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from urllib.parse import unquote, urlparse
 
 import pytest
+import requests
 from dotenv import load_dotenv
+from requests.structures import CaseInsensitiveDict
+from urllib3.response import HTTPResponse
+
+from githubdl import client
+from githubdl import request_processing as rp
 
 # ruff: noqa: ANN001
 
+# Files up to this size come with their content in the Contents API metadata
+CONTENTS_INLINE_MAX_SIZE = 1024 * 1024
+
+# A few files of zellij-org/zellij, served by the zellij_repo fixture
+XTASK_SOURCES = ('build', 'ci', 'clippy', 'dist', 'flags', 'format', 'main', 'pipelines', 'test')
+
+ZELLIJ_FILES = {
+    'Cargo.toml': b'[package]\nname = "zellij"\n',
+    '.cargo/config.toml': b'[alias]\nxtask = "run --package xtask --"\n',
+    'xtask/Cargo.toml': b'[package]\nname = "xtask"\n',
+    **{f'xtask/src/{x}.rs': f'// {x}\n'.encode() for x in XTASK_SOURCES},
+    'zellij-utils/Cargo.toml': b'[package]\nname = "zellij-utils"\n',
+}
+
 
 @pytest.fixture(scope='session', autouse=True)
 def load_env_from_dotenv() -> None:
@@ -19,15 +46,250 @@ def load_env_from_dotenv() -> None:
 
 
 @pytest.fixture(autouse=True)
-def change_test_dir(monkeypatch) -> None:
+def change_test_dir(monkeypatch, tmp_path) -> None:
     """
     Change the working directory before running the tests
 
-    Also create the directory if it does not exists
+    Every test gets its own directory, so that the tests can run in parallel (pytest -n)
+    """
+    monkeypatch.chdir(tmp_path)
+
+
+def make_response(status: int, body: bytes = b'', headers: dict[str, str] | None = None) -> requests.Response:
+    """
+    Build a response as returned by the requests session
+    """
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers or {})
+    response.raw = HTTPResponse(body=io.BytesIO(body), headers=headers, status=status, preload_content=False)
+    return response
+
+
+class FakeRepo:
+    """
+    In-memory repository served through a subset of the Github API
+
+    `files` maps repository paths to file contents, `modes` maps some of them to a git mode other than 100644,
+    `gitlinks` maps submodule paths to commit SHAs,
+    `requests` records every requested URL, requesting one of the `failing` paths raises an error
+    and `truncate_recursive` makes recursive tree listings report truncated responses
+    """
+
+    def __init__(self, name: str = 'owner/repo') -> None:
+        self.name = name
+        self.files: dict[str, bytes] = {}
+        self.modes: dict[str, str] = {}
+        self.gitlinks: dict[str, str] = {}
+        self.failing: set[str] = set()
+        self.requests: list[str] = []
+        self.truncate_recursive = False
+        self.commit_sha = 'c0ffee' * 6 + 'c0ff'
+
+    @staticmethod
+    def blob_sha(data: bytes) -> str:
+        """
+        Return the git blob SHA of some data
+        """
+        return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()  # noqa: S324
+
+    def process_request(self, http_url: str, client=None, headers=None) -> bytes:
+        """
+        Answer a Github API request
+        """
+        http_url = http_url.replace('\\', '/')
+        self.requests.append(http_url)
+
+        url = urlparse(http_url)
+        api_path = url.path.split(f'/repos/{self.name}', 1)[1]
+
+        if not api_path:
+            return json.dumps({'default_branch': 'main'}).encode('utf-8')
+
+        if api_path.startswith('/commits/'):
+            return self.commit_sha.encode('utf-8')
+
+        if api_path.startswith('/git/trees/'):
+            tree_sha = unquote(api_path.removeprefix('/git/trees/'))
+            path = tree_sha.removeprefix('tree-') if tree_sha.startswith('tree-') else tree_sha.partition(':')[2]
+            return json.dumps(self.tree(path.strip('/'), recursive=url.query == 'recursive=1')).encode('utf-8')
+
+        path = unquote(api_path.removeprefix('/contents')).strip('/')
+
+        if path in self.failing:
+            raise RuntimeError(f'GET query error!\nmessage: Server Error\nStatus code: 500 ({path})')
+
+        if path in self.files:
+            if (headers or {}).get('Accept') == 'application/vnd.github.v3+json':
+                return json.dumps(self.file_info(path)).encode('utf-8')
+            return self.files[path]
+
+        entries = self.entries(path)
+        if not entries:
+            raise RuntimeError(f'GET query error!\nmessage: Not Found\nStatus code: 404 ({path})')
+
+        return json.dumps([
+            {'name': name, 'type': 'submodule' if type_ == 'commit' else type_} for name, type_ in entries.items()
+        ]).encode('utf-8')
+
+    def file_info(self, path: str) -> dict:
+        """
+        Return the Contents API metadata of a file, with its content up to CONTENTS_INLINE_MAX_SIZE bytes
+        """
+        data = self.files[path]
+        inline = len(data) <= CONTENTS_INLINE_MAX_SIZE
+
+        return {
+            'type': 'file',
+            'path': path,
+            'sha': self.blob_sha(data),
+            'size': len(data),
+            'encoding': 'base64' if inline else 'none',
+            'content': base64.b64encode(data).decode('ascii') if inline else '',
+        }
+
+    def process_graphql_request(self, http_url: str, query: str, variables: dict, client=None) -> dict:  # noqa: ARG002
+        """
+        Answer a GraphQL query made of blob lookups by `<ref>:<path>` expression
+        """
+        self.requests.append(http_url)
+
+        if 'repository(owner: $owner, name: $name)' not in query:
+            raise RuntimeError(f'Unexpected GraphQL query: {query}')
+
+        repository = {}
+        for key, expression in variables.items():
+            if not key.startswith('e'):
+                continue
+
+            data = self.files.get(expression.partition(':')[2])
+            if data is None:
+                repository[f'f{key[1:]}'] = None
+            elif b'\0' in data:
+                repository[f'f{key[1:]}'] = {
+                    'text': None,
+                    'byteSize': len(data),
+                    'isBinary': True,
+                    'isTruncated': False,
+                }
+            else:
+                text = data.decode('utf-8', errors='replace')
+                repository[f'f{key[1:]}'] = {
+                    'text': text,
+                    'byteSize': len(data),
+                    'isBinary': False,
+                    'isTruncated': False,
+                }
+
+        return {'repository': repository}
+
+    @contextmanager
+    def stream_request(self, http_url: str, client=None, cached=True) -> Iterator[io.BytesIO]:  # noqa: ARG002
+        """
+        Answer a streamed Github API request
+        """
+        if '/tarball' in http_url:
+            self.requests.append(http_url)
+            yield io.BytesIO(self.tarball())
+        else:
+            yield io.BytesIO(self.process_request(http_url))
+
+    @contextmanager
+    def stream_range_request(self, http_url: str, start: int, end: int, client=None) -> Iterator[io.BytesIO]:  # noqa: ARG002
+        """
+        Answer a byte range request for the raw content of a file
+        """
+        self.requests.append(http_url)
+
+        # https://raw.githubusercontent.com/<owner>/<repo>/<reference>/<path>
+        path = unquote(urlparse(http_url).path).split(f'/{self.name}/', 1)[1].partition('/')[2]
+
+        yield io.BytesIO(self.files[path][start : end + 1])
+
+    def tarball(self) -> bytes:
+        """
+        Return a gzipped tarball of the repository, wrapped in a top level directory like Github does
+        """
+        buffer = io.BytesIO()
+
+        with tarfile.open(fileobj=buffer, mode='w:gz') as tar:
+            for path, data in sorted(self.files.items()):
+                info = tarfile.TarInfo(f'owner-repo-0123456/{path}')
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+        return buffer.getvalue()
+
+    def entries(self, path: str) -> dict[str, str]:
+        """
+        Return the direct children of a directory with their type ('file', 'dir' or 'commit')
+        """
+        prefix = f'{path}/' if path else ''
+        entries = {}
+        for gitlink_path in self.gitlinks:
+            if gitlink_path.startswith(prefix):
+                name, _, rest = gitlink_path.removeprefix(prefix).partition('/')
+                entries[name] = 'dir' if rest else 'commit'
+        for file_path in self.files:
+            if file_path.startswith(prefix):
+                name, _, rest = file_path.removeprefix(prefix).partition('/')
+                entries[name] = 'dir' if rest else 'file'
+
+        return entries
+
+    def tree(self, path: str, recursive: bool) -> dict:
+        """
+        Return a Git Trees API response for a directory
+        """
+        items = []
+        for name, type_ in sorted(self.entries(path).items()):
+            full_path = f'{path}/{name}'.removeprefix('/')
+            if type_ == 'dir':
+                items.append({'path': name, 'mode': '040000', 'type': 'tree', 'sha': f'tree-{full_path}'})
+                if recursive and not self.truncate_recursive:
+                    items.extend(
+                        {**item, 'path': f'{name}/{item["path"]}'}
+                        for item in self.tree(full_path, recursive=True)['tree']
+                    )
+            elif type_ == 'commit':
+                items.append({'path': name, 'mode': '160000', 'type': 'commit', 'sha': self.gitlinks[full_path]})
+            else:
+                data = self.files[full_path]
+                items.append({
+                    'path': name,
+                    'mode': self.modes.get(full_path, '100644'),
+                    'type': 'blob',
+                    'sha': self.blob_sha(data),
+                    'size': len(data),
+                })
+
+        return {'sha': f'tree-{path}', 'tree': items, 'truncated': recursive and self.truncate_recursive}
+
+
+@pytest.fixture
+def fake_repo(monkeypatch) -> FakeRepo:
+    """
+    Serve an in-memory repository instead of the Github API
+    """
+    repo = FakeRepo()
+
+    monkeypatch.setattr(rp, 'process_request', repo.process_request)
+    monkeypatch.setattr(rp, 'stream_request', repo.stream_request)
+    monkeypatch.setattr(rp, 'process_graphql_request', repo.process_graphql_request)
+    monkeypatch.setattr(rp, 'stream_range_request', repo.stream_range_request)
+
+    return repo
+
+
+@pytest.fixture
+def zellij_repo(fake_repo, monkeypatch) -> FakeRepo:
+    """
+    Serve ZELLIJ_FILES as the zellij-org/zellij repository, to a new default client
     """
-    localpath = Path('tests_data')
+    fake_repo.name = 'zellij-org/zellij'
+    fake_repo.files = dict(ZELLIJ_FILES)
 
-    if not localpath.exists():
-        localpath.mkdir(parents=True)
+    monkeypatch.setenv('GITHUB_TOKEN', 'abc')
+    monkeypatch.setattr(client, '_defaults', {})
 
-    monkeypatch.chdir(localpath)
+    return fake_repo
@@ -1,5 +1,7 @@
 """
 API related tests
+
+These tests run against an in-memory copy of a few zellij-org/zellij files and do not need network access
 """
 
 from collections.abc import Generator
@@ -11,10 +13,14 @@ import pytest
 
 import githubdl
 
+from .conftest import ZELLIJ_FILES
+
 # ruff: noqa: D401
 # ruff: noqa: S101
 # ruff: noqa: ANN001
 
+pytestmark = pytest.mark.usefixtures('zellij_repo')
+
 
 @pytest.fixture
 def path_file_str() -> Generator[str, Any, None]:
@@ -130,13 +136,14 @@ def test_download_file_http(path_file_str, http_repo_url) -> None:
 
     path_obj = Path(path_file_str)
     assert path_obj.is_file()
-    assert path_obj.stat().st_size > 0
+    assert path_obj.read_bytes() == ZELLIJ_FILES[path_file_str]
 
 
 def test_download_file_http_by_sha_reference_file_present(
     path_file_str,
     http_repo_url,
     reference_sha,
+    zellij_repo,
 ) -> None:
     githubdl.dl_file(
         repo_url=http_repo_url,
@@ -146,13 +153,15 @@ def test_download_file_http_by_sha_reference_file_present(
 
     path_obj = Path(path_file_str)
     assert path_obj.is_file()
-    assert path_obj.stat().st_size > 0
+    assert path_obj.read_bytes() == ZELLIJ_FILES[path_file_str]
+    assert zellij_repo.requests[-1].endswith(f'/contents/{path_file_str}?ref={reference_sha}')
 
 
 def test_download_file_http_by_tag_reference_file_present(
     path_file_str,
     http_repo_url,
     reference_tag,
+    zellij_repo,
 ) -> None:
     githubdl.dl_file(
         repo_url=http_repo_url,
@@ -162,7 +171,8 @@ def test_download_file_http_by_tag_reference_file_present(
 
     path_obj = Path(path_file_str)
     assert path_obj.is_file()
-    assert path_obj.stat().st_size > 0
+    assert path_obj.read_bytes() == ZELLIJ_FILES[path_file_str]
+    assert zellij_repo.requests[-1].endswith(f'/contents/{path_file_str}?ref={reference_tag}')
 
 
 def test_download_directory_http(path_dir_str, http_repo_url, dir_content) -> None:
@@ -183,6 +193,7 @@ def test_download_directory_http(path_dir_str, http_repo_url, dir_content) -> No
         x_path = Path(x)
         assert x_path.exists()
         assert x_path.is_file()
+        assert x_path.read_bytes() == ZELLIJ_FILES[x]
 
 
 def test_download_file_ssh(path_file_str, ssh_repo_url) -> None:
@@ -193,7 +204,7 @@ def test_download_file_ssh(path_file_str, ssh_repo_url) -> None:
 
     path_obj = Path(path_file_str)
     assert path_obj.is_file()
-    assert path_obj.stat().st_size > 0
+    assert path_obj.read_bytes() == ZELLIJ_FILES[path_file_str]
 
 
 def test_download_directory_ssh(path_dir_str, ssh_repo_url, dir_content) -> None:
@@ -214,3 +225,4 @@ def test_download_directory_ssh(path_dir_str, ssh_repo_url, dir_content) -> None
         x_path = Path(x)
         assert x_path.exists()
         assert x_path.is_file()
+        assert x_path.read_bytes() == ZELLIJ_FILES[x]
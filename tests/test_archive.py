@@ -0,0 +1,152 @@
+"""
+Archive output tests
+
+These tests run against an in-memory repository and do not need network access
+"""
+
+import io
+import stat
+import tarfile
+import zipfile
+
+import pytest
+
+import githubdl
+from githubdl import api
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+REPO_URL = 'https://github.com/owner/repo'
+
+
+@pytest.fixture
+def files(fake_repo) -> dict[str, bytes]:
+    """
+    Serve a directory with an executable file and a symlink
+    """
+    fake_repo.files = {
+        'src/a.txt': b'a' * 10,
+        'src/bin/run.sh': b'#!/bin/sh\n',
+        'src/link': b'a.txt',
+        'src/sub/deep/b.txt': b'b' * 20,
+    }
+    fake_repo.modes = {'src/bin/run.sh': '100755', 'src/link': '120000'}
+    return fake_repo.files
+
+
+def read_tar(file_name) -> dict[str, tuple[int, bytes | str]]:
+    """
+    Return the mode and content (or link target) of the members of a tar archive
+    """
+    with tarfile.open(file_name) as tar:
+        return {x.name: (x.mode, x.linkname if x.issym() else tar.extractfile(x).read()) for x in tar.getmembers()}
+
+
+def test_tar_gz_output(files, tmp_path) -> None:
+    output = tmp_path / 'out.tar.gz'
+
+    githubdl.dl_dir(REPO_URL, 'src', target_path='repo', max_workers=4, output_archive=output)
+
+    assert read_tar(output) == {
+        'repo/src/a.txt': (0o644, files['src/a.txt']),
+        'repo/src/bin/run.sh': (0o755, files['src/bin/run.sh']),
+        'repo/src/link': (0o777, 'a.txt'),
+        'repo/src/sub/deep/b.txt': (0o644, files['src/sub/deep/b.txt']),
+    }
+    # Nothing but the archive is written
+    assert list(tmp_path.iterdir()) == [output]
+
+
+def test_zip_output(files, tmp_path) -> None:
+    output = tmp_path / 'out.zip'
+
+    githubdl.dl_dir(REPO_URL, 'src', max_workers=4, graphql=True, output_archive=output)
+
+    with zipfile.ZipFile(output) as archive:
+        members = {x.filename: (x.external_attr >> 16, archive.read(x)) for x in archive.infolist()}
+
+    assert members == {
+        'src/a.txt': (stat.S_IFREG | 0o644, files['src/a.txt']),
+        'src/bin/run.sh': (stat.S_IFREG | 0o755, files['src/bin/run.sh']),
+        'src/link': (stat.S_IFLNK | 0o777, b'a.txt'),
+        'src/sub/deep/b.txt': (stat.S_IFREG | 0o644, files['src/sub/deep/b.txt']),
+    }
+    assert list(tmp_path.iterdir()) == [output]
+
+
+def test_tar_zst_output(files, tmp_path) -> None:
+    zstandard = pytest.importorskip('zstandard')
+    output = tmp_path / 'out.tar.zst'
+
+    githubdl.dl_dir(REPO_URL, 'src/sub', max_workers=2, output_archive=output)
+
+    with zstandard.open(output, 'rb') as f, tarfile.open(fileobj=io.BytesIO(f.read())) as tar:
+        assert [(x.name, tar.extractfile(x).read()) for x in tar] == [
+            ('src/sub/deep/b.txt', files['src/sub/deep/b.txt'])
+        ]
+
+
+def test_large_files_output(monkeypatch, fake_repo, tmp_path) -> None:
+    monkeypatch.setattr(api, 'BUFFERED_MAX_SIZE', 100)
+    monkeypatch.setattr(api, 'RANGE_THRESHOLD', 1000)
+    fake_repo.files = {
+        'src/small.txt': b's' * 50,
+        'src/streamed.bin': b'm' * 500,
+        'src/ranges.bin': bytes(range(256)) * 8,
+    }
+    output = tmp_path / 'out.tar.gz'
+
+    githubdl.dl_dir(REPO_URL, 'src', max_workers=4, output_archive=output)
+
+    assert {k: v for k, (_, v) in read_tar(output).items()} == fake_repo.files
+    assert list(tmp_path.iterdir()) == [output]
+
+
+def test_member_names_are_normalized(files, tmp_path) -> None:
+    output = tmp_path / 'out.tar.gz'
+
+    githubdl.dl_dir(REPO_URL, 'src/sub', target_path='a/./b/../repo', output_archive=output)
+
+    assert list(read_tar(output)) == ['a/repo/src/sub/deep/b.txt']
+
+    with pytest.raises(ValueError, match='outside of the archive'):
+        githubdl.dl_dir(REPO_URL, 'src/sub', target_path='a/../..', output_archive=tmp_path / 'escape.tar.gz')
+
+    assert list(tmp_path.iterdir()) == [output]
+
+
+def test_blob_store_output(fake_repo, tmp_path) -> None:
+    fake_repo.files = {'src/a.txt': b'a' * 10}
+    store = githubdl.BlobStore(tmp_path / 'store')
+
+    githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path / 'checkout'), blob_store=store)
+    requests = len(fake_repo.requests)
+    assert any('/contents/src/a.txt' in x for x in fake_repo.requests)
+
+    githubdl.dl_dir(REPO_URL, 'src', blob_store=store, output_archive=tmp_path / 'out.zip')
+
+    with zipfile.ZipFile(tmp_path / 'out.zip') as archive:
+        assert archive.read('src/a.txt') == b'a' * 10
+
+    # Listing only, the content comes from the store
+    assert not any('/contents/src/a.txt' in x for x in fake_repo.requests[requests:])
+
+
+def test_failed_download_discards_archive(files, fake_repo, tmp_path) -> None:
+    fake_repo.failing = {'src/a.txt'}
+
+    with pytest.raises(githubdl.DownloadError):
+        githubdl.dl_dir(REPO_URL, 'src', max_workers=2, output_archive=tmp_path / 'out.zip')
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_invalid_output_archive(files, tmp_path) -> None:
+    with pytest.raises(ValueError, match='Unsupported archive'):
+        githubdl.dl_dir(REPO_URL, 'src', output_archive=tmp_path / 'out.rar')
+
+    with pytest.raises(ValueError, match='sync, delete'):
+        githubdl.dl_dir(REPO_URL, 'src', sync=True, delete=True, output_archive=tmp_path / 'out.zip')
+
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,94 @@
+"""
+Blob store tests
+"""
+
+import os
+import stat
+import time
+
+import githubdl
+from githubdl import file_processing as fp
+from githubdl.blob_store import BlobStore
+
+from .conftest import CONTENTS_INLINE_MAX_SIZE, FakeRepo
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+REPO_URL = 'https://github.com/owner/repo'
+
+
+def test_git_blob_sha(tmp_path) -> None:
+    file_name = tmp_path / 'file.txt'
+    file_name.write_bytes(b'hello\n')
+
+    # Value from `git hash-object`
+    assert fp.git_blob_sha(file_name) == 'ce013625030ba8dba906f756967f9e9ca394464a'
+
+
+def test_materialize_from_store(tmp_path) -> None:
+    store = BlobStore(tmp_path / 'store')
+    source = tmp_path / 'source.txt'
+    source.write_bytes(b'content')
+    sha = fp.git_blob_sha(source)
+
+    store.add(sha, source)
+    assert store.has(sha)
+
+    # The source is copied into the store, and left untouched
+    source.write_bytes(b'changed')
+    assert source.stat().st_mode & stat.S_IWUSR
+
+    target = tmp_path / 'target.txt'
+    assert store.materialize(sha, target)
+    assert target.read_bytes() == b'content'
+    assert not store.materialize('0' * 40, tmp_path / 'missing.txt')
+    assert not (tmp_path / 'missing.txt').exists()
+
+
+def test_gc(tmp_path) -> None:
+    store = BlobStore(tmp_path / 'store')
+
+    for i in range(4):
+        source = tmp_path / f'{i}.txt'
+        source.write_bytes(b'x' * 100 + bytes([i]))
+        store.add(sha := fp.git_blob_sha(source), source)
+        os.utime(store.path(sha), (time.time() - (4 - i) * 86400,) * 2)
+
+    assert store.gc(max_age=2.5 * 86400) == (2, 202)
+    assert store.gc(max_size=150) == (1, 101)
+    assert len(list(store.objects.glob('*/*'))) == 1
+
+
+def test_dl_dir_reuses_stored_blobs(fake_repo, tmp_path) -> None:
+    fake_repo.files.update({'src/a.txt': b'a', 'src/b/c.txt': b'c'})
+    store = BlobStore(tmp_path / 'store')
+
+    githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path / 'v1'), blob_store=store)
+    fake_repo.requests.clear()
+    githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path / 'v2'), blob_store=store)
+
+    assert not [x for x in fake_repo.requests if '/contents/' in x]
+    assert (tmp_path / 'v2/src/b/c.txt').read_bytes() == b'c'
+    assert store.has(FakeRepo.blob_sha(b'a'))
+
+
+def test_dl_file_reuses_stored_blobs(fake_repo, tmp_path) -> None:
+    fake_repo.files.update({'a.txt': b'a', 'large.bin': b'l' * (CONTENTS_INLINE_MAX_SIZE + 1)})
+    store = BlobStore(tmp_path / 'store')
+    (tmp_path / 'v1').mkdir()
+    (tmp_path / 'v2').mkdir()
+
+    for file_name in fake_repo.files:
+        githubdl.dl_file(REPO_URL, file_name, str(tmp_path / 'v1' / file_name), blob_store=store)
+
+    assert store.has(FakeRepo.blob_sha(b'a'))
+    # Only the large file is downloaded after its metadata
+    assert len([x for x in fake_repo.requests if '/contents/' in x]) == 3
+
+    fake_repo.requests.clear()
+    for file_name in fake_repo.files:
+        githubdl.dl_file(REPO_URL, file_name, str(tmp_path / 'v2' / file_name), blob_store=store)
+
+    assert len([x for x in fake_repo.requests if '/contents/' in x]) == 2
+    assert {x: (tmp_path / 'v2' / x).read_bytes() for x in fake_repo.files} == fake_repo.files
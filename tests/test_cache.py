@@ -0,0 +1,119 @@
+"""
+HTTP cache tests
+"""
+
+import pytest
+import requests
+
+from githubdl import request_processing as rp
+from githubdl.cache import HttpCache
+from githubdl.client import Client
+
+from .conftest import make_response
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+URL = 'https://api.github.com/repos/owner/repo/contents/file.txt?ref=main'
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path) -> tuple[Client, list[dict[str, str]]]:
+    """
+    Return a cached client answering with an ETag, and the list of the headers it sent
+    """
+    client = Client(token='abc', cache=HttpCache(tmp_path / 'cache'))
+    sent = []
+
+    def get(url, headers, **_kwargs) -> requests.Response:
+        sent.append(headers)
+        if headers.get('If-None-Match') == '"v1"':
+            return make_response(304)
+        return make_response(200, b'content', {'ETag': '"v1"', 'Content-Type': 'text/plain'})
+
+    monkeypatch.setattr(client.session, 'get', get)
+
+    return client, sent
+
+
+def test_revalidated_from_cache(server) -> None:
+    client, sent = server
+
+    with client.get(URL) as first, client.get(URL) as second:
+        assert first.content == second.content == b'content'
+        assert second.headers['Content-Type'] == 'text/plain'
+
+    assert 'If-None-Match' not in sent[0]
+    assert sent[1]['If-None-Match'] == '"v1"'
+
+
+def test_streamed_from_cache(server) -> None:
+    client, _ = server
+    client.get(URL).close()
+
+    with client.get(URL, stream=True) as response:
+        assert response.raw.read() == b'content'
+
+
+def test_cached_per_representation(server) -> None:
+    client, sent = server
+    client.get(URL).close()
+
+    # Another representation of the same URL is not revalidated against the cached one
+    client.get(URL, {'Accept': 'application/vnd.github.v3+json'}).close()
+    client.get(URL, {'Accept': 'application/vnd.github.v3+json'}).close()
+
+    assert 'If-None-Match' not in sent[1]
+    assert sent[2]['If-None-Match'] == '"v1"'
+
+
+def test_archive_not_cached(server) -> None:
+    client, sent = server
+
+    with rp.open_git_archive('https://github.com/owner/repo', 'main', client) as stream:
+        assert stream.read() == b'content'
+
+    assert 'If-None-Match' not in sent[0]
+    assert not list(client.cache.cache_dir.rglob('*'))
+
+
+def test_cached_per_token(server, monkeypatch) -> None:
+    client, sent = server
+    client.get(URL).close()
+
+    other = Client(token='other', cache=client.cache)
+    monkeypatch.setattr(other.session, 'get', client.session.get)
+    other.get(URL).close()
+
+    # The response cached for the first token is neither revalidated nor served for the other one
+    assert 'If-None-Match' not in sent[1]
+
+
+def test_served_entry_closed_once_read(server) -> None:
+    client, _ = server
+    client.get(URL).close()
+
+    response = client.get(URL, stream=True)
+    assert response.raw.read() == b'content'
+    assert response.raw._fp.closed
+
+
+def test_not_cached_without_validators(monkeypatch, tmp_path) -> None:
+    client = Client(token='abc', cache=HttpCache(tmp_path))
+    monkeypatch.setattr(client.session, 'get', lambda *_args, **_kwargs: make_response(200, b'content'))
+
+    assert client.get(URL).content == b'content'
+    assert not list(tmp_path.glob('*/*'))
+
+
+def test_least_recently_used_evicted(tmp_path) -> None:
+    cache = HttpCache(tmp_path, max_size=3000)
+
+    for i in range(5):
+        cache.store(f'{URL}{i}', make_response(200, b'x' * 1000, {'ETag': str(i)})).close()
+
+    with cache.response(f'{URL}4') as response:
+        assert response.content == b'x' * 1000
+
+    assert cache.response(f'{URL}0') is None
+    assert sum(x.stat().st_size for x in tmp_path.glob('*/*')) <= 3000
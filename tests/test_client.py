@@ -0,0 +1,31 @@
+"""
+HTTP client tests
+"""
+
+from githubdl import client as cl
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+
+def test_default_headers() -> None:
+    with cl.Client(token='abc') as client:
+        assert client.session.headers['Authorization'] == 'token abc'
+        assert client.session.headers['Accept'] == 'application/vnd.github.v3.raw'
+
+
+def test_pool_is_only_grown() -> None:
+    with cl.Client(token='abc', pool_size=4) as client:
+        client.resize_pool(16)
+        assert client.pool_size == 16
+        assert client.session.get_adapter('https://api.github.com')._pool_maxsize == 16  # noqa: SLF001
+
+        client.resize_pool(2)
+        assert client.pool_size == 16
+
+
+def test_default_client_is_shared(monkeypatch) -> None:
+    monkeypatch.setenv('GITHUB_TOKEN', 'abc')
+    monkeypatch.setattr(cl, '_defaults', {})
+
+    assert cl.get_default_client() is cl.get_default_client()
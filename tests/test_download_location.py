@@ -1,9 +1,10 @@
 """
 File download tests
+
+These tests run against an in-memory copy of a few zellij-org/zellij files and do not need network access
 """
 
 from collections.abc import Generator
-from os import environ
 from pathlib import Path
 from shutil import rmtree
 from typing import Any
@@ -12,9 +13,13 @@ import pytest
 
 import githubdl
 
+from .conftest import ZELLIJ_FILES
+
 # ruff: noqa: S101
 # ruff: noqa: ANN001
 
+pytestmark = pytest.mark.usefixtures('zellij_repo')
+
 
 files_list = [
     {
@@ -193,13 +198,6 @@ def file_info(request) -> Generator[dict[str, str], Any, None]:
         loc_path.unlink()
 
 
-def test_github_token() -> None:
-    """
-    Test if the github token has been set
-    """
-    assert environ.get('GITHUB_TOKEN', '')
-
-
 def test_file_download_correct_path(file_info) -> None:
     """
     Test download files
@@ -212,7 +210,7 @@ def test_file_download_correct_path(file_info) -> None:
 
     path_obj = Path(file_info['expected_path'])
     assert path_obj.is_file()
-    assert path_obj.stat().st_size > 0
+    assert path_obj.read_bytes() == ZELLIJ_FILES[file_info['src']]
 
 
 def test_directory_download_correct_path(directory_info) -> None:
@@ -234,3 +232,4 @@ def test_directory_download_correct_path(directory_info) -> None:
         x_path = Path(x)
         assert x_path.exists()
         assert x_path.is_file()
+        assert x_path.read_bytes() == ZELLIJ_FILES[x.removeprefix(f'{directory_info["target"]}/')]
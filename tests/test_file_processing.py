@@ -0,0 +1,64 @@
+"""
+Files processing tests
+"""
+
+import hashlib
+import io
+import stat
+
+import pytest
+
+from githubdl import file_processing as fp
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+
+class FailingStream(io.BytesIO):
+    """
+    Stream that fails after its first chunk
+    """
+
+    def readinto(self, buffer) -> int:
+        if self.tell():
+            raise ConnectionError('connection reset')
+        return super().readinto(buffer)
+
+
+def test_write_stream_in_chunks(tmp_path) -> None:
+    data = bytes(range(256)) * 100
+    file_name = tmp_path / 'data.bin'
+
+    assert fp.write_stream(file_name, io.BytesIO(data), chunk_size=1000) == len(data)
+    assert file_name.read_bytes() == data
+    assert list(tmp_path.iterdir()) == [file_name]
+
+
+def test_write_stream_is_atomic(tmp_path) -> None:
+    file_name = tmp_path / 'data.bin'
+    file_name.write_bytes(b'previous')
+
+    with pytest.raises(ConnectionError):
+        fp.write_stream(file_name, FailingStream(b'x' * 100), chunk_size=10)
+
+    assert file_name.read_bytes() == b'previous'
+    assert list(tmp_path.iterdir()) == [file_name]
+
+
+def test_git_blob_sha_large_file(tmp_path) -> None:
+    data = bytes(range(256)) * (fp.MMAP_THRESHOLD // 128)
+    file_name = tmp_path / 'large.bin'
+    file_name.write_bytes(data)
+
+    assert fp.git_blob_sha(file_name) == hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()  # noqa: S324
+
+
+def test_write_stream_default_permissions(tmp_path) -> None:
+    file_name = tmp_path / 'data.bin'
+    reference = tmp_path / 'reference.bin'
+    reference.write_bytes(b'')
+
+    fp.write_stream(file_name, io.BytesIO(b'data'))
+
+    # Same permissions as a file created by open(), rather than the 0600 of a temporary file
+    assert stat.S_IMODE(file_name.stat().st_mode) == stat.S_IMODE(reference.stat().st_mode) == 0o666 & ~fp._UMASK
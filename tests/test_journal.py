@@ -0,0 +1,92 @@
+"""
+Job journal tests
+
+These tests run against an in-memory repository and do not need network access
+"""
+
+import json
+
+import pytest
+
+import githubdl
+from githubdl.journal import JOURNAL_NAME, Journal
+
+from .conftest import FakeRepo
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+REPO_URL = 'https://github.com/owner/repo'
+
+
+@pytest.fixture
+def populated_repo(fake_repo) -> FakeRepo:
+    """
+    Fill the in-memory repository with a few files
+    """
+    for i in range(10):
+        fake_repo.files[f'data/file_{i}.txt'] = f'content {i}'.encode()
+
+    return fake_repo
+
+
+def downloaded(repo: FakeRepo) -> list[str]:
+    """
+    Return the files downloaded through the Contents API
+    """
+    return sorted(x.rsplit('/contents/', 1)[1].split('?')[0] for x in repo.requests if '/contents/' in x)
+
+
+def test_resume_skips_completed_files(populated_repo, tmp_path) -> None:
+    populated_repo.failing.update({'data/file_3.txt', 'data/file_7.txt'})
+
+    with pytest.raises(githubdl.DownloadError):
+        githubdl.dl_dir(REPO_URL, 'data', target_path=str(tmp_path), max_workers=4)
+
+    records = [json.loads(x) for x in (tmp_path / JOURNAL_NAME).read_text().splitlines()]
+    assert len([x for x in records if x['event'] == 'planned']) == 10
+    assert len([x for x in records if x['event'] == 'done']) == 8
+
+    populated_repo.failing.clear()
+    populated_repo.requests.clear()
+
+    githubdl.dl_dir(REPO_URL, 'data', target_path=str(tmp_path), max_workers=4, resume=True)
+
+    assert downloaded(populated_repo) == ['data/file_3.txt', 'data/file_7.txt']
+    assert not (tmp_path / JOURNAL_NAME).exists()
+    assert len(list((tmp_path / 'data').iterdir())) == 10
+
+
+def test_resume_checks_sha_and_presence(populated_repo, tmp_path) -> None:
+    populated_repo.failing.add('data/file_0.txt')
+
+    with pytest.raises(githubdl.DownloadError):
+        githubdl.dl_dir(REPO_URL, 'data', target_path=str(tmp_path))
+
+    populated_repo.failing.clear()
+    populated_repo.files['data/file_1.txt'] = b'changed upstream'
+    (tmp_path / 'data/file_2.txt').unlink()
+    populated_repo.requests.clear()
+
+    githubdl.dl_dir(REPO_URL, 'data', target_path=str(tmp_path), resume=True)
+
+    assert downloaded(populated_repo) == ['data/file_0.txt', 'data/file_1.txt', 'data/file_2.txt']
+
+
+def test_journal_ignores_truncated_record(tmp_path) -> None:
+    journal = Journal(tmp_path / JOURNAL_NAME)
+    journal.planned({'a': '1', 'b': '2'})
+    journal.done('a', '1')
+    journal.close(success=False)
+
+    with (tmp_path / JOURNAL_NAME).open('a') as f:
+        f.write('{"event": "done", "pa')
+
+    resumed = Journal(tmp_path / JOURNAL_NAME, resume=True)
+    resumed.close(success=False)
+    assert resumed.completed == {'a': '1'}
+
+    restarted = Journal(tmp_path / JOURNAL_NAME)
+    restarted.close(success=False)
+    assert restarted.completed == {}
+    assert not (tmp_path / JOURNAL_NAME).read_text()
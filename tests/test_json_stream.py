@@ -0,0 +1,44 @@
+"""
+Incremental JSON parsing tests
+"""
+
+import io
+import json
+
+import pytest
+
+from githubdl.json_stream import ArrayStream
+
+# ruff: noqa: S101
+
+TREE = {
+    'sha': 'abc',
+    'url': 'https://api.github.com/repos/owner/repo/git/trees/abc',
+    'tree': [
+        {'path': f'dir/fïle_{i}.txt', 'type': 'blob', 'size': 123456789 + i, 'ok': [True, None]} for i in range(50)
+    ],
+    'truncated': False,
+}
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 64 * 1024])
+def test_object_array(chunk_size) -> None:  # noqa: ANN001
+    body = json.dumps(TREE, ensure_ascii=False, indent=1).encode()
+    tree = ArrayStream(io.BytesIO(body), 'tree', chunk_size)
+
+    assert list(tree) == TREE['tree']
+    assert tree.fields == {'sha': 'abc', 'url': TREE['url'], 'truncated': False}
+
+
+@pytest.mark.parametrize('body', [b'[]', b' [ 1 , 2.5e3,"x" ] \n', b'{}', b'{"truncated": true}'])
+def test_small_values(body) -> None:  # noqa: ANN001
+    value = json.loads(body)
+    key = None if isinstance(value, list) else 'tree'
+
+    assert list(ArrayStream(io.BytesIO(body), key, 1)) == (value if key is None else [])
+
+
+@pytest.mark.parametrize('body', [b'', b'[1, 2', b'[1 2]', b'{"tree": [1]} x', b'"text"', b'plain file'])
+def test_invalid(body) -> None:  # noqa: ANN001
+    with pytest.raises(ValueError):  # noqa: PT011
+        list(ArrayStream(io.BytesIO(body), None if body.startswith(b'[') else 'tree', 3))
@@ -0,0 +1,111 @@
+"""
+Manifest mode tests
+
+These tests run against an in-memory repository and do not need network access
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+import githubdl
+from githubdl.manifest import tomllib
+
+from .conftest import FakeRepo
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+REPO_URL = 'https://github.com/owner/repo'
+
+
+@pytest.fixture
+def populated_repo(fake_repo) -> FakeRepo:
+    """
+    Fill the in-memory repository with a few directories
+    """
+    fake_repo.files.update({
+        'docs/index.md': b'index',
+        'proto/a.proto': b'a',
+        'proto/b.proto': b'b',
+        'proto/README.md': b'readme',
+        'VERSION': b'1.0',
+    })
+
+    return fake_repo
+
+
+def test_load_json_manifest(tmp_path) -> None:
+    manifest = tmp_path / 'jobs.json'
+    manifest.write_text(
+        json.dumps({
+            'jobs': [
+                {'url': REPO_URL, 'dir': 'proto', 'target': 'out', 'include': '*.proto'},
+                {'url': REPO_URL, 'file': 'VERSION', 'reference': 'v1', 'via-archive': False},
+            ]
+        })
+    )
+
+    assert githubdl.load_manifest(manifest) == [
+        githubdl.Job(url=REPO_URL, dir='proto', target='out', include=('*.proto',)),
+        githubdl.Job(url=REPO_URL, file='VERSION', reference='v1'),
+    ]
+
+
+@pytest.mark.skipif(tomllib is None, reason='tomllib requires Python 3.11')
+def test_load_toml_manifest(tmp_path) -> None:
+    manifest = tmp_path / 'jobs.toml'
+    manifest.write_text(
+        '[[jobs]]\n'
+        f'url = "{REPO_URL}"\n'
+        'dir = "proto"\n'
+        'exclude = ["README.md"]\n'
+        'sync = true\n'
+        '\n'
+        '[[jobs]]\n'
+        f'url = "{REPO_URL}"\n'
+        'file = "VERSION"\n'
+    )
+
+    assert githubdl.load_manifest(manifest) == [
+        githubdl.Job(url=REPO_URL, dir='proto', exclude=('README.md',), sync=True),
+        githubdl.Job(url=REPO_URL, file='VERSION'),
+    ]
+
+
+@pytest.mark.parametrize(
+    'spec',
+    [
+        {'url': REPO_URL},
+        {'url': REPO_URL, 'dir': 'a', 'file': 'b'},
+        {'dir': 'a'},
+        {'url': REPO_URL, 'dir': 'a', 'unknown': 1},
+    ],
+)
+def test_invalid_job(spec) -> None:
+    with pytest.raises(ValueError, match='job'):
+        githubdl.Job.from_dict(spec)
+
+
+def test_run_jobs_shares_the_client(populated_repo, tmp_path) -> None:
+    client = githubdl.Client(token='abc')  # noqa: S106
+    populated_repo.failing.add('docs/index.md')
+
+    results = githubdl.run_jobs(
+        [
+            {'url': REPO_URL, 'dir': 'proto', 'target': str(tmp_path / 'protos'), 'include': ['*.proto']},
+            {'url': REPO_URL, 'dir': 'docs', 'target': str(tmp_path / 'docs')},
+            {'url': REPO_URL, 'file': 'VERSION', 'target': str(tmp_path / 'VERSION')},
+        ],
+        client=client,
+        max_workers=3,
+    )
+
+    assert [x.ok for x in results] == [True, False, True]
+    assert isinstance(results[1].error, githubdl.DownloadError)
+    assert sorted(x.name for x in Path(tmp_path / 'protos/proto').iterdir()) == ['a.proto', 'b.proto']
+    assert (tmp_path / 'VERSION').read_bytes() == b'1.0'
+
+    # The default branch is resolved once for all the jobs
+    assert sum('/commits/' in x for x in populated_repo.requests) == 1
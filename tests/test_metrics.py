@@ -0,0 +1,73 @@
+"""
+Metrics tests
+"""
+
+import json
+from pathlib import Path
+
+import requests
+
+import githubdl
+
+from .conftest import make_response
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+REPO_URL = 'https://github.com/owner/repo'
+
+
+def test_requests_are_measured(monkeypatch) -> None:
+    events = []
+    metrics = githubdl.Metrics(hooks=[events.append])
+    statuses = iter([503, 200, 404])
+
+    client = githubdl.Client(token='abc', metrics=metrics, scheduler=githubdl.Scheduler(sleep=lambda _: None))
+
+    def get(**_kwargs) -> requests.Response:
+        return make_response(next(statuses), b'{"message": "x"}', {'X-RateLimit-Remaining': '42'})
+
+    monkeypatch.setattr(client.session, 'get', get)
+
+    with client:
+        client.get('https://api.github.com/repos/owner/repo/contents/a.txt')
+        client.get('https://api.github.com/repos/owner/repo/contents/b.txt')
+
+    assert [(x.status, x.retries, x.size, x.rate_limit_remaining) for x in events] == [
+        (200, 1, 16, 42),
+        (404, 0, 16, 42),
+    ]
+
+    summary = metrics.summary()
+    assert summary['requests']['count'] == 2
+    assert summary['requests']['retries'] == 1
+    assert summary['requests']['by_status'] == {'200': 1, '404': 1}
+    assert summary['requests']['latency']['p50'] is not None
+    assert summary['rate_limit']['min_remaining'] == 42
+
+
+def test_files_are_measured(fake_repo, tmp_path) -> None:
+    fake_repo.files = {f'src/{i}.txt': b'x' * i for i in range(1, 6)}
+    metrics = githubdl.Metrics()
+
+    with githubdl.Client(token='abc', metrics=metrics) as client:
+        githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path), max_workers=2, client=client)
+
+    assert sorted((Path(x.path).name, x.size, x.source) for x in metrics.files) == [
+        (f'{i}.txt', i, 'rest') for i in range(1, 6)
+    ]
+
+    metrics.write_report(tmp_path / 'stats.json')
+    report = json.loads((tmp_path / 'stats.json').read_text(encoding='utf-8'))
+
+    assert report['files'] == {'count': 5, 'bytes': 15, 'by_source': {'rest': 5}}
+
+
+def test_failing_hook_is_ignored() -> None:
+    def hook(_event) -> None:
+        raise RuntimeError
+
+    metrics = githubdl.Metrics(hooks=[hook])
+    metrics.record(githubdl.FileEvent('a.txt', 1, 0.1, 'rest'))
+
+    assert len(metrics.files) == 1
@@ -0,0 +1,67 @@
+"""
+Tags and branches pagination tests
+"""
+
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+import githubdl
+from githubdl import file_processing as fp
+
+from .conftest import make_response
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+REPO_URL = 'https://github.com/owner/repo'
+TAGS = [{'name': f'v{i}', 'commit': {'sha': f'{i:040}'}} for i in range(250)]
+
+
+@pytest.fixture
+def client(monkeypatch) -> tuple[githubdl.Client, list[int]]:
+    """
+    Return a client serving 250 tags, 100 per page, and the list of the requested pages
+    """
+    client = githubdl.Client(token='abc')
+    requested = []
+
+    def get(url, **_kwargs) -> requests.Response:
+        query = parse_qs(urlparse(url).query)
+        page = int(query.get('page', ['1'])[0])
+        per_page = int(query['per_page'][0])
+        requested.append(page)
+
+        last = f'<https://api.github.com/repositories/1/tags?per_page={per_page}&page=3>; rel="last"'
+        body = json.dumps(TAGS[(page - 1) * per_page : page * per_page]).encode()
+        return make_response(200, body, {'Link': last} if page < 3 else {})
+
+    monkeypatch.setattr(client.session, 'get', get)
+
+    return client, requested
+
+
+def test_all_pages_fetched(client) -> None:
+    client, requested = client
+
+    assert githubdl.dl_tags(REPO_URL, client) == TAGS
+    assert sorted(requested) == [1, 2, 3]
+
+
+def test_name_filter_stops_early(client) -> None:
+    client, requested = client
+
+    assert githubdl.dl_tags(REPO_URL, client, names=['v3', 'v42'], max_workers=1) == [TAGS[3], TAGS[42]]
+    assert requested == [1]
+
+
+def test_json_items_format(tmp_path) -> None:
+    fp.write_json_items(tmp_path / 'tags.json', iter(TAGS[:3]))
+    fp.write_json_items(tmp_path / 'empty.json', iter([]))
+    fp.write_json_items(tmp_path / 'tags.ndjson', iter(TAGS[:3]), ndjson=True)
+
+    assert (tmp_path / 'tags.json').read_text() == json.dumps(TAGS[:3], indent=2)
+    assert (tmp_path / 'empty.json').read_text() == json.dumps([], indent=2)
+    assert [json.loads(x) for x in (tmp_path / 'tags.ndjson').read_text().splitlines()] == TAGS[:3]
@@ -0,0 +1,185 @@
+"""
+Concurrent directory download tests
+
+These tests run against an in-memory repository and do not need network access
+"""
+
+import stat
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+import githubdl
+from githubdl import api
+from githubdl import file_processing as fp
+from githubdl import request_processing as rp
+
+from .conftest import FakeRepo
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+REPO_URL = 'https://github.com/owner/repo'
+
+
+@pytest.fixture
+def populated_repo(fake_repo) -> FakeRepo:
+    """
+    Fill the in-memory repository with a few nested directories
+    """
+    for i in range(20):
+        fake_repo.files[f'src/pkg_{i % 3}/module_{i}.py'] = f'print({i})\n'.encode()
+    fake_repo.files['src/README.md'] = b'readme'
+    fake_repo.files['src/deep/a/b/c/leaf.txt'] = b'leaf'
+    fake_repo.files['other/ignored.txt'] = b'ignored'
+
+    return fake_repo
+
+
+def tree_content(root: Path) -> dict[str, bytes]:
+    """
+    Return the content of every file under root, keyed by relative path
+    """
+    return {str(x.relative_to(root)): x.read_bytes() for x in root.rglob('*') if x.is_file()}
+
+
+def test_parallel_matches_sequential(populated_repo, tmp_path) -> None:
+    githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path / 'seq'))
+    githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path / 'par'), max_workers=8)
+
+    sequential = tree_content(tmp_path / 'seq')
+    assert sequential == tree_content(tmp_path / 'par')
+    assert sequential == {k: v for k, v in populated_repo.files.items() if k.startswith('src/')}
+
+
+def test_errors_are_collected_per_file(populated_repo, tmp_path) -> None:
+    populated_repo.failing.update({'src/pkg_1/module_4.py', 'src/pkg_1/module_7.py'})
+
+    with pytest.raises(githubdl.DownloadError) as ex:
+        githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path), max_workers=4)
+
+    assert set(ex.value.errors) == {'src/pkg_1/module_4.py', 'src/pkg_1/module_7.py'}
+    assert (tmp_path / 'src/pkg_1/module_1.py').is_file()
+    assert not (tmp_path / 'src/pkg_1/module_4.py').exists()
+
+
+def test_interrupt_stops_queued_downloads(monkeypatch, fake_repo, tmp_path) -> None:
+    fake_repo.files = {f'src/{i:03}.txt': b'x' for i in range(100)}
+    stream_request = fake_repo.stream_request
+
+    @contextmanager
+    def interrupted(http_url, client=None, cached=True) -> Iterator:
+        if '000.txt' in http_url:
+            raise KeyboardInterrupt
+        time.sleep(0.01)
+        with stream_request(http_url, client, cached) as stream:
+            yield stream
+
+    monkeypatch.setattr(rp, 'stream_request', interrupted)
+
+    with pytest.raises(KeyboardInterrupt):
+        githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path), max_workers=2)
+
+    # The queued downloads are dropped instead of being run to completion
+    assert len(list((tmp_path / 'src').iterdir())) < 20
+
+
+def test_archive_matches_api(populated_repo, tmp_path) -> None:
+    githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path / 'api'), max_workers=4)
+    populated_repo.requests.clear()
+    githubdl.dl_dir(REPO_URL, 'src/', target_path=str(tmp_path / 'archive'), via_archive=True)
+
+    assert len(populated_repo.requests) == 1
+    assert tree_content(tmp_path / 'api') == tree_content(tmp_path / 'archive')
+
+
+def test_archive_rejects_conflicting_options(populated_repo, tmp_path) -> None:
+    with pytest.raises(ValueError, match='via_archive cannot be combined with: sync, resume'):
+        githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path), via_archive=True, sync=True, resume=True)
+
+    with pytest.raises(ValueError, match='via_archive cannot be combined with: blob_store'):
+        githubdl.dl_dir(REPO_URL, 'src', via_archive=True, blob_store=githubdl.BlobStore(tmp_path / 'store'))
+
+    assert not populated_repo.requests
+
+
+def test_sync_downloads_changed_files_only(populated_repo, tmp_path) -> None:
+    githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path))
+
+    populated_repo.files['src/README.md'] = b'updated readme'
+    populated_repo.files['src/new.txt'] = b'new'
+    del populated_repo.files['src/deep/a/b/c/leaf.txt']
+    (tmp_path / 'src/pkg_0/module_0.py').write_bytes(b'local change')
+    populated_repo.requests.clear()
+
+    githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path), max_workers=4, sync=True, delete=True)
+
+    assert sorted(x.rsplit('/contents/', 1)[1].split('?')[0] for x in populated_repo.requests if '/contents/' in x) == [
+        'src/README.md',
+        'src/new.txt',
+        'src/pkg_0/module_0.py',
+    ]
+    assert tree_content(tmp_path) == {k: v for k, v in populated_repo.files.items() if k.startswith('src/')}
+    assert not (tmp_path / 'src/deep').exists()
+
+
+def test_files_get_default_permissions(monkeypatch, fake_repo, tmp_path) -> None:
+    monkeypatch.setattr(api, 'BUFFERED_MAX_SIZE', 100)
+    monkeypatch.setattr(api, 'RANGE_THRESHOLD', 1000)
+    fake_repo.files = {
+        'src/small.txt': b's' * 50,
+        'src/streamed.bin': b'm' * 500,
+        'src/ranges.bin': bytes(range(256)) * 8,
+    }
+    expected = 0o666 & ~fp._UMASK
+
+    githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path / 'out'), max_workers=4)
+    githubdl.dl_dir(REPO_URL, 'src', output_archive=tmp_path / 'out.zip')
+
+    files = [tmp_path / 'out' / x for x in fake_repo.files] + [tmp_path / 'out.zip']
+    assert {x.name: stat.S_IMODE(x.stat().st_mode) for x in files} == {x.name: expected for x in files}
+
+
+def test_requests_pinned_to_resolved_commit(populated_repo, tmp_path) -> None:
+    client = githubdl.Client(token='abc')
+
+    githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path / '1'), client=client, max_workers=4)
+    githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path / '2'), client=client, max_workers=4)
+
+    contents = [x for x in populated_repo.requests if '/contents/' in x]
+    assert len([x for x in populated_repo.requests if '/commits/' in x]) == 1
+    assert all(x.endswith(f'?ref={populated_repo.commit_sha}') for x in contents)
+    assert f'/git/trees/{populated_repo.commit_sha}:src' in populated_repo.requests[1]
+
+
+def test_resolved_references_expire(populated_repo, tmp_path) -> None:
+    client = githubdl.Client(token='abc', reference_ttl=0)
+    first_sha = populated_repo.commit_sha
+
+    githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path / '1'), client=client)
+    # The branch moves between the runs of a long-lived client
+    populated_repo.commit_sha = 'beef' * 10
+    githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path / '2'), client=client)
+
+    assert len([x for x in populated_repo.requests if '/commits/' in x]) == 2
+    assert any(x.endswith(f'?ref={first_sha}') for x in populated_repo.requests)
+    assert populated_repo.requests[-1].endswith(f'?ref={populated_repo.commit_sha}')
+
+
+def test_graphql_batches_small_files(fake_repo, tmp_path) -> None:
+    for i in range(250):
+        fake_repo.files[f'conf/snippet_{i}.cfg'] = f'key = {i}\n'.encode()
+    fake_repo.files['conf/image.bin'] = b'\0\1\2'
+    fake_repo.files['conf/large.txt'] = b'x' * (rp.GRAPHQL_MAX_BLOB_SIZE + 1)
+
+    githubdl.dl_dir(REPO_URL, 'conf', target_path=str(tmp_path), max_workers=4, graphql=True)
+
+    assert tree_content(tmp_path) == fake_repo.files
+    assert sum(x.endswith('/graphql') for x in fake_repo.requests) == 3
+    assert sorted(x.rsplit('/contents/', 1)[1].split('?')[0] for x in fake_repo.requests if '/contents/' in x) == [
+        'conf/image.bin',
+        'conf/large.txt',
+    ]
@@ -0,0 +1,121 @@
+"""
+Include/exclude filtering tests
+
+These tests run against an in-memory repository and do not need network access
+"""
+
+import pytest
+
+import githubdl
+from githubdl.path_filter import PathFilter
+
+from .conftest import FakeRepo
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+REPO_URL = 'https://github.com/owner/repo'
+
+
+@pytest.mark.parametrize(
+    ('include', 'exclude', 'path', 'kept'),
+    [
+        (['*.proto'], [], 'api.proto', True),
+        (['*.proto'], [], 'a/b/api.proto', True),
+        (['*.proto'], [], 'a/b/api.py', False),
+        (['/*.proto'], [], 'a/api.proto', False),
+        (['a/*.proto'], [], 'a/api.proto', True),
+        (['a/*.proto'], [], 'a/b/api.proto', False),
+        (['a/**/*.proto'], [], 'a/b/c/api.proto', True),
+        (['a/**/*.proto'], [], 'a/api.proto', True),
+        (['**/api.?roto'], [], 'x/api.proto', True),
+        (['src/'], [], 'src/deep/file.txt', True),
+        (['src/'], [], 'src', False),
+        (['*.[ch]'], [], 'lib/x.h', True),
+        (['*.[!ch]'], [], 'lib/x.h', False),
+        (['*.[^ch]'], [], 'lib/x.h', False),
+        (['*.[!ch]'], [], 'lib/x.o', True),
+        # Only a `!` right after the `[` negates the class
+        (['[a!].txt'], [], '!.txt', True),
+        (['[a!].txt'], [], '^.txt', False),
+        (['[]a].txt'], [], '].txt', True),
+        (['x[!a].txt'], [], 'x/.txt', False),
+        # Escaped characters are literal
+        (['\\*.txt'], [], '*.txt', True),
+        (['\\*.txt'], [], 'a.txt', False),
+        (['[\\]a].txt'], [], '].txt', True),
+        ([], ['\\!important'], '!important', False),
+        ([], ['\\!important'], 'important', True),
+        ([], ['vendor/'], 'vendor/x/api.proto', False),
+        ([], ['vendor/'], 'src/vendor.txt', True),
+        ([], ['*.md', '!README.md'], 'docs/guide.md', False),
+        ([], ['*.md', '!README.md'], 'README.md', True),
+        # A file cannot be re-included once its directory is excluded
+        ([], ['build/', '!build/keep.txt'], 'build/keep.txt', False),
+        (['**/*.proto'], ['third_party/**'], 'third_party/x.proto', False),
+    ],
+)
+def test_patterns(include, exclude, path, kept) -> None:
+    assert PathFilter.from_patterns(include, exclude).match(path) is kept
+
+
+def test_prune_and_under() -> None:
+    path_filter = PathFilter.from_patterns(['*.proto'], ['vendor/', 'libs/a/tests/'])
+
+    assert path_filter.prune('vendor')
+    assert path_filter.prune('src/vendor/deep')
+    assert not path_filter.prune('src')
+
+    sub_filter = path_filter.under('libs/a')
+    assert sub_filter.prune('tests')
+    assert sub_filter.match('api.proto')
+    assert not sub_filter.match('tests/api.proto')
+
+
+@pytest.fixture
+def monorepo(fake_repo) -> FakeRepo:
+    """
+    Fill the in-memory repository with a few protos among many other files
+    """
+    for service in ('users', 'orders'):
+        fake_repo.files[f'services/{service}/api.proto'] = service.encode()
+        for i in range(5):
+            fake_repo.files[f'services/{service}/src/file_{i}.go'] = b'package main'
+    fake_repo.files['vendor/lib/lib.proto'] = b'vendored'
+    fake_repo.files['vendor/lib/deep/other.proto'] = b'vendored'
+
+    return fake_repo
+
+
+def test_only_matching_files_are_downloaded(monorepo, tmp_path) -> None:
+    monorepo.truncate_recursive = True
+
+    githubdl.dl_dir(REPO_URL, '/', target_path=str(tmp_path), include=['**/*.proto'], exclude=['vendor/'])
+
+    assert sorted(x.relative_to(tmp_path).as_posix() for x in tmp_path.rglob('*') if x.is_file()) == [
+        'services/orders/api.proto',
+        'services/users/api.proto',
+    ]
+    assert sum('/contents/' in x for x in monorepo.requests) == 2
+    # The excluded sub tree is never listed
+    assert not any('tree-vendor' in x for x in monorepo.requests)
+
+
+def test_archive_is_filtered(monorepo, tmp_path) -> None:
+    githubdl.dl_dir(REPO_URL, 'services', target_path=str(tmp_path), include=['*.proto'], via_archive=True)
+
+    assert sorted(x.relative_to(tmp_path).as_posix() for x in tmp_path.rglob('*') if x.is_file()) == [
+        'services/orders/api.proto',
+        'services/users/api.proto',
+    ]
+
+
+def test_delete_ignores_filtered_out_files(monorepo, tmp_path) -> None:
+    (tmp_path / 'services/users/src').mkdir(parents=True)
+    (tmp_path / 'services/users/src/local.go').write_bytes(b'local')
+    (tmp_path / 'services/users/old.proto').write_bytes(b'old')
+
+    githubdl.dl_dir(REPO_URL, 'services', target_path=str(tmp_path), include=['*.proto'], sync=True, delete=True)
+
+    assert (tmp_path / 'services/users/src/local.go').exists()
+    assert not (tmp_path / 'services/users/old.proto').exists()
@@ -0,0 +1,106 @@
+"""
+Large file download tests
+
+These tests run against an in-memory repository and do not need network access
+"""
+
+import io
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import pytest
+
+import githubdl
+from githubdl import api
+from githubdl import range_file as rf
+from githubdl import request_processing as rp
+
+from .conftest import FakeRepo
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+REPO_URL = 'https://github.com/owner/repo'
+
+CHUNK_SIZE = 1000
+
+
+@pytest.fixture
+def large_repo(fake_repo, monkeypatch) -> FakeRepo:
+    """
+    Fill the in-memory repository with a file spanning 10 byte ranges, and a small file
+    """
+    monkeypatch.setattr(api, 'RANGE_THRESHOLD', 5000)
+    monkeypatch.setattr(rf, 'RANGE_CHUNK_SIZE', CHUNK_SIZE)
+
+    fake_repo.files['assets/large.bin'] = os.urandom(CHUNK_SIZE * 9 + 123)
+    fake_repo.files['assets/small.txt'] = b'small'
+
+    return fake_repo
+
+
+def range_requests(repo: FakeRepo) -> list[str]:
+    """
+    Return the byte range requests made to the raw content endpoint
+    """
+    return [x for x in repo.requests if x.startswith('https://raw.githubusercontent.com/')]
+
+
+def test_large_file_is_downloaded_by_ranges(large_repo, tmp_path) -> None:
+    githubdl.dl_dir(REPO_URL, 'assets', target_path=str(tmp_path), max_workers=2)
+
+    assert (tmp_path / 'assets/large.bin').read_bytes() == large_repo.files['assets/large.bin']
+    assert (tmp_path / 'assets/small.txt').read_bytes() == b'small'
+
+    requests = range_requests(large_repo)
+    assert len(requests) == 10
+    assert all(x.endswith(f'/owner/repo/{large_repo.commit_sha}/assets/large.bin') for x in requests)
+    assert not any('/contents/assets/large.bin' in x for x in large_repo.requests)
+    assert sorted(x.name for x in (tmp_path / 'assets').iterdir()) == ['large.bin', 'small.txt']
+
+
+def test_interrupted_download_resumes(large_repo, tmp_path, monkeypatch) -> None:
+    serve = large_repo.stream_range_request
+
+    @contextmanager
+    def flaky_range_request(http_url, start, end, client=None) -> Iterator[io.BytesIO]:
+        if start == 4 * CHUNK_SIZE:
+            raise ConnectionError('connection reset')
+        with serve(http_url, start, end, client) as stream:
+            yield stream
+
+    monkeypatch.setattr(rp, 'stream_range_request', flaky_range_request)
+
+    with pytest.raises(githubdl.DownloadError):
+        githubdl.dl_dir(REPO_URL, 'assets', target_path=str(tmp_path))
+
+    assert not (tmp_path / 'assets/large.bin').exists()
+    assert (tmp_path / 'assets/.large.bin.part').is_file()
+
+    monkeypatch.setattr(rp, 'stream_range_request', serve)
+    large_repo.requests.clear()
+
+    githubdl.dl_dir(REPO_URL, 'assets', target_path=str(tmp_path))
+
+    assert (tmp_path / 'assets/large.bin').read_bytes() == large_repo.files['assets/large.bin']
+    assert len(range_requests(large_repo)) == 1
+    assert not (tmp_path / 'assets/.large.bin.part').exists()
+    assert not (tmp_path / 'assets/.large.bin.part.json').exists()
+
+
+def test_corrupted_download_starts_over(large_repo, tmp_path) -> None:
+    target = tmp_path / 'large.bin'
+    data = large_repo.files['assets/large.bin']
+    sha = FakeRepo.blob_sha(data)
+
+    with rf.RangeFile(target, sha, len(data)) as range_file:
+        for index in range_file.pending():
+            start, end = range_file.chunks[index]
+            range_file.write_chunk(index, io.BytesIO(bytes(end - start + 1)))
+
+        with pytest.raises(RuntimeError, match='SHA mismatch'):
+            range_file.commit()
+
+    assert rf.RangeFile(target, sha, len(data)).pending() == list(range(10))
+    assert not target.exists()
@@ -0,0 +1,88 @@
+"""
+Repository object tests
+
+These tests run against an in-memory repository and do not need network access
+"""
+
+from urllib.parse import urlparse
+
+import pytest
+
+import githubdl
+from githubdl import request_processing as rp
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+REPO_URL = 'https://github.com/owner/repo'
+
+
+def test_repository_downloads(fake_repo, tmp_path) -> None:
+    fake_repo.files = {'src/a.txt': b'a', 'src/sub/b.txt': b'b', 'README.md': b'readme'}
+
+    with githubdl.Client(token='abc') as client:
+        repo = githubdl.Repository(REPO_URL, client)
+
+        assert repo.name == 'owner/repo'
+        assert repo.resolve('main') == fake_repo.commit_sha
+
+        repo.download_dir('src', str(tmp_path / 'out'), 'main', max_workers=2)
+        repo.download_file('README.md', str(tmp_path / 'README.md'), 'main')
+
+    assert (tmp_path / 'out/src/a.txt').read_bytes() == b'a'
+    assert (tmp_path / 'out/src/sub/b.txt').read_bytes() == b'b'
+    assert (tmp_path / 'README.md').read_bytes() == b'readme'
+
+    # The reference is resolved once, and shared through the client
+    assert sum('/commits/' in x for x in fake_repo.requests) == 1
+
+
+def test_download_file_requests(fake_repo, tmp_path) -> None:
+    fake_repo.files = {'README.md': b'readme'}
+
+    githubdl.dl_file(REPO_URL, 'README.md', str(tmp_path / 'a.md'))
+    assert [urlparse(x).path for x in fake_repo.requests] == ['/repos/owner/repo/contents/README.md']
+
+    # The blob store needs the commit SHA, the default branch is resolved in a single request
+    fake_repo.requests.clear()
+    store = githubdl.BlobStore(tmp_path / 'store')
+    githubdl.dl_file(
+        REPO_URL, 'README.md', str(tmp_path / 'b.md'), client=githubdl.Client(token='abc'), blob_store=store
+    )
+    assert [urlparse(x).path for x in fake_repo.requests] == [
+        '/repos/owner/repo/commits/HEAD',
+        '/repos/owner/repo/contents/README.md',
+    ]
+
+
+def test_repository_tags_and_branches(monkeypatch) -> None:
+    pages = {'tags': [[{'name': 'v1'}, {'name': 'v2'}]], 'branches': [[{'name': 'main'}]]}
+
+    def iter_pages(repo_url, info_type, _client, _max_workers):
+        assert repo_url == REPO_URL
+        return iter(pages[info_type])
+
+    monkeypatch.setattr(rp, 'iter_git_repo_info_pages', iter_pages)
+
+    repo = githubdl.Repository(REPO_URL, githubdl.Client(token='abc'))
+
+    assert [x['name'] for x in repo.tags()] == ['v1', 'v2']
+    assert [x['name'] for x in repo.tags(names=['v2'])] == ['v2']
+    assert [x['name'] for x in repo.branches()] == ['main']
+    assert githubdl.dl_tags(REPO_URL, repo.client) == pages['tags'][0]
+
+
+def test_graphql_repository_not_found(monkeypatch) -> None:
+    monkeypatch.setattr(rp, 'process_graphql_request', lambda *_args: {'repository': None})
+
+    with pytest.raises(githubdl.RequestError, match='Repository not found: owner/repo') as ex:
+        rp.get_blob_texts(REPO_URL, ['a.txt'], 'main')
+
+    assert ex.value.status_code == 404
+
+
+def test_repository_server_url() -> None:
+    with githubdl.Client(token='abc', server_url='http://127.0.0.1:8000') as client:
+        repo = githubdl.Repository(REPO_URL, client)
+
+        assert repo.urls.api_base == 'http://127.0.0.1:8000/api/v3/repos/owner/repo'
@@ -0,0 +1,122 @@
+"""
+Request scheduler tests
+"""
+
+import pytest
+import requests
+
+from githubdl.scheduler import Scheduler
+
+from .conftest import make_response
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+
+class FakeClock:
+    """
+    Clock only advanced by the sleeps
+    """
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.sleeps: list[float] = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, delay: float) -> None:
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    """
+    Return a fake clock
+    """
+    return FakeClock()
+
+
+@pytest.fixture
+def scheduler(clock) -> Scheduler:
+    """
+    Return a scheduler using the fake clock
+    """
+    return Scheduler(max_concurrency=8, max_retries=3, sleep=clock.sleep, clock=clock.time)
+
+
+def replay(*responses):
+    """
+    Return a send function answering the given responses (or raising the given exceptions) in order
+    """
+    responses = list(responses)
+
+    def send() -> requests.Response:
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    return send
+
+
+def test_transient_errors_are_retried(scheduler, clock) -> None:
+    response = scheduler.run(
+        replay(
+            requests.exceptions.ConnectionError('reset'),
+            make_response(502),
+            make_response(200, b'ok'),
+        )
+    )
+
+    assert response.status_code == 200
+    assert len(clock.sleeps) == 2
+    assert clock.sleeps[1] > clock.sleeps[0] * 0.5
+
+
+def test_retries_are_bounded(scheduler) -> None:
+    response = scheduler.run(replay(*(make_response(503) for _ in range(4))))
+
+    assert response.status_code == 503
+
+
+def test_client_errors_are_not_retried(scheduler, clock) -> None:
+    assert scheduler.run(replay(make_response(404))).status_code == 404
+    assert not clock.sleeps
+
+
+def test_waits_for_rate_limit_reset(scheduler, clock) -> None:
+    exhausted = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '1600'}
+
+    response = scheduler.run(replay(make_response(403, b'{}', exhausted), make_response(200)))
+
+    assert response.status_code == 200
+    assert clock.now >= 1601
+
+
+def test_retry_after(scheduler, clock) -> None:
+    response = scheduler.run(replay(make_response(429, b'', {'Retry-After': '30'}), make_response(200)))
+
+    assert response.status_code == 200
+    assert clock.sleeps == [30]
+
+
+def test_rate_limit_waits_are_bounded(clock) -> None:
+    scheduler = Scheduler(max_rate_limit_waits=2, sleep=clock.sleep, clock=clock.time)
+
+    response = scheduler.run(replay(*(make_response(429, b'', {'Retry-After': '30'}) for _ in range(3))))
+
+    assert response.status_code == 429
+    assert clock.sleeps == [30, 30]
+
+
+def test_concurrency_follows_quota(scheduler) -> None:
+    scheduler.run(replay(make_response(200, headers={'X-RateLimit-Remaining': '5000'})))
+    assert scheduler.allowed_concurrency() == 8
+
+    scheduler.run(replay(make_response(200, headers={'X-RateLimit-Remaining': '50'})))
+    assert scheduler.allowed_concurrency() == 4
+
+    scheduler.run(replay(make_response(200, headers={'X-RateLimit-Remaining': '1'})))
+    assert scheduler.allowed_concurrency() == 1
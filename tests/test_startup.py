@@ -0,0 +1,60 @@
+"""
+Startup tests
+
+The package and the command line must not load the HTTP stack until it is needed
+"""
+
+import json
+import subprocess
+import sys
+
+import githubdl
+
+# ruff: noqa: S101
+
+HEAVY_MODULES = ('requests', 'urllib3', 'charset_normalizer', 'colorlog', 'dotenv', 'dataclasses', 'githubdl.api')
+
+LOADED_MODULES = f'import json, sys; print(json.dumps([x for x in {HEAVY_MODULES!r} if x in sys.modules]))'
+
+
+def loaded_modules(code: str) -> list[str]:
+    """
+    Run code in a fresh interpreter and return the heavy modules it loaded
+    """
+    process = subprocess.run(  # noqa: S603
+        [sys.executable, '-c', f'{code}\n{LOADED_MODULES}'],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def test_package_import_is_light() -> None:
+    assert loaded_modules('import githubdl') == []
+
+
+def test_url_processing_import_is_light() -> None:
+    assert loaded_modules('from githubdl import url_processing') == []
+
+
+def test_cli_help_is_light() -> None:
+    code = (
+        'import runpy, sys\n'
+        "sys.argv = ['githubdl', '--help']\n"
+        'try:\n'
+        "    runpy.run_module('githubdl.cli', run_name='__main__')\n"
+        'except SystemExit:\n'
+        '    pass'
+    )
+    assert loaded_modules(code) == []
+
+
+def test_public_names_are_loaded_on_access() -> None:
+    from githubdl import api  # noqa: PLC0415
+
+    assert githubdl.dl_dir is api.dl_dir
+    assert set(githubdl.__all__) <= set(dir(githubdl))
+
+    for name in githubdl.__all__:
+        assert getattr(githubdl, name) is not None
@@ -0,0 +1,121 @@
+"""
+Submodule download tests
+
+These tests run against in-memory repositories and do not need network access
+"""
+
+import io
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import pytest
+
+import githubdl
+from githubdl import request_processing as rp
+from githubdl.api import parse_gitmodules
+
+from .conftest import FakeRepo
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+REPO_URL = 'https://github.com/owner/repo'
+
+LIB_SHA = '1' * 40
+LEAF_SHA = '2' * 40
+
+
+@pytest.fixture
+def repos(monkeypatch) -> dict[str, FakeRepo]:
+    """
+    Serve a superproject, a library used twice as a submodule, and a nested submodule of that library
+    """
+    repos = {name: FakeRepo(name) for name in ('owner/repo', 'owner/lib', 'owner/leaf')}
+
+    repos['owner/repo'].files['README.md'] = b'superproject'
+    repos['owner/repo'].files['.gitmodules'] = (
+        b'[submodule "a"]\n'
+        b'\tpath = libs/a\n'
+        b'\turl = https://github.com/owner/lib\n'
+        b'[submodule "b"]\n'
+        b'\turl = ../lib.git\n'
+        b'\tpath = libs/b\n'
+    )
+    repos['owner/repo'].gitlinks.update({'libs/a': LIB_SHA, 'libs/b': LIB_SHA})
+
+    repos['owner/lib'].files['lib.py'] = b'lib'
+    repos['owner/lib'].files['.gitmodules'] = (
+        b'[submodule "leaf"]\n\tpath = leaf\n\turl = git@github.com:owner/leaf.git\n'
+    )
+    repos['owner/lib'].gitlinks['leaf'] = LEAF_SHA
+
+    repos['owner/leaf'].files['leaf.txt'] = b'leaf'
+
+    def repo(http_url: str) -> FakeRepo:
+        return next(x for name, x in repos.items() if f'/repos/{name}/' in f'{http_url}/')
+
+    def process_request(http_url, client=None, headers=None) -> bytes:
+        return repo(http_url).process_request(http_url, client, headers)
+
+    @contextmanager
+    def stream_request(http_url, client=None) -> Iterator[io.BytesIO]:
+        with repo(http_url).stream_request(http_url, client) as stream:
+            yield stream
+
+    monkeypatch.setattr(rp, 'process_request', process_request)
+    monkeypatch.setattr(rp, 'stream_request', stream_request)
+
+    return repos
+
+
+def test_parse_gitmodules() -> None:
+    content = (
+        '[submodule "one"]\n'
+        '  path = one\n'
+        '  url = https://github.com/owner/one\n'
+        '[submodule "no-url"]\n'
+        '  path = skipped\n'
+        '[submodule "two"]\n'
+        '  url = ../two.git  \n'
+        '  path = sub/two\n'
+    )
+
+    assert parse_gitmodules(content) == {'one': 'https://github.com/owner/one', 'sub/two': '../two.git'}
+
+
+def test_submodules_positional(repos, tmp_path) -> None:
+    # Like the signature of the first releases
+    githubdl.dl_dir(REPO_URL, '/', str(tmp_path), None, True)
+
+    assert (tmp_path / 'libs/a/leaf/leaf.txt').read_bytes() == b'leaf'
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_submodules_are_pinned_and_fetched_once(repos, tmp_path, max_workers) -> None:
+    githubdl.dl_dir(REPO_URL, '/', target_path=str(tmp_path), submodules=True, max_workers=max_workers)
+
+    for lib in ('libs/a', 'libs/b'):
+        assert (tmp_path / lib / 'lib.py').read_bytes() == b'lib'
+        assert (tmp_path / lib / 'leaf' / 'leaf.txt').read_bytes() == b'leaf'
+
+    lib_requests = repos['owner/lib'].requests
+    leaf_requests = repos['owner/leaf'].requests
+
+    # Fetched at the gitlink commits, without resolving any reference
+    assert all(LIB_SHA in x for x in lib_requests)
+    assert all(LEAF_SHA in x for x in leaf_requests)
+
+    # Each repo@sha is listed and downloaded only once, the second checkout is a copy
+    assert sum('/git/trees/' in x for x in lib_requests) == 1
+    assert sum('/git/trees/' in x for x in leaf_requests) == 1
+    assert sum('/contents/lib.py' in x for x in lib_requests) == 1
+
+
+def test_submodule_errors_are_collected(repos, tmp_path) -> None:
+    repos['owner/leaf'].failing.add('leaf.txt')
+
+    with pytest.raises(githubdl.DownloadError) as ex:
+        githubdl.dl_dir(REPO_URL, '/', target_path=str(tmp_path), submodules=True, max_workers=4)
+
+    assert set(ex.value.errors) == {'libs/a', 'libs/b'}
+    assert (tmp_path / 'README.md').read_bytes() == b'superproject'
@@ -0,0 +1,109 @@
+"""
+Cassette transport tests
+"""
+
+import gzip
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+import githubdl
+from githubdl import request_processing as rp
+from githubdl.transport import Cassette, CassetteError
+
+from .conftest import make_response
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+REPO_URL = 'https://github.com/owner/repo'
+TAGS = [{'name': f'v{i}', 'commit': {'sha': f'{i:040}'}} for i in range(250)]
+CONTENT = b'print("hello")\n' * 100
+
+
+def fake_send(_adapter, request, **_kwargs) -> requests.Response:
+    """
+    Answer the requests like Github: paginated tags, a gzipped file and a missing file
+    """
+    url = urlparse(request.url)
+
+    if url.path.endswith('/tags'):
+        page = int(parse_qs(url.query).get('page', ['1'])[0])
+        last = '<https://api.github.com/repositories/1/tags?per_page=100&page=3>; rel="last"'
+        body = json.dumps(TAGS[(page - 1) * 100 : page * 100]).encode()
+        return make_response(200, body, {'Link': last, 'X-RateLimit-Remaining': '4999'} if page < 3 else {})
+
+    if url.path.endswith('/contents/main.py'):
+        return make_response(200, gzip.compress(CONTENT), {'Content-Encoding': 'gzip', 'ETag': '"abc"'})
+
+    return make_response(404, b'{"message": "Not Found"}', {'Content-Type': 'application/json'})
+
+
+def exercise(client: githubdl.Client) -> tuple[list[dict], bytes]:
+    """
+    Make the requests served by fake_send, and return the tags and the file content
+    """
+    tags = list(githubdl.iter_tags(REPO_URL, client))
+    content = rp.process_request(f'{REPO_URL.replace("github.com", "api.github.com/repos")}/contents/main.py', client)
+
+    with pytest.raises(rp.RequestError) as error:
+        rp.process_request('https://api.github.com/repos/owner/repo/contents/missing.py', client)
+
+    assert error.value.status_code == 404
+
+    return tags, content
+
+
+def test_record_then_replay(monkeypatch, tmp_path) -> None:
+    file_name = tmp_path / 'cassette.json'
+
+    monkeypatch.setattr(HTTPAdapter, 'send', fake_send)
+
+    with githubdl.Client(token='secret-token', transport=Cassette(file_name)) as client:
+        assert not client.transport.replaying
+        assert exercise(client) == (TAGS, CONTENT)
+
+    assert 'secret-token' not in file_name.read_text(encoding='utf-8')
+
+    def no_network(*_args, **_kwargs) -> None:
+        raise AssertionError
+
+    monkeypatch.setattr(HTTPAdapter, 'send', no_network)
+
+    with githubdl.Client(token='replay', transport=Cassette(file_name)) as client:
+        assert client.transport.replaying
+        assert exercise(client) == (TAGS, CONTENT)
+
+        with client.get('https://api.github.com/repos/owner/repo/tags?per_page=100') as response:
+            assert response.headers['X-RateLimit-Remaining'] == '4999'
+            assert response.links['last']['url'].endswith('page=3')
+
+        with pytest.raises(CassetteError):
+            rp.process_request('https://api.github.com/repos/owner/repo/contents/other.py', client)
+
+
+def test_replay_missing_cassette(tmp_path) -> None:
+    with pytest.raises(FileNotFoundError):
+        Cassette(tmp_path / 'missing.json', 'replay')
+
+    with pytest.raises(ValueError, match='Unknown cassette mode'):
+        Cassette(tmp_path / 'missing.json', 'rewind')
+
+
+def test_failed_recording_is_not_written(monkeypatch, tmp_path) -> None:
+    file_name = tmp_path / 'cassette.json'
+
+    def unreachable(*_args, **_kwargs) -> None:
+        raise requests.exceptions.ConnectionError
+
+    monkeypatch.setattr(HTTPAdapter, 'send', unreachable)
+
+    client = githubdl.Client(token='abc', transport=Cassette(file_name), scheduler=githubdl.Scheduler(max_retries=0))
+
+    with client, pytest.raises(requests.exceptions.ConnectionError):
+        rp.process_request('https://api.github.com/repos/owner/repo/contents/main.py', client)
+
+    assert not file_name.exists()
@@ -0,0 +1,79 @@
+"""
+Git Trees API listing tests
+
+These tests run against an in-memory repository and do not need network access
+"""
+
+import pytest
+
+from githubdl import request_processing as rp
+
+from .conftest import FakeRepo
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+REPO_URL = 'https://github.com/owner/repo'
+
+
+@pytest.fixture
+def nested_repo(fake_repo) -> FakeRepo:
+    """
+    Fill the in-memory repository with a few nested directories
+    """
+    fake_repo.files.update({
+        'README.md': b'readme',
+        'src/a/one.txt': b'1',
+        'src/a/b/two.txt': b'22',
+        'src/c/three.txt': b'333',
+    })
+
+    return fake_repo
+
+
+def test_listing_uses_a_single_request(nested_repo) -> None:
+    entries = rp.get_tree_listing(REPO_URL, 'src', 'main')
+
+    assert len(nested_repo.requests) == 1
+    assert nested_repo.requests[0].endswith('/git/trees/main:src?recursive=1')
+    assert {x.path for x in entries if x.type == 'blob'} == {'a/one.txt', 'a/b/two.txt', 'c/three.txt'}
+    assert {x.path for x in entries if x.type == 'tree'} == {'a', 'a/b', 'c'}
+
+
+def test_listing_entries_metadata(nested_repo) -> None:
+    entry = next(x for x in rp.get_tree_listing(REPO_URL, '/', 'main') if x.path == 'src/a/b/two.txt')
+
+    assert entry.mode == '100644'
+    assert entry.size == 2
+    assert entry.sha == FakeRepo.blob_sha(b'22')
+
+
+def test_listing_default_branch(nested_repo) -> None:
+    rp.get_tree_listing(REPO_URL, 'src', None)
+
+    assert nested_repo.requests[-1].endswith('/git/trees/main:src?recursive=1')
+
+
+def test_listing_truncated_falls_back_to_walking(nested_repo) -> None:
+    nested_repo.truncate_recursive = True
+
+    entries = rp.get_tree_listing(REPO_URL, 'src', 'main')
+
+    assert {x.path for x in entries} == {'a', 'a/one.txt', 'a/b', 'a/b/two.txt', 'c', 'c/three.txt'}
+
+
+def test_contents_listing(nested_repo) -> None:
+    assert rp.get_list_of_files_in_path(REPO_URL, 'src', 'main') == {'a': 'dir', 'c': 'dir'}
+    assert all('/git/trees/' not in x for x in nested_repo.requests)
+
+
+def test_large_contents_listing_switches_to_trees(nested_repo) -> None:
+    nested_repo.files.update({f'gen/file_{i}.py': b'' for i in range(rp.CONTENTS_MAX_ENTRIES + 200)})
+    nested_repo.files['gen/sub/x.py'] = b''
+
+    files = rp.get_list_of_files_in_path(REPO_URL, 'gen', 'main')
+
+    assert len(files) == rp.CONTENTS_MAX_ENTRIES + 201
+    assert files['file_0.py'] == 'file'
+    assert files['sub'] == 'dir'
+    assert nested_repo.requests[-1].endswith('/git/trees/main:gen')
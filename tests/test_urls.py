@@ -4,6 +4,8 @@ URLs related tests
 
 # ruff: noqa: S101
 
+import pytest
+
 from githubdl import url_processing as up
 
 
@@ -65,3 +67,68 @@ def test_git_url_https() -> None:
     assert data[0] == 'http'
     assert data[1] == 'github.com'
     assert data[2] == 'pypa/sampleproject'
+
+
+def test_immutable_url() -> None:
+    sha = 'a1693ab2a867b8b383a0354d3d6c74e4b76950b0'
+    assert up.is_commit_sha(sha)
+    assert not up.is_commit_sha('main')
+    assert up.is_immutable_url(f'https://api.github.com/repos/o/r/contents/a.txt?ref={sha}')
+    assert up.is_immutable_url(f'https://api.github.com/repos/o/r/git/trees/{sha}:src?recursive=1')
+    assert not up.is_immutable_url('https://api.github.com/repos/o/r/contents/a.txt?ref=main')
+    assert not up.is_immutable_url(f'https://api.github.com/repos/o/r/contents/a.txt?ref={sha}0')
+
+
+def test_resolve_submodule_url() -> None:
+    assert (
+        up.resolve_submodule_url('https://github.com/owner/repo', 'https://github.com/other/lib')
+        == 'https://github.com/other/lib'
+    )
+    assert up.resolve_submodule_url('https://github.com/owner/repo', '../lib.git') == 'https://github.com/owner/lib.git'
+    assert (
+        up.resolve_submodule_url('https://github.com/owner/repo.git', './lib')
+        == 'https://github.com/owner/repo.git/lib'
+    )
+    assert up.resolve_submodule_url('git@github.com:owner/repo.git', '../lib.git') == 'git@github.com:owner/lib.git'
+
+
+def test_server_url_override() -> None:
+    urls = up.get_repo_urls('https://github.com/owner/repo', 'http://127.0.0.1:8000/')
+
+    assert (
+        up.generate_repo_api_url(urls, 'a.txt', 'main', 'contents')
+        == 'http://127.0.0.1:8000/api/v3/repos/owner/repo/contents/a.txt?ref=main'
+    )
+    assert up.generate_raw_url(urls, 'a.txt', 'main') == 'http://127.0.0.1:8000/raw/owner/repo/main/a.txt'
+    assert up.generate_graphql_api_url(urls) == 'http://127.0.0.1:8000/api/graphql'
+
+    # Without a server URL, the requests go to Github
+    assert up.get_repo_urls('https://github.com/owner/repo').api_base == 'https://api.github.com/repos/owner/repo'
+
+
+def test_repo_urls() -> None:
+    urls = up.get_repo_urls('git@github.example.com:owner/repo.git')
+
+    assert urls.repo_name == 'owner/repo'
+    assert urls.api_url('contents', 'src/a.txt', 'main') == (
+        'https://github.example.com/api/v3/repos/owner/repo/contents/src/a.txt?ref=main'
+    )
+    assert urls.api_url('tags') == 'https://github.example.com/api/v3/repos/owner/repo/tags'
+    assert urls.graphql_url == 'https://github.example.com/api/graphql'
+    assert urls.raw_url('src\\a b.txt', 'main') == 'https://github.example.com/raw/owner/repo/main/src/a%20b.txt'
+
+    assert up.get_repo_urls('git@github.example.com:owner/repo.git') is urls
+
+
+def test_repo_urls_invalid() -> None:
+    with pytest.raises(RuntimeError, match='not http'):
+        up.get_repo_urls('ftp://github.com/owner/repo')
+
+
+def test_generate_github_api_url() -> None:
+    assert up.generate_github_api_url('owner/repo', 'github.com', 'a.txt', 'main', 'contents') == (
+        'https://api.github.com/repos/owner/repo/contents/a.txt?ref=main'
+    )
+    assert up.generate_github_api_url('owner/repo', 'github.example.com', 'a.txt', None, 'contents') == (
+        'https://github.example.com/api/v3/repos/owner/repo/contents/a.txt'
+    )
@@ -0,0 +1,121 @@
+"""
+Writer stage tests
+
+These tests run against an in-memory repository and do not need network access
+"""
+
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+import githubdl
+from githubdl import file_processing as fp
+from githubdl.writer import Writer
+
+# ruff: noqa: S101
+# ruff: noqa: ANN001
+
+REPO_URL = 'https://github.com/owner/repo'
+
+
+@pytest.fixture
+def synced(monkeypatch) -> list[int]:
+    """
+    Record the file descriptors synced to disk instead of syncing them
+    """
+    fds = []
+    monkeypatch.setattr(os, 'fsync', fds.append)
+    return fds
+
+
+def test_directories_are_created_once(monkeypatch, tmp_path) -> None:
+    created = []
+    mkdir = Path.mkdir
+
+    def record(self, *args, **kwargs) -> None:
+        created.append(self)
+        mkdir(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, 'mkdir', record)
+
+    with Writer() as writer:
+        writer.make_dirs([tmp_path / 'a/b/c', tmp_path / 'a/d', tmp_path / 'a/b'])
+        writer.make_dirs([tmp_path / 'a/b/c', tmp_path / 'a/d'])
+
+    assert (tmp_path / 'a/b/c').is_dir()
+    assert (tmp_path / 'a/d').is_dir()
+
+    new = [x.relative_to(tmp_path).as_posix() for x in created if x.is_relative_to(tmp_path) and x != tmp_path]
+    assert sorted(new) == ['a', 'a/b', 'a/b/c', 'a/d']
+    assert new.index('a') < new.index('a/b') < new.index('a/b/c')
+
+
+@pytest.mark.parametrize(('policy', 'expected'), [('none', 0), ('file', 2), ('end', 4)])
+def test_fsync_policies(synced, tmp_path, policy, expected) -> None:
+    with Writer(fsync=policy) as writer:
+        writer.make_dirs([tmp_path / 'a', tmp_path / 'b'])
+        writer.submit(writer.write_bytes, tmp_path / 'a/one.txt', b'1').result()
+        writer.submit(writer.write_bytes, tmp_path / 'b/two.txt', b'2').result()
+
+        if policy == 'end':
+            assert synced == []
+
+    # With 'end', the two files then their two directories
+    assert len(synced) == expected
+    assert (tmp_path / 'b/two.txt').read_bytes() == b'2'
+
+
+def test_unknown_fsync_policy() -> None:
+    with pytest.raises(ValueError, match='Unknown fsync policy'):
+        Writer(fsync='always')
+
+
+def test_queue_is_bounded() -> None:
+    release = threading.Event()
+    submitted = threading.Event()
+
+    with Writer(io_workers=1, queue_size=1) as writer:
+        writer.submit(release.wait)
+
+        thread = threading.Thread(target=lambda: (writer.submit(lambda: None), submitted.set()))
+        thread.start()
+
+        # The second write waits for a free slot
+        assert not submitted.wait(0.1)
+
+        release.set()
+        thread.join()
+
+    assert submitted.is_set()
+
+
+def test_dl_dir_through_the_writer(fake_repo, synced, tmp_path) -> None:
+    fake_repo.files = {f'src/{i % 3}/{i}.txt': str(i).encode() for i in range(12)}
+
+    githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path), max_workers=4, fsync='end')
+
+    assert sorted(x.relative_to(tmp_path).as_posix() for x in tmp_path.rglob('*.txt')) == sorted(fake_repo.files)
+    assert (tmp_path / 'src/2/11.txt').read_bytes() == b'11'
+
+    # The 12 files and their 3 directories, on top of the journal
+    assert len(synced) >= 15
+
+
+def test_write_errors_are_reported(fake_repo, monkeypatch, tmp_path) -> None:
+    fake_repo.files = {'src/a.txt': b'a', 'src/b.txt': b'b'}
+    write_stream = fp.write_stream
+
+    def failing(file_name, stream, *args, **kwargs) -> int:
+        if file_name.name == 'b.txt':
+            raise OSError('No space left on device')
+        return write_stream(file_name, stream, *args, **kwargs)
+
+    monkeypatch.setattr(fp, 'write_stream', failing)
+
+    with pytest.raises(githubdl.DownloadError) as error:
+        githubdl.dl_dir(REPO_URL, 'src', target_path=str(tmp_path), max_workers=2)
+
+    assert list(error.value.errors) == ['src/b.txt']
+    assert (tmp_path / 'src/a.txt').read_bytes() == b'a'